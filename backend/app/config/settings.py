@@ -26,15 +26,104 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     google_application_credentials: str = ""
 
+    # OpenAI Whisper transcription configuration
+    openai_transcription_model: str = "whisper-1"
+    openai_max_concurrency: int = 8
+    openai_max_connections: int = 16
+    openai_timeout: float = 60.0
+    openai_max_retries: int = 2
+
+    # Transcription cache configuration
+    transcription_cache_enabled: bool = True
+    transcription_cache_dir: str = "uploads/transcription_cache"
+    transcription_cache_memory_bytes: int = 4194304  # 4MB
+    transcription_cache_disk_bytes: int = 67108864  # 64MB
+
+    # Gemini configuration
+    gemini_model: str = "gemini-2.5-flash"
+    gemini_max_concurrency: int = 32
+    gemini_timeout: float = 60.0
+    # "prompt": reenvía prompt de sistema + historial en cada turno
+    # "session": prompt de sistema fijo y un ChatSession por conversación
+    gemini_session_mode: str = "prompt"
+    gemini_session_pool_size: int = 500
+    gemini_context_cache: bool = False
+    gemini_context_cache_ttl: int = 3600
+
+    # Chat history configuration (0 desactiva la compactación)
+    chat_history_token_budget: int = 2000
+    chat_history_keep_messages: int = 4
+
+    # First-turn response cache configuration
+    response_cache_enabled: bool = True
+    response_cache_capacity: int = 256
+    response_cache_threshold: float = 0.72
+    response_cache_max_chars: int = 60
+
+    # Google TTS client configuration
+    tts_max_concurrency: int = 16
+    tts_timeout: float = 15.0
+    tts_warmup: bool = True
+    tts_prerender_on_startup: bool = False  # Pre-genera presentación, despedidas y veredictos al iniciar
+
+    # TTS audio output format ("mp3", "ogg_opus" o "wav"; 0 = frecuencia de la voz)
+    tts_audio_format: str = "mp3"
+    tts_sample_rate: int = 0
+
+    # TTS audio cache configuration
+    tts_cache_enabled: bool = True
+    tts_cache_dir: str = "uploads/tts_cache"
+    tts_cache_memory_bytes: int = 33554432  # 32MB
+    tts_cache_disk_bytes: int = 536870912  # 512MB
+
+    # Generated TTS audio retention (0 = sin límite)
+    tts_output_max_age: int = 86400  # 24 horas
+    tts_output_max_bytes: int = 268435456  # 256MB
+    tts_output_memory_bytes: int = 16777216  # 16MB de audios recientes en memoria
+    tts_audio_cache_max_age: int = 86400  # Cache-Control de /chat/audio/{id}
+
     # Whisper configuration
     whisper_model: str = "base"
     whisper_device: str = "cpu"
+    whisper_compute_type: str = "int8"  # Cuantización del modelo local
+    whisper_workers: int = 2  # Transcripciones locales simultáneas sobre el mismo modelo
+    whisper_cpu_threads: int = 0  # 0 = los que elija CTranslate2
+    whisper_beam_size: int = 1  # 1 = greedy, menor latencia
+
+    # Audio preprocessing before transcription (mono, 16 kHz, recorte de silencios)
+    audio_preprocess_enabled: bool = True
+    audio_vad_enabled: bool = True
+    audio_vad_threshold_db: float = -50.0  # Nivel mínimo (dBFS) para considerar un frame como voz
+    audio_vad_margin_db: float = 10.0  # Margen sobre el ruido de fondo de la grabación
+    audio_vad_padding: float = 0.25  # Segundos que se conservan alrededor de la voz
+    audio_vad_max_pause: float = 0.6  # Las pausas más largas se acortan a este valor
+
+    # Long audio: se divide en silencios en tramos que se transcriben en paralelo (0 = sin dividir)
+    transcription_chunk_seconds: float = 120.0
+    transcription_chunk_workers: int = 4
+
+    # Transcripción mientras se graba (whisper_service): ventanas cortadas en silencios
+    live_transcription_enabled: bool = True
+    live_window_min_seconds: float = 8.0
+    live_window_max_seconds: float = 30.0
+    live_silence_seconds: float = 0.6
+    live_workers: int = 2
+
+    # Transcription backend ("openai" = API remota, "local" = faster-whisper en el proceso)
+    transcription_backend: str = "openai"
 
     # File upload configuration
+    ffprobe_max_concurrency: int = 4  # Procesos ffprobe simultáneos para formatos sin parser propio
+    ffprobe_timeout: float = 10.0
+    transcode_workers: int = 2  # Procesos que decodifican formatos comprimidos con ffmpeg
+    transcode_timeout: float = 60.0
     upload_dir: str = "uploads"
     max_file_size: int = 10485760  # 10MB
+    upload_memory_max_bytes: int = 1048576  # Archivos hasta 1MB no se escriben a disco
+    upload_catalog_path: str = "uploads/catalog.db"  # Índice SQLite de las subidas
+    upload_page_size: int = 50
     allowed_extensions: Union[List[str], str] = [
-        ".mp3", ".wav"
+        ".mp3", ".wav", ".m4a", ".ogg", ".opus", ".flac", ".webm", ".mp4"
     ]
 
     prompt_system: str = """
@@ -110,6 +199,13 @@ class Settings(BaseSettings):
     redis_db: int = 0
     redis_password: str = ""
 
+    # Conversation store configuration ("memory" o "redis")
+    conversation_store: str = "memory"
+    conversation_ttl: int = 86400  # 24 horas
+    conversation_max_count: int = 1000
+    conversation_max_bytes: int = 52428800  # 50MB
+    conversation_sweep_interval: float = 60.0
+
 
     @field_validator("cors_origins", "cors_methods", "cors_headers", "allowed_extensions", mode="before")
     @classmethod
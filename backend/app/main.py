@@ -5,20 +5,45 @@ import os
 import shutil
 from pathlib import Path
 from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 
 from app.config.settings import settings
 from app.routers import chat, transcription
+from app.services.tts_prerender import prerender
 from app.models.schemas import (
     HealthResponse,
     ErrorResponse
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicializa y libera los recursos compartidos de la aplicación.
+    """
+    await chat.store.start()
+    await chat.tts.start()
+    await chat.transcriber.start()
+
+    # Las frases fijas se pre-generan en segundo plano para no retrasar el arranque
+    prerender_task = asyncio.create_task(prerender(chat.tts)) if settings.tts_prerender_on_startup else None
+
+    yield
+
+    if prerender_task and not prerender_task.done():
+        prerender_task.cancel()
+    await chat.tts.close()
+    await chat.transcriber.close()
+    await chat.store.close()
+    transcription.catalog.close()
+
 app = FastAPI(
     title=settings.app_name,
     description="API para el proyecto Turtlector que interactúa con IA para orientación vocacional",
     version=settings.app_version,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 app.add_middleware(
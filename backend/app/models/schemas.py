@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 
 
@@ -9,29 +9,76 @@ class ChatMessage(BaseModel):
     timestamp: Optional[datetime] = Field(default_factory=datetime.now)
 
 
+class HistorySummary(BaseModel):
+    text: str = Field(..., description="Rolling summary of the oldest messages")
+    covered_messages: int = Field(..., description="Number of messages folded into the summary")
+
+
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User message to send to the chat")
     conversation_id: Optional[str] = Field(None, description="Conversation ID for context")
+    audio_delivery: Literal["base64", "url"] = Field(
+        "base64", description="Return the audio inline as base64 or as a URL to /chat/audio/{id}"
+    )
+    audio_format: Optional[Literal["mp3", "ogg_opus", "wav"]] = Field(
+        None, description="Audio encoding. Defaults to the Accept header, then the server setting"
+    )
+    audio_sample_rate: Optional[int] = Field(
+        None, ge=8000, le=48000, description="Audio sample rate in Hz. Defaults to the server setting"
+    )
 
 
 class ChatResponse(BaseModel):
     response: str = Field(..., description="AI response")
-    audiob64: str = Field(..., description="AI audio response")
+    audiob64: str = Field("", description="AI audio response, base64 encoded (audio_delivery=base64)")
+    audio_id: Optional[str] = Field(None, description="AI audio response ID")
+    audio_url: Optional[str] = Field(None, description="AI audio response URL (audio_delivery=url)")
+    audio_format: Optional[str] = Field(None, description="AI audio response encoding")
     conversation_id: str = Field(..., description="Conversation ID")
     is_complete: bool = Field(default=False, description="Whether the conversation is complete")
     recommended_career: Optional[str] = Field(None, description="Recommended career if conversation is complete")
     recommended_faculty: Optional[str] = Field(None, description="Recommended faculty if conversation is complete")
 
 
+class ChatStreamChunk(BaseModel):
+    index: int = Field(..., description="Position of the sentence in the response")
+    text: str = Field(..., description="Sentence text")
+    audiob64: str = Field("", description="Sentence audio, base64 encoded (audio_delivery=base64)")
+    audio_url: Optional[str] = Field(None, description="Sentence audio URL (audio_delivery=url)")
+    audio_format: Optional[str] = Field(None, description="Sentence audio encoding")
+
+
+class VoiceSession(BaseModel):
+    conversation_id: str = Field(..., description="Conversation ID used by the voice session")
+    audio_format: str = Field(..., description="Encoding of the reply audio frames")
+    language: str = Field(..., description="Transcription language")
+
+
+class VoiceTranscript(BaseModel):
+    text: str = Field(..., description="Transcribed user utterance")
+    final: bool = Field(default=True, description="Whether the transcript is final")
+    processing_time: Optional[float] = Field(None, description="Transcription time in seconds")
+
+
 class TranscriptionRequest(BaseModel):
     audio_format: str = Field(default="wav", description="Audio format")
     language: Optional[str] = Field("es", description="Language for transcription")
 
 
+class TranscriptionSegment(BaseModel):
+    start: float = Field(..., description="Segment start in seconds from the beginning of the audio")
+    end: float = Field(..., description="Segment end in seconds from the beginning of the audio")
+    text: str = Field(..., description="Segment text")
+
+
 class TranscriptionResponse(BaseModel):
     transcription: str = Field(..., description="Transcribed text")
     confidence: Optional[float] = Field(None, description="Confidence score")
     processing_time: Optional[float] = Field(None, description="Processing time in seconds")
+    cached: bool = Field(default=False, description="Whether the transcription was served from the cache")
+    bytes_saved: int = Field(default=0, description="Bytes removed by audio preprocessing before transcription")
+    seconds_saved: float = Field(default=0.0, description="Seconds of silence trimmed before transcription")
+    segments: List[TranscriptionSegment] = Field(default_factory=list, description="Timestamped segments, if the backend returns them")
 
 
 class HealthResponse(BaseModel):
@@ -62,3 +109,19 @@ class AudioUploadResponse(BaseModel):
     file_size: int = Field(..., description="File size in bytes")
     duration: Optional[float] = Field(None, description="Audio duration in seconds")
     format: str = Field(..., description="Audio format")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the file content")
+    duplicate: bool = Field(default=False, description="Whether the same content was already stored")
+
+
+class UploadedFile(BaseModel):
+    filename: str = Field(..., description="Unique filename in the upload catalog")
+    size: int = Field(..., description="File size in bytes")
+    duration: Optional[float] = Field(None, description="Audio duration in seconds")
+    format: str = Field(..., description="Audio format")
+    sha256: str = Field(..., description="SHA-256 of the file content")
+    created: float = Field(..., description="Upload time as a Unix timestamp")
+
+
+class UploadedFileList(BaseModel):
+    files: List[UploadedFile] = Field(default_factory=list, description="Uploads in this page, newest first")
+    next_cursor: Optional[int] = Field(None, description="Cursor for the next page, if there are more results")
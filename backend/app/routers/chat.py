@@ -1,20 +1,34 @@
+import asyncio
 import base64
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List
+from fastapi import APIRouter, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pathlib import Path
+from pydantic import BaseModel
+from typing import AsyncIterator, List, Optional, Tuple
+import json
+import time
 import uuid
 import re
-import google.generativeai as genai
 from app.models.schemas import (
     ChatRequest,
     ChatResponse,
     ChatMessage,
+    ChatStreamChunk,
+    VoiceSession,
+    VoiceTranscript,
+    ErrorResponse,
     ConversationSummary,
     CareerRecommendation
 )
 from app.config.settings import settings
-import os
 from dotenv import load_dotenv
-from app.services.tts_service import TTSService
+from app.services.tts_service import TTSService, AUDIO_FORMATS, negotiate_audio_format
+from app.services.llm_service import LLMService
+from app.services.chat_stream import stream_speech, SpeechChunk
+from app.services.conversation_store import create_conversation_store
+from app.services.history_compactor import HistoryCompactor
+from app.services.response_cache import ResponseCache
+from app.services.transcription_service import get_transcription_service
 import logging
 import traceback
 
@@ -25,11 +39,23 @@ load_dotenv()
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel('gemini-2.5-flash')
+llm = LLMService()
 
-conversations: Dict[str, List[ChatMessage]] = {}
+store = create_conversation_store()
+compactor = HistoryCompactor(store, llm)
+response_cache = ResponseCache() if settings.response_cache_enabled else None
 tts = TTSService()
+transcriber = get_transcription_service()
+
+# Mismos límites que ChatRequest.audio_sample_rate
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+AUDIO_MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".ogg": "audio/ogg",
+    ".wav": "audio/wav"
+}
 
 def extract_career_recommendation(response_text: str) -> tuple[bool, str, str]:
     """
@@ -46,93 +72,102 @@ def extract_career_recommendation(response_text: str) -> tuple[bool, str, str]:
 
     return False, "", ""
 
-async def generate_gemini_response(conversation_history: List[ChatMessage], user_message: str) -> str:
+async def generate_gemini_response(conversation_id: str, conversation_history: List[ChatMessage], user_message: str) -> str:
     """
     Genera respuesta usando Gemini con el historial de conversación.
     """
     try:
-        logger.info(f"Construyendo prompt con {len(conversation_history)} mensajes en historial")
-
-        prompt_parts = [settings.prompt_system]
-
-        for message in conversation_history:
-            if message.role == "user":
-                prompt_parts.append(f"Estudiante: {message.content}")
-            else:
-                prompt_parts.append(f"Sombrero Seleccionador: {message.content}")
+        summary, recent_history = await compactor.compact(conversation_id, conversation_history, user_message)
 
-        prompt_parts.append(f"Estudiante: {user_message}")
-        prompt_parts.append("Sombrero Seleccionador:")
-
-        full_prompt = "\n\n".join(prompt_parts)
-        logger.info(f"Prompt construido, longitud: {len(full_prompt)} caracteres")
-
-        logger.info("Enviando request a Gemini API...")
-        response = model.generate_content(full_prompt)
-
-        if not response or not response.text:
-            error_msg = "Gemini API no devolvió una respuesta válida"
-            logger.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
+        logger.info(f"Enviando request a Gemini API (modo {llm.session_mode})...")
+        response_text = await llm.reply(conversation_id, recent_history, user_message, summary)
 
-        logger.info(f"Respuesta recibida de Gemini: {len(response.text)} caracteres")
-        return response.text
+        logger.info(f"Respuesta recibida de Gemini: {len(response_text)} caracteres")
+        return response_text
 
-    except HTTPException:
-        raise
+    except ValueError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         error_msg = f"Error generando respuesta: {type(e).__name__}: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
+def select_audio_format(request: ChatRequest, accept: Optional[str]) -> Tuple[str, int]:
+    """
+    Obtiene el formato y la frecuencia de muestreo del audio para una petición.
+    """
+    audio_format = negotiate_audio_format(request.audio_format, accept)
+    sample_rate = settings.tts_sample_rate if request.audio_sample_rate is None else request.audio_sample_rate
+    return audio_format, sample_rate
+
+async def cached_audio(cached, audio_format: str, sample_rate: int) -> bytes:
+    """
+    Obtiene el audio de una respuesta en caché en el formato pedido. Si se guardó en otro
+    formato se sintetiza de nuevo a partir del texto (la caché de TTS evita repetirlo).
+    """
+    if (cached.audio_format, cached.sample_rate) == (audio_format, sample_rate):
+        return cached.audio
+    return await tts.synthesize_async(cached.text, audio_format, sample_rate)
+
 @router.post("/send", response_model=ChatResponse)
-async def send_message(request: ChatRequest):
+async def send_message(request: ChatRequest, accept: Optional[str] = Header(None)):
     """
     Envía un mensaje al chat y recibe respuesta del Sombrero Seleccionador.
+    El formato del audio se toma de `audio_format` o, si no se indica, del encabezado Accept.
     """
+    logger.info(f"Procesando mensaje: {request.message[:50]}...")
     try:
-        logger.info(f"Procesando mensaje: {request.message[:50]}...")
+        audio_format, sample_rate = select_audio_format(request, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        if request.conversation_id == "":
+    try:
+        if not request.conversation_id:
             conversation_id = str(uuid.uuid4())
             logger.info(f"Nueva conversación creada: {conversation_id}")
         else:
             conversation_id = request.conversation_id
             logger.info(f"Continuando conversación: {conversation_id}")
 
-        if conversation_id not in conversations:
-            conversations[conversation_id] = []
-
+        history = await store.get(conversation_id) or []
         user_message = ChatMessage(role="user", content=request.message)
-        conversations[conversation_id].append(user_message)
 
-        logger.info("Generando respuesta de Gemini...")
-        ai_response = await generate_gemini_response(
-            conversations[conversation_id],
-            request.message
-        )
-        ai_response = ai_response.replace('*', '')
-        logger.info(f"Respuesta generada: {ai_response[:50]}...")
+        # Los saludos iniciales se responden desde la caché, sin Gemini ni TTS
+        cached = response_cache.get(request.message) if response_cache and not history else None
+
+        if cached:
+            logger.info("Respuesta obtenida de la caché de primer turno")
+            ai_response = cached.text
+            audio_bytes = await cached_audio(cached, audio_format, sample_rate)
+        else:
+            logger.info("Generando respuesta de Gemini...")
+            ai_response = await generate_gemini_response(
+                conversation_id,
+                history,
+                request.message
+            )
+            ai_response = ai_response.replace('*', '')
+            logger.info(f"Respuesta generada: {ai_response[:50]}...")
 
         assistant_message = ChatMessage(role="assistant", content=ai_response)
-        conversations[conversation_id].append(assistant_message)
+        await store.append(conversation_id, user_message, assistant_message)
 
         is_complete, faculty, career = extract_career_recommendation(ai_response)
         logger.info(f"Recomendación extraída - Complete: {is_complete}, Career: {career}")
 
-        logger.info("Generando audio con TTS...")
-        audio_file = tts.synthesize_and_save(ai_response)
-        logger.info(f"Audio generado: {audio_file}")
+        if not cached:
+            logger.info("Generando audio con TTS...")
+            audio_bytes = await tts.synthesize_async(ai_response, audio_format, sample_rate)
+            logger.info(f"Audio generado: {len(audio_bytes)} bytes ({audio_format})")
 
-        with open(audio_file, 'rb') as f:
-            audio_bytes = f.read()
-
-        audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
-        logger.info(f"Audio codificado en base64: {len(audio_base64)} caracteres")
+            if response_cache and not history:
+                response_cache.put(request.message, ai_response, audio_bytes, audio_format, sample_rate)
 
         return ChatResponse(
             response=ai_response,
-            audiob64=audio_base64,
+            **await deliver_audio(audio_bytes, request.audio_delivery, audio_format),
+            audio_format=audio_format,
             conversation_id=conversation_id,
             is_complete=is_complete,
             recommended_career=career if is_complete else None,
@@ -149,15 +184,346 @@ async def send_message(request: ChatRequest):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=error_msg)
 
+def audio_url(audio_id: str) -> str:
+    """
+    Construye la URL desde la que se descarga un audio generado.
+    """
+    return f"{router.prefix}/audio/{audio_id}"
+
+async def deliver_audio(audio_bytes: bytes, delivery: str, audio_format: str) -> dict:
+    """
+    Guarda el audio generado y devuelve los campos de la respuesta según el modo de entrega:
+    en base64 dentro del JSON o como URL a `/chat/audio/{id}`.
+    """
+    artifact = await asyncio.to_thread(tts.store.save, audio_bytes, AUDIO_FORMATS[audio_format].extension)
+
+    if delivery == "url":
+        logger.info(f"Audio disponible en {audio_url(artifact.artifact_id)}")
+        return {"audio_id": artifact.artifact_id, "audio_url": audio_url(artifact.artifact_id)}
+
+    audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+    logger.info(f"Audio codificado en base64: {len(audio_base64)} caracteres")
+    return {"audio_id": artifact.artifact_id, "audiob64": audio_base64}
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta un encabezado Range de un solo rango de bytes.
+
+    Returns:
+        Optional[Tuple[int, int]]: Primer y último byte (inclusive), o None si el rango no es válido
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    # Con varios rangos se entrega uno solo que los cubre a todos
+    if "," in ranges:
+        return (0, size - 1) if size else None
+
+    start, _, end = ranges.strip().partition("-")
+    try:
+        if not start:
+            # Sufijo: los últimos N bytes
+            length = int(end)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+
+    if first >= size or last < first:
+        return None
+    return first, min(last, size - 1)
+
+def format_sse(event: str, data: BaseModel) -> str:
+    """
+    Serializa un evento en formato Server-Sent Events.
+    """
+    return f"event: {event}\ndata: {data.model_dump_json()}\n\n"
+
+async def reply_speech(conversation_id: str, message: str, audio_format: str,
+                       sample_rate: int) -> AsyncIterator[SpeechChunk]:
+    """
+    Genera la respuesta a un mensaje oración por oración, cada una con su audio,
+    y al terminar guarda el turno en la conversación.
+
+    Args:
+        conversation_id (str): ID de la conversación
+        message (str): Mensaje del estudiante
+        audio_format (str): Formato del audio de cada oración
+        sample_rate (int): Frecuencia de muestreo del audio (0 = la de la voz)
+
+    Returns:
+        AsyncIterator[SpeechChunk]: Oraciones con su audio, en orden
+    """
+    history = await store.get(conversation_id) or []
+    texts, audio_parts = [], []
+
+    cached = response_cache.get(message) if response_cache and not history else None
+    if cached:
+        logger.info("Respuesta obtenida de la caché de primer turno")
+        audio = await cached_audio(cached, audio_format, sample_rate)
+        texts.append(cached.text)
+        yield SpeechChunk(0, cached.text, audio)
+    else:
+        summary, recent_history = await compactor.compact(conversation_id, history, message)
+
+        async def synthesize(sentence: str) -> bytes:
+            return await tts.synthesize_async(sentence, audio_format, sample_rate)
+
+        async for chunk in stream_speech(llm.reply_stream(conversation_id, recent_history, message, summary), synthesize):
+            texts.append(chunk.text)
+            audio_parts.append(chunk.audio)
+            yield chunk
+
+        if response_cache and not history and audio_format == "mp3":
+            # Solo los fragmentos MP3 se pueden concatenar en un solo audio
+            response_cache.put(message, " ".join(texts), b"".join(audio_parts), audio_format, sample_rate)
+
+    await store.append(
+        conversation_id,
+        ChatMessage(role="user", content=message),
+        ChatMessage(role="assistant", content=" ".join(texts))
+    )
+
+def completed_response(conversation_id: str, sentences: List[str]) -> ChatResponse:
+    """
+    Arma la respuesta final de un turno transmitido por partes.
+    """
+    ai_response = " ".join(sentences)
+    is_complete, faculty, career = extract_career_recommendation(ai_response)
+    return ChatResponse(
+        response=ai_response,
+        conversation_id=conversation_id,
+        is_complete=is_complete,
+        recommended_career=career if is_complete else None,
+        recommended_faculty=faculty if is_complete else None
+    )
+
+@router.post("/send-stream")
+async def send_message_stream(request: ChatRequest, accept: Optional[str] = Header(None)):
+    """
+    Envía un mensaje al chat y recibe la respuesta como Server-Sent Events.
+    Cada oración se sintetiza en cuanto Gemini la termina, así el cliente puede
+    reproducir el primer audio mientras el resto de la respuesta se sigue generando.
+
+    Eventos: `chunk` (texto y audio de una oración), `done` (respuesta completa) y `error`.
+    """
+    logger.info(f"Procesando mensaje (stream): {request.message[:50]}...")
+    try:
+        audio_format, sample_rate = select_audio_format(request, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not request.conversation_id:
+        conversation_id = str(uuid.uuid4())
+        logger.info(f"Nueva conversación creada: {conversation_id}")
+    else:
+        conversation_id = request.conversation_id
+        logger.info(f"Continuando conversación: {conversation_id}")
+
+    async def event_stream():
+        sentences = []
+        try:
+            async for chunk in reply_speech(conversation_id, request.message, audio_format, sample_rate):
+                sentences.append(chunk.text)
+                if request.audio_delivery == "url":
+                    artifact = await asyncio.to_thread(tts.store.save, chunk.audio, AUDIO_FORMATS[audio_format].extension)
+                    audio = {"audio_url": audio_url(artifact.artifact_id)}
+                else:
+                    audio = {"audiob64": base64.b64encode(chunk.audio).decode("utf-8")}
+
+                yield format_sse("chunk", ChatStreamChunk(
+                    index=chunk.index, text=chunk.text, audio_format=audio_format, **audio
+                ))
+
+            done = completed_response(conversation_id, sentences)
+            logger.info(f"Stream terminado: {len(sentences)} oraciones, Complete: {done.is_complete}")
+            yield format_sse("done", done)
+
+        except Exception as e:
+            error_msg = f"Error procesando mensaje: {type(e).__name__}: {str(e)}"
+            logger.error(error_msg)
+            logger.error(traceback.format_exc())
+            yield format_sse("error", ErrorResponse(error=error_msg, detail=conversation_id))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def format_ws(event: str, data: BaseModel) -> str:
+    """
+    Serializa un evento de la sesión de voz como mensaje de texto del WebSocket.
+    """
+    return json.dumps({"event": event, "data": data.model_dump(mode="json")})
+
+@router.websocket("/voice")
+async def voice_session(websocket: WebSocket, conversation_id: Optional[str] = None, language: str = "es",
+                        audio_format: Optional[str] = None, sample_rate: Optional[int] = None):
+    """
+    Sesión de voz sobre un WebSocket: el cliente envía el audio del micrófono y recibe la
+    transcripción, el texto de la respuesta y el audio por la misma conexión, sin volver
+    a subir el audio ni abrir una petición por turno.
+
+    Mensajes del cliente:
+    - Binario: fragmentos de audio de la intervención actual (wav, mp3, webm, ogg, ...).
+    - `{"type": "end", "format": "webm"}`: termina la intervención y la transcribe.
+    - `{"type": "text", "message": "..."}`: envía un mensaje escrito en lugar de audio.
+    - `{"type": "cancel"}`: descarta el audio recibido de la intervención actual.
+
+    Eventos del servidor (texto JSON `{"event": ..., "data": ...}`): `session`, `transcript`,
+    `chunk` (seguido de un mensaje binario con el audio de la oración), `done` y `error`.
+    """
+    await websocket.accept()
+    try:
+        audio_format = negotiate_audio_format(audio_format)
+        if sample_rate is not None and not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"Frecuencia de muestreo fuera de rango: {sample_rate} (entre {MIN_SAMPLE_RATE} y {MAX_SAMPLE_RATE} Hz)")
+    except ValueError as e:
+        await websocket.send_text(format_ws("error", ErrorResponse(error=str(e))))
+        await websocket.close(code=1008)
+        return
+
+    sample_rate = settings.tts_sample_rate if sample_rate is None else sample_rate
+    conversation_id = conversation_id or str(uuid.uuid4())
+    logger.info(f"Sesión de voz iniciada: {conversation_id}")
+    await websocket.send_text(format_ws("session", VoiceSession(
+        conversation_id=conversation_id, audio_format=audio_format, language=language
+    )))
+
+    async def reply(message: str):
+        sentences = []
+        async for chunk in reply_speech(conversation_id, message, audio_format, sample_rate):
+            sentences.append(chunk.text)
+            await websocket.send_text(format_ws("chunk", ChatStreamChunk(
+                index=chunk.index, text=chunk.text, audio_format=audio_format
+            )))
+            await websocket.send_bytes(chunk.audio)
+        await websocket.send_text(format_ws("done", completed_response(conversation_id, sentences)))
+
+    utterance = bytearray()
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+
+            if frame.get("bytes") is not None:
+                if len(utterance) + len(frame["bytes"]) > settings.max_file_size:
+                    utterance.clear()
+                    await websocket.send_text(format_ws("error", ErrorResponse(
+                        error="Audio demasiado grande", detail=f"Máximo permitido: {settings.max_file_size} bytes"
+                    )))
+                    continue
+                utterance.extend(frame["bytes"])
+                continue
+
+            try:
+                command = json.loads(frame.get("text") or "{}")
+            except json.JSONDecodeError:
+                command = {}
+
+            try:
+                if command.get("type") == "end":
+                    if not utterance:
+                        continue
+                    extension = f".{command.get('format', 'webm')}".lower()
+                    if extension not in settings.allowed_extensions:
+                        utterance.clear()
+                        await websocket.send_text(format_ws("error", ErrorResponse(
+                            error="Formato de archivo no soportado", detail=command.get("format")
+                        )))
+                        continue
+                    started_at = time.perf_counter()
+                    transcription = await transcriber.transcribe(bytes(utterance), f"audio{extension}", language)
+                    text = transcription.text
+                    utterance.clear()
+                    await websocket.send_text(format_ws("transcript", VoiceTranscript(
+                        text=text, processing_time=round(time.perf_counter() - started_at, 3)
+                    )))
+                    if text.strip():
+                        await reply(text)
+                elif command.get("type") == "text" and command.get("message", "").strip():
+                    await reply(command["message"])
+                elif command.get("type") == "cancel":
+                    utterance.clear()
+                else:
+                    await websocket.send_text(format_ws("error", ErrorResponse(
+                        error="Mensaje no reconocido", detail=frame.get("text")
+                    )))
+
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                utterance.clear()
+                error_msg = f"Error procesando turno de voz: {type(e).__name__}: {str(e)}"
+                logger.error(error_msg)
+                logger.error(traceback.format_exc())
+                await websocket.send_text(format_ws("error", ErrorResponse(error=error_msg, detail=conversation_id)))
+
+    except WebSocketDisconnect:
+        pass
+
+    logger.info(f"Sesión de voz terminada: {conversation_id}")
+
+@router.get("/audio/{audio_id}")
+async def get_audio(audio_id: str, request: Request):
+    """
+    Descarga el audio de una respuesta. Los audios no cambian una vez generados,
+    así que se sirven con ETag y caché de larga duración, y aceptan Range para
+    que el reproductor pueda empezar antes de recibir el archivo completo.
+    """
+    artifact = await tts.store.get_async(audio_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Audio no encontrado")
+
+    etag = f'"{audio_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.tts_audio_cache_max_age}, immutable",
+        "Accept-Ranges": "bytes"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    audio_bytes = await tts.store.read_async(audio_id)
+    if audio_bytes is None:
+        raise HTTPException(status_code=404, detail="Audio no encontrado")
+
+    media_type = AUDIO_MEDIA_TYPES.get(Path(artifact.path).suffix, "application/octet-stream")
+    range_header = request.headers.get("range")
+
+    if range_header:
+        byte_range = parse_range(range_header, len(audio_bytes))
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(audio_bytes)}"})
+
+        start, end = byte_range
+        return Response(
+            audio_bytes[start:end + 1],
+            status_code=206,
+            media_type=media_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(audio_bytes)}"}
+        )
+
+    return Response(audio_bytes, media_type=media_type, headers=headers)
+
 @router.get("/conversation/{conversation_id}", response_model=List[ChatMessage])
 async def get_conversation(conversation_id: str):
     """
     Obtiene el historial completo de una conversación.
     """
-    if conversation_id not in conversations:
+    messages = await store.get(conversation_id)
+    if messages is None:
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
 
-    return conversations[conversation_id]
+    return messages
 
 
 @router.delete("/conversation/{conversation_id}")
@@ -165,10 +531,10 @@ async def delete_conversation(conversation_id: str):
     """
     Elimina una conversación del historial.
     """
-    if conversation_id not in conversations:
+    if not await store.delete(conversation_id):
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
+    llm.drop_session(conversation_id)
 
-    del conversations[conversation_id]
     return {"message": "Conversación eliminada exitosamente"}
 
 @router.get("/conversations", response_model=List[ConversationSummary])
@@ -178,7 +544,7 @@ async def list_conversations():
     """
     summaries = []
 
-    for conv_id, messages in conversations.items():
+    for conv_id, messages in await store.items():
         is_complete = False
         career_rec = None
 
@@ -203,3 +569,19 @@ async def list_conversations():
         summaries.append(summary)
 
     return summaries
+
+@router.get("/stats")
+async def chat_stats():
+    """
+    Obtiene métricas de concurrencia y latencia de las llamadas a Gemini y Google TTS.
+    """
+    return {
+        "gemini": llm.get_stats(),
+        "conversations": store.get_stats(),
+        "history": compactor.get_stats(),
+        "response_cache": response_cache.get_stats() if response_cache else None,
+        "tts": tts.get_stats(),
+        "tts_cache": tts.get_cache_stats(),
+        "tts_output": tts.store.get_stats(),
+        "tts_audio": tts.get_audio_stats()
+    }
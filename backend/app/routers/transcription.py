@@ -1,139 +1,166 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, HTTPException, Query, Request
 from pathlib import Path
-import os
-import shutil
+from typing import Optional
 import time
-from openai import OpenAI
+import asyncio
 from dotenv import load_dotenv
 from app.models.schemas import (
     TranscriptionResponse,
     AudioUploadResponse,
-    TranscriptionRequest
+    TranscriptionRequest,
+    UploadedFile,
+    UploadedFileList
 )
 from app.config.settings import settings
-import tempfile
-import subprocess
+from app.services.transcription_service import get_transcription_service
+from app.services.audio_probe import probe_data, probe_file
+from app.services.upload_catalog import UploadCatalog, UploadEntry
+from app.services.upload_stream import StreamedUpload, UnsupportedFormat, UploadError, UploadTooLarge, receive_upload
 
 load_dotenv()
 
 router = APIRouter(prefix="/transcription", tags=["Transcription"])
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+transcriber = get_transcription_service()
+catalog = UploadCatalog(settings.upload_dir, settings.upload_catalog_path)
+
+# Documenta en OpenAPI el formulario que los endpoints leen directamente del cuerpo de la petición
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "language": {"type": "string", "default": "es"}
+                    }
+                }
+            }
+        }
+    }
+}
 
-def get_audio_duration(file_path: str) -> float:
+def uploaded_file(entry: UploadEntry) -> UploadedFile:
     """
-    Obtiene la duración del archivo de audio usando ffprobe.
+    Convierte una entrada del catálogo en la respuesta de la API.
     """
-    try:
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-            '-of', 'csv=p=0', file_path
-        ], capture_output=True, text=True)
-        return float(result.stdout.strip())
-    except:
-        return 0.0
-
-def validate_audio_file(file: UploadFile) -> bool:
+    return UploadedFile(
+        filename=entry.filename,
+        size=entry.size,
+        duration=entry.duration,
+        format=entry.format,
+        sha256=entry.sha256,
+        created=entry.created_at
+    )
+
+def validate_audio_file(filename: str) -> bool:
     """
     Valida que el archivo sea un formato de audio soportado.
     """
-    allowed_extensions = [".mp3", ".wav"]
-    file_extension = Path(file.filename).suffix.lower()
-    return file_extension in allowed_extensions
+    file_extension = Path(filename).suffix.lower()
+    return file_extension in settings.allowed_extensions
 
-@router.post("/upload", response_model=AudioUploadResponse)
-async def upload_audio(file: UploadFile = File(...)):
+async def receive_audio(request: Request) -> StreamedUpload:
     """
-    Sube un archivo de audio al servidor.
+    Recibe el archivo de audio del formulario a medida que llega, rechazando los
+    formatos no soportados antes de leer el archivo y los archivos demasiado grandes
+    sin terminar de leerlos.
+
+    Raises:
+        HTTPException: 413 si el archivo es demasiado grande, 400 si el formato no está
+            soportado o el formulario no es válido
     """
     try:
-        if not validate_audio_file(file):
-            raise HTTPException(
-                status_code=400,
-                detail="Formato de archivo no soportado. Formatos permitidos: mp3, wav, m4a, ogg, flac, webm, mp4"
-            )
-
-        if file.size > settings.max_file_size:
-            raise HTTPException(
-                status_code=413,
-                detail=f"Archivo demasiado grande. Máximo permitido: {settings.max_file_size / 1024 / 1024:.1f}MB"
-            )
-
-        upload_path = Path(settings.upload_dir)
-        upload_path.mkdir(parents=True, exist_ok=True)
-
-        file_path = upload_path / file.filename
-
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        return await receive_upload(
+            request.stream(),
+            request.headers.get("content-type"),
+            request.headers.get("content-length"),
+            max_size=settings.max_file_size,
+            memory_limit=settings.upload_memory_max_bytes,
+            spool_dir=Path(settings.upload_dir) / ".tmp",
+            accept_filename=validate_audio_file
+        )
+    except UnsupportedFormat:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato de archivo no soportado. Formatos permitidos: {', '.join(e.lstrip('.') for e in settings.allowed_extensions)}"
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Archivo demasiado grande. Máximo permitido: {settings.max_file_size / 1024 / 1024:.1f}MB"
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        duration = get_audio_duration(str(file_path))
+@router.post("/upload", response_model=AudioUploadResponse, openapi_extra=UPLOAD_OPENAPI)
+async def upload_audio(request: Request):
+    """
+    Sube un archivo de audio al servidor. Si el mismo contenido ya estaba guardado
+    no se vuelve a escribir; si el nombre ya existe con otro contenido se le agrega
+    parte del hash.
+    """
+    upload = await receive_audio(request)
+    try:
+        if upload.path is not None:
+            audio_info = await probe_file(upload.path)
+        else:
+            audio_info = await probe_data(upload.data, upload.filename)
+        # Duración 0.0 significa que ni el parser ni ffprobe pudieron leerla
+        entry, duplicate = await asyncio.to_thread(
+            catalog.add, upload.source, upload.filename, upload.sha256, upload.size, audio_info.duration or None
+        )
 
         return AudioUploadResponse(
-            filename=file.filename,
-            file_size=file.size,
-            duration=duration,
-            format=Path(file.filename).suffix.lower().replace('.', '')
+            filename=entry.filename,
+            file_size=entry.size,
+            duration=entry.duration,
+            format=entry.format,
+            sha256=entry.sha256,
+            duplicate=duplicate
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error subiendo archivo: {str(e)}")
+    finally:
+        upload.cleanup()
 
-@router.post("/transcribe", response_model=TranscriptionResponse)
-async def transcribe_audio(
-    file: UploadFile = File(...),
-    language: str = Form(default="es")
-):
+@router.post("/transcribe", response_model=TranscriptionResponse, openapi_extra=UPLOAD_OPENAPI)
+async def transcribe_audio(request: Request):
     """
     Transcribe un archivo de audio usando OpenAI Whisper.
+    Los archivos pequeños se envían a Whisper desde memoria, sin escribirlos a disco.
     """
+    upload = await receive_audio(request)
+    start_time = time.time()
     try:
-        if not validate_audio_file(file):
-            raise HTTPException(
-                status_code=400,
-                detail="Formato de archivo no soportado"
-            )
+        language = upload.fields.get("language") or "es"
+        transcription = await transcriber.transcribe(
+            upload.source, filename=upload.filename, language=language, sha256=upload.sha256
+        )
 
-        start_time = time.time()
+        processing_time = time.time() - start_time
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_file_path = temp_file.name
-
-        try:
-            with open(temp_file_path, "rb") as audio_file:
-                if language == "auto":
-                    transcription = openai_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="verbose_json"
-                    )
-                else:
-                    transcription = openai_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        language=language,
-                        response_format="verbose_json"
-                    )
-
-            processing_time = time.time() - start_time
-
-            if hasattr(transcription, 'text'):
-                transcription_text = transcription.text
-            else:
-                transcription_text = str(transcription)
-
-            return TranscriptionResponse(
-                transcription=transcription_text,
-                confidence=getattr(transcription, 'confidence', None),
-                processing_time=processing_time
-            )
-
-        finally:
-            os.unlink(temp_file_path)
+        return TranscriptionResponse(
+            transcription=transcription.text,
+            processing_time=processing_time,
+            cached=transcription.cached,
+            bytes_saved=transcription.bytes_saved,
+            seconds_saved=round(transcription.seconds_saved, 2),
+            segments=[segment._asdict() for segment in transcription.segments]
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en transcripción: {str(e)}")
+    finally:
+        upload.cleanup()
 
 @router.post("/transcribe-file/{filename}", response_model=TranscriptionResponse)
 async def transcribe_uploaded_file(
@@ -144,67 +171,57 @@ async def transcribe_uploaded_file(
     Transcribe un archivo de audio previamente subido.
     """
     try:
-        file_path = Path(settings.upload_dir) / filename
+        entry = await asyncio.to_thread(catalog.get, filename)
 
-        if not file_path.exists():
+        if entry is None:
             raise HTTPException(status_code=404, detail="Archivo no encontrado")
 
         start_time = time.time()
 
-        with open(file_path, "rb") as audio_file:
-            if language == "auto":
-                transcription = openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json"
-                )
-            else:
-                transcription = openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=language,
-                    response_format="verbose_json"
-                )
+        transcription = await transcriber.transcribe(
+            Path(entry.path), filename=entry.filename, language=language, sha256=entry.sha256
+        )
 
         processing_time = time.time() - start_time
 
-        if hasattr(transcription, 'text'):
-            transcription_text = transcription.text
-        else:
-            transcription_text = str(transcription)
-
         return TranscriptionResponse(
-            transcription=transcription_text,
-            confidence=getattr(transcription, 'confidence', None),
-            processing_time=processing_time
+            transcription=transcription.text,
+            processing_time=processing_time,
+            cached=transcription.cached,
+            bytes_saved=transcription.bytes_saved,
+            seconds_saved=round(transcription.seconds_saved, 2),
+            segments=[segment._asdict() for segment in transcription.segments]
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en transcripción: {str(e)}")
 
-@router.get("/files")
-async def list_audio_files():
+@router.get("/files", response_model=UploadedFileList)
+async def list_audio_files(
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Uploads per page"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    format: Optional[str] = Query(None, description="Only this audio format (mp3, wav, ...)"),
+    search: Optional[str] = Query(None, max_length=255, description="Only filenames containing this text"),
+    min_duration: Optional[float] = Query(None, ge=0, description="Minimum duration in seconds"),
+    max_duration: Optional[float] = Query(None, ge=0, description="Maximum duration in seconds")
+):
     """
-    Lista todos los archivos de audio subidos.
+    Lista los archivos de audio subidos, del más reciente al más antiguo, por páginas.
+    Para obtener la página siguiente se envía el `next_cursor` de la respuesta anterior.
     """
     try:
-        upload_path = Path(settings.upload_dir)
-
-        if not upload_path.exists():
-            return {"files": []}
-
-        audio_files = []
-        for file_path in upload_path.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in settings.allowed_extensions:
-                stat_info = file_path.stat()
-                audio_files.append({
-                    "filename": file_path.name,
-                    "size": stat_info.st_size,
-                    "created": stat_info.st_ctime,
-                    "format": file_path.suffix.lower().replace('.', '')
-                })
-
-        return {"files": audio_files}
+        entries, next_cursor = await asyncio.to_thread(
+            catalog.list_uploads,
+            limit=limit or settings.upload_page_size,
+            cursor=cursor,
+            audio_format=format,
+            search=search,
+            min_duration=min_duration,
+            max_duration=max_duration
+        )
+        return UploadedFileList(files=[uploaded_file(entry) for entry in entries], next_cursor=next_cursor)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listando archivos: {str(e)}")
@@ -215,14 +232,13 @@ async def delete_audio_file(filename: str):
     Elimina un archivo de audio subido.
     """
     try:
-        file_path = Path(settings.upload_dir) / filename
-
-        if not file_path.exists():
+        if not await asyncio.to_thread(catalog.remove, filename):
             raise HTTPException(status_code=404, detail="Archivo no encontrado")
 
-        file_path.unlink()
         return {"message": f"Archivo {filename} eliminado exitosamente"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error eliminando archivo: {str(e)}")
 
@@ -232,16 +248,25 @@ async def transcription_health():
     Verifica el estado del servicio de transcripción.
     """
     try:
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            return {"status": "unhealthy", "reason": "OpenAI API key not configured"}
+        if not transcriber.backend.configured:
+            reason = "OpenAI API key not configured" if transcriber.backend.name == "openai" \
+                else "faster-whisper not installed"
+            return {"status": "unhealthy", "reason": reason}
 
         return {
             "status": "healthy",
             "service": "transcription",
-            "whisper_model": "whisper-1",
+            "backend": transcriber.backend.name,
+            "whisper_model": transcriber.model,
             "supported_formats": settings.allowed_extensions
         }
 
     except Exception as e:
         return {"status": "unhealthy", "reason": str(e)}
+
+@router.get("/stats")
+async def transcription_stats():
+    """
+    Obtiene métricas de concurrencia y latencia de las llamadas a Whisper y del catálogo de subidas.
+    """
+    return {**transcriber.get_stats(), "uploads": await asyncio.to_thread(catalog.get_stats)}
@@ -0,0 +1,333 @@
+import io
+import math
+import wave
+import bisect
+import logging
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000  # Frecuencia con la que trabaja Whisper internamente
+FRAME_SECONDS = 0.03
+# Los audios largos se cambian de frecuencia por bloques, con un margen de señal a cada lado
+# que absorbe el efecto de borde de la FFT y se descarta
+RESAMPLE_BLOCK_SECONDS = 10.0
+RESAMPLE_MARGIN_SECONDS = 1.0
+
+
+class TimeMap(NamedTuple):
+    """
+    Correspondencia entre el audio recortado y el original: el tramo conservado `i` empieza
+    en `trimmed[i]` segundos del audio recortado y en `original[i]` segundos del original.
+    """
+    trimmed: Tuple[float, ...] = (0.0,)
+    original: Tuple[float, ...] = (0.0,)
+
+    def to_original(self, seconds: float) -> float:
+        """
+        Convierte una posición del audio recortado a la posición equivalente en el original.
+        """
+        index = max(bisect.bisect_right(self.trimmed, seconds) - 1, 0)
+        return self.original[index] + seconds - self.trimmed[index]
+
+
+class PreprocessedAudio(NamedTuple):
+    audio: bytes
+    filename: str
+    original_bytes: int
+    original_seconds: float
+    seconds: float
+    time_map: Optional[TimeMap] = None  # None si no se recortaron silencios
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.audio)
+
+    @property
+    def seconds_saved(self) -> float:
+        return self.original_seconds - self.seconds
+
+
+class AudioChunk(NamedTuple):
+    offset: float  # Segundos desde el inicio del audio
+    seconds: float
+    audio: bytes
+
+
+def read_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Lee un WAV PCM (8, 16, 24 o 32 bits) como muestras float32 en [-1, 1].
+
+    Returns:
+        Tuple[np.ndarray, int]: Muestras con forma (frames, canales) y frecuencia de muestreo
+    """
+    with wave.open(io.BytesIO(data)) as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        # 24 bits: se completa cada muestra a 32 bits con el byte más significativo en la posición alta
+        triplets = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(triplets), 4), dtype=np.uint8)
+        padded[:, 1:] = triplets
+        samples = padded.view("<i4").ravel().astype(np.float32) / 2147483648
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Ancho de muestra no soportado: {width} bytes")
+
+    return samples.reshape(-1, channels), sample_rate
+
+
+def write_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """
+    Codifica muestras mono float32 como WAV PCM de 16 bits.
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _resample_fft(samples: np.ndarray, length: int) -> np.ndarray:
+    spectrum = np.fft.rfft(samples)
+    bins = length // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.pad(spectrum, (0, bins - len(spectrum)))
+    return (np.fft.irfft(spectrum, n=length) * (length / len(samples))).astype(np.float32)
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Cambia la frecuencia de muestreo en el dominio de la frecuencia (FFT), lo que equivale a
+    un filtro pasa-bajos ideal: al bajar de 44.1 kHz a 16 kHz no aparece aliasing.
+    Se procesa por bloques de `RESAMPLE_BLOCK_SECONDS`, así la memoria usada por la FFT
+    no crece con la duración del audio.
+    """
+    if sample_rate == target_rate or not len(samples):
+        return samples
+
+    length = int(round(len(samples) * target_rate / sample_rate))
+    # Bloques y márgenes con un número entero de muestras de salida
+    step = sample_rate // math.gcd(sample_rate, target_rate)
+    block = max(int(RESAMPLE_BLOCK_SECONDS * sample_rate) // step, 1) * step
+    margin = max(int(RESAMPLE_MARGIN_SECONDS * sample_rate) // step, 1) * step
+    if len(samples) <= block + 2 * margin:
+        return _resample_fft(samples, length)
+
+    output = np.empty(length, dtype=np.float32)
+    for start in range(0, len(samples), block):
+        left, right = max(start - margin, 0), min(start + block + margin, len(samples))
+        out_left = left * target_rate // sample_rate
+        out_start = start * target_rate // sample_rate
+        out_end = min((start + block) * target_rate // sample_rate, length)
+        # El último tramo llega hasta el final del audio: su largo cierra el total redondeado
+        out_length = length - out_left if right == len(samples) else (right - left) * target_rate // sample_rate
+
+        resampled = _resample_fft(samples[left:right], out_length)
+        output[out_start:out_end] = resampled[out_start - out_left:out_end - out_left]
+    return output
+
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Calcula el nivel RMS (dBFS) de cada frame de 30 ms completo.
+    """
+    frame = int(sample_rate * FRAME_SECONDS)
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def voiced_frames(samples: np.ndarray, sample_rate: int, threshold_db: float = None) -> np.ndarray:
+    """
+    Detecta voz por energía: compara el nivel de cada frame de 30 ms con un umbral adaptado
+    al ruido de fondo de la grabación.
+
+    Returns:
+        np.ndarray: Máscara booleana con un valor por frame (vacía si el audio dura menos de un frame)
+    """
+    energy_db = frame_energy_db(samples, sample_rate)
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool)
+
+    # Umbral: piso de ruido (percentil 10) más un margen, nunca por debajo del umbral absoluto
+    floor_db = settings.audio_vad_threshold_db if threshold_db is None else threshold_db
+    threshold = max(np.percentile(energy_db, 10) + settings.audio_vad_margin_db, floor_db)
+    return energy_db > threshold
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int, padding: float = None, max_pause: float = None) -> np.ndarray:
+    """
+    Elimina el silencio al inicio y al final, y acorta las pausas internas más largas que `max_pause`.
+    Se conserva un margen de `padding` segundos alrededor de cada tramo con voz para no cortar palabras.
+    """
+    return trim_silence_mapped(samples, sample_rate, padding, max_pause)[0]
+
+
+def trim_silence_mapped(samples: np.ndarray, sample_rate: int, padding: float = None,
+                        max_pause: float = None) -> Tuple[np.ndarray, TimeMap]:
+    """
+    Igual que `trim_silence`, pero también devuelve dónde empieza cada tramo conservado en el
+    audio original, para llevar las marcas de tiempo de la transcripción al audio subido.
+
+    Returns:
+        Tuple[np.ndarray, TimeMap]: Muestras recortadas y su correspondencia con el original
+    """
+    padding = settings.audio_vad_padding if padding is None else padding
+    max_pause = settings.audio_vad_max_pause if max_pause is None else max_pause
+
+    voiced = voiced_frames(samples, sample_rate)
+    if not voiced.any():
+        # Sin voz detectada o sin ningún frame completo (audio vacío o de menos de 30 ms)
+        return samples, TimeMap()
+
+    # Extiende cada tramo con voz `padding` segundos hacia ambos lados (dilatación de la máscara)
+    pad_frames = int(round(padding / FRAME_SECONDS))
+    if pad_frames:
+        kernel = np.ones(2 * pad_frames + 1, dtype=int)
+        voiced = np.convolve(voiced.astype(int), kernel, mode="same") > 0
+
+    # Las pausas internas se conservan hasta `max_pause` segundos
+    keep = voiced.copy()
+    max_pause_frames = int(round(max_pause / FRAME_SECONDS))
+    first, last = np.flatnonzero(voiced)[[0, -1]]
+    edges = np.flatnonzero(np.diff(voiced[first:last + 1].astype(int))) + first + 1
+    for start, end in zip(edges[::2], edges[1::2]):
+        keep[start:min(end, start + max_pause_frames)] = True
+
+    # Tramos conservados en muestras; el último frame incompleto sigue al último frame completo
+    frame = int(sample_rate * FRAME_SECONDS)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], keep.astype(int), [0]))))
+    starts, ends = edges[::2] * frame, edges[1::2] * frame
+    if keep[-1]:
+        ends[-1] = len(samples)
+
+    lengths = ends - starts
+    trimmed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    time_map = TimeMap(tuple(float(t) for t in trimmed_starts / sample_rate),
+                       tuple(float(t) for t in starts / sample_rate))
+    return np.concatenate([samples[start:end] for start, end in zip(starts, ends)]), time_map
+
+
+def split_points(samples: np.ndarray, sample_rate: int, max_seconds: float) -> List[int]:
+    """
+    Elige dónde cortar un audio largo en tramos de hasta `max_seconds`. Cada corte cae en el
+    frame más silencioso de la segunda mitad del tramo, para no partir palabras.
+
+    Returns:
+        List[int]: Índices de muestra de los cortes (vacía si el audio no supera el máximo)
+    """
+    frame = int(sample_rate * FRAME_SECONDS)
+    max_length = int(max_seconds * sample_rate)
+    if len(samples) <= max_length or max_length < 2 * frame:
+        return []
+
+    energy_db = frame_energy_db(samples, sample_rate)
+    points = []
+    start = 0
+    while len(samples) - start > max_length:
+        low = (start + max_length // 2) // frame
+        high = (start + max_length) // frame
+        # argmin sobre la ventana invertida: ante empates se prefiere el corte más tardío
+        quietest = high - 1 - int(np.argmin(energy_db[low:high][::-1]))
+        start = quietest * frame + frame // 2
+        points.append(start)
+    return points
+
+
+def split_audio(data: bytes, max_seconds: float) -> List[AudioChunk]:
+    """
+    Divide un WAV en tramos de hasta `max_seconds`, cortando en silencios. Cada tramo es un
+    WAV mono independiente con su desplazamiento respecto al inicio del audio.
+
+    Args:
+        data (bytes): Contenido del WAV
+        max_seconds (float): Duración máxima de cada tramo
+
+    Returns:
+        List[AudioChunk]: Tramos en orden. Un único tramo con el audio original si no hace falta
+            dividirlo o no se puede leer
+    """
+    try:
+        samples, sample_rate = read_wav(data)
+    except (wave.Error, EOFError, ValueError):
+        return [AudioChunk(0.0, 0.0, data)]
+
+    seconds = len(samples) / sample_rate if sample_rate else 0.0
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    points = split_points(mono, sample_rate, max_seconds)
+    if not points:
+        return [AudioChunk(0.0, seconds, data)]
+
+    bounds = [0, *points, len(mono)]
+    return [
+        AudioChunk(start / sample_rate, (end - start) / sample_rate, write_wav(mono[start:end], sample_rate))
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def preprocess_samples(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, Optional[TimeMap]]:
+    """
+    Pasa las muestras a mono, las lleva a 16 kHz y recorta los silencios (si está habilitado).
+
+    Args:
+        samples (np.ndarray): Muestras float32 con forma (frames, canales) o (frames,)
+        sample_rate (int): Frecuencia de muestreo original
+
+    Returns:
+        Tuple[np.ndarray, Optional[TimeMap]]: Muestras mono a `TARGET_SAMPLE_RATE` y su
+            correspondencia con el audio original (None si no se recortaron silencios)
+    """
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    mono = resample(samples, sample_rate)
+    if not settings.audio_vad_enabled:
+        return mono, None
+    return trim_silence_mapped(mono, TARGET_SAMPLE_RATE)
+
+
+def preprocess_audio(data: bytes, filename: str = "audio.wav") -> PreprocessedAudio:
+    """
+    Prepara un WAV para transcribirlo: lo pasa a mono, lo lleva a 16 kHz, recorta los silencios
+    y lo vuelve a codificar como WAV PCM de 16 bits. Otros formatos se devuelven sin cambios.
+
+    Args:
+        data (bytes): Contenido del audio
+        filename (str): Nombre del archivo (su extensión indica el formato)
+
+    Returns:
+        PreprocessedAudio: Audio procesado con los bytes y segundos originales y finales
+    """
+    if not filename.lower().endswith(".wav"):
+        return PreprocessedAudio(data, filename, len(data), 0.0, 0.0)
+
+    try:
+        samples, sample_rate = read_wav(data)
+    except (wave.Error, EOFError, ValueError) as e:
+        logger.warning(f"No se pudo preprocesar '{filename}': {str(e)}")
+        return PreprocessedAudio(data, filename, len(data), 0.0, 0.0)
+
+    original_seconds = len(samples) / sample_rate if sample_rate else 0.0
+    mono, time_map = preprocess_samples(samples, sample_rate)
+
+    audio = write_wav(mono, TARGET_SAMPLE_RATE)
+    result = PreprocessedAudio(audio, filename, len(data), original_seconds, len(mono) / TARGET_SAMPLE_RATE,
+                               time_map)
+    logger.info(f"Audio preprocesado '{filename}': {result.original_bytes} -> {len(audio)} bytes, "
+                f"{result.original_seconds:.1f}s -> {result.seconds:.1f}s")
+    return result
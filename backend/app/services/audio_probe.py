@@ -0,0 +1,314 @@
+import os
+import asyncio
+import struct
+import tempfile
+import logging
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes del inicio que bastan para leer los encabezados de un WAV o un OGG
+HEADER_BYTES = 65536
+
+# kbps por índice según versión MPEG (1 o 2/2.5) y capa (1, 2 o 3)
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz por índice según los bits de versión del encabezado (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+MP3_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+
+class AudioInfo(NamedTuple):
+    format: str
+    duration: float
+    sample_rate: int = 0
+    channels: int = 0
+    bitrate: int = 0  # bits por segundo (promedio en MP3 VBR)
+
+
+class _Mp3Frame(NamedTuple):
+    length: int
+    samples: int
+    sample_rate: int
+    channels: int
+    bitrate: int
+    mpeg1: bool
+
+
+def _mp3_frame(data: bytes, offset: int) -> Optional[_Mp3Frame]:
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = 4 - ((data[offset + 1] >> 1) & 0x03)
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(1 if mpeg1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (data[offset + 2] >> 1) & 0x01
+    channels = 1 if data[offset + 3] >> 6 == 3 else 2
+
+    if layer == 1:
+        return _Mp3Frame((12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, channels, bitrate, mpeg1)
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return _Mp3Frame(samples // 8 * bitrate // sample_rate + padding, samples, sample_rate, channels, bitrate, mpeg1)
+
+
+def probe_mp3(data: bytes) -> Optional[AudioInfo]:
+    """
+    Calcula la duración de un MP3 leyendo los encabezados de frame. Si el primer frame trae un
+    encabezado Xing/Info o VBRI se usa su número de frames; si no, se recorren los frames.
+    """
+    offset = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # Tamaño synchsafe (7 bits por byte), más el pie opcional de 10 bytes
+        offset = 10 + (data[6] << 21 | data[7] << 14 | data[8] << 7 | data[9])
+        if data[5] & 0x10:
+            offset += 10
+    elif _mp3_frame(data, 0) is None:
+        # Sin etiqueta ID3 el archivo debe empezar con un frame; así no se confunden otros formatos
+        return None
+
+    # Primer frame válido seguido de otro frame válido (evita falsos sincronismos)
+    end = min(len(data), offset + HEADER_BYTES)
+    while offset < end:
+        first = _mp3_frame(data, offset)
+        if first is not None and first.length and (
+            _mp3_frame(data, offset + first.length) is not None or offset + first.length >= len(data)
+        ):
+            break
+        offset += 1
+    else:
+        return None
+
+    frames = None
+    side_info = (32 if first.channels == 2 else 17) if first.mpeg1 else (17 if first.channels == 2 else 9)
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack_from(">I", data, xing + 4)[0] & 0x01:
+        frames = struct.unpack_from(">I", data, xing + 8)[0]
+    elif data[offset + 36:offset + 40] == b"VBRI":
+        frames = struct.unpack_from(">I", data, offset + 50)[0]
+
+    if frames is not None:
+        duration = frames * first.samples / first.sample_rate
+        audio_bytes = len(data) - offset - first.length
+    else:
+        # Sin encabezado VBR: se cuentan los frames hasta el final o hasta perder el sincronismo
+        frames = 0
+        audio_bytes = 0
+        position = offset
+        while True:
+            frame = _mp3_frame(data, position)
+            if frame is None or not frame.length:
+                break
+            frames += 1
+            audio_bytes += frame.length
+            position += frame.length
+        duration = frames * first.samples / first.sample_rate
+
+    bitrate = int(audio_bytes * 8 / duration) if duration else first.bitrate
+    return AudioInfo("mp3", duration, first.sample_rate, first.channels, bitrate)
+
+
+def probe_wav(data: bytes, size: int = None) -> Optional[AudioInfo]:
+    """
+    Lee los chunks RIFF de un WAV (PCM, float o WAVE_FORMAT_EXTENSIBLE) y calcula la duración
+    a partir del tamaño del chunk de datos. Solo necesita los encabezados.
+
+    Args:
+        data (bytes): Inicio del archivo (al menos hasta el encabezado del chunk "data")
+        size (int): Tamaño total del archivo, si `data` es solo el inicio
+    """
+    if len(data) < 12 or data[:4] not in (b"RIFF", b"RF64") or data[8:12] != b"WAVE":
+        return None
+
+    size = size or len(data)
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        if chunk_id == b"fmt " and offset + 24 <= len(data):
+            _, channels, sample_rate, byte_rate = struct.unpack_from("<HHII", data, offset + 8)
+            fmt = (channels, sample_rate, byte_rate)
+        elif chunk_id == b"data":
+            if fmt is None or not fmt[2]:
+                return None
+            channels, sample_rate, byte_rate = fmt
+            # Grabaciones interrumpidas pueden declarar un tamaño mayor que el archivo (o 0xFFFFFFFF)
+            data_size = min(chunk_size, size - offset - 8)
+            return AudioInfo("wav", data_size / byte_rate, sample_rate, channels, byte_rate * 8)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def probe_ogg(data: bytes, tail: bytes = None) -> Optional[AudioInfo]:
+    """
+    Calcula la duración de un OGG Opus con la posición granular de la última página (siempre
+    a 48 kHz) menos el pre-skip del encabezado OpusHead.
+
+    Args:
+        data (bytes): Inicio del archivo (con el encabezado OpusHead)
+        tail (bytes): Final del archivo (con la última página), si `data` es solo el inicio
+    """
+    head = data.find(b"OpusHead")
+    if data[:4] != b"OggS" or head < 0 or head + 12 > len(data):
+        return None
+
+    tail = data if tail is None else tail
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail):
+        return None
+
+    granule = struct.unpack_from("<q", tail, last_page + 6)[0]
+    channels = data[head + 9]
+    pre_skip = struct.unpack_from("<H", data, head + 10)[0]
+    sample_rate = struct.unpack_from("<I", data, head + 12)[0] if head + 16 <= len(data) else 48000
+    return AudioInfo("ogg_opus", max(granule - pre_skip, 0) / 48000, sample_rate, channels)
+
+
+def probe_audio(data: bytes) -> Optional[AudioInfo]:
+    """
+    Identifica el formato de un audio en memoria por su contenido y calcula su duración,
+    sin procesos externos.
+
+    Args:
+        data (bytes): Contenido completo del audio
+
+    Returns:
+        Optional[AudioInfo]: Formato, duración y parámetros del audio, o None si el formato no
+            es WAV, MP3 ni OGG Opus o los encabezados están dañados
+    """
+    try:
+        if data[:4] in (b"RIFF", b"RF64"):
+            return probe_wav(data)
+        if data[:4] == b"OggS":
+            return probe_ogg(data)
+        return probe_mp3(data)
+    except (struct.error, IndexError, ZeroDivisionError) as e:
+        logger.debug(f"Encabezados de audio inválidos: {str(e)}")
+        return None
+
+
+def probe_path(path: Union[str, Path]) -> Optional[AudioInfo]:
+    """
+    Versión de `probe_audio` para archivos. En WAV y OGG solo lee el inicio (y el final) del
+    archivo; en MP3 sin encabezado Xing/VBRI lee el archivo completo para contar frames.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        head = f.read(HEADER_BYTES)
+        try:
+            if head[:4] in (b"RIFF", b"RF64"):
+                return probe_wav(head, size)
+            if head[:4] == b"OggS":
+                f.seek(max(size - HEADER_BYTES, 0))
+                return probe_ogg(head, f.read())
+            f.seek(0)
+            return probe_mp3(f.read())
+        except (struct.error, IndexError, ZeroDivisionError) as e:
+            logger.debug(f"Encabezados de audio inválidos en '{path.name}': {str(e)}")
+            return None
+
+
+_ffprobe_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def ffprobe_duration(path: Union[str, Path]) -> float:
+    """
+    Obtiene la duración con ffprobe sin bloquear el event loop. Las ejecuciones simultáneas se
+    limitan a `settings.ffprobe_max_concurrency` para no lanzar un proceso por cada petición.
+
+    Returns:
+        float: Duración en segundos (0.0 si ffprobe no está disponible o falla)
+    """
+    global _ffprobe_semaphore
+    if _ffprobe_semaphore is None:
+        _ffprobe_semaphore = asyncio.Semaphore(settings.ffprobe_max_concurrency)
+
+    async with _ffprobe_semaphore:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "quiet", "-show_entries", "format=duration", "-of", "csv=p=0", str(path),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            logger.warning("ffprobe no está instalado; no se puede obtener la duración")
+            return 0.0
+
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=settings.ffprobe_timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.warning(f"ffprobe excedió el tiempo máximo con '{Path(path).name}'")
+            return 0.0
+
+    try:
+        return float(stdout.decode().strip())
+    except ValueError:
+        return 0.0
+
+
+async def probe_file(path: Union[str, Path]) -> AudioInfo:
+    """
+    Obtiene el formato y la duración de un archivo de audio. WAV, MP3 y OGG Opus se leen en
+    el proceso; los demás formatos se delegan a ffprobe.
+
+    Args:
+        path (str | Path): Ruta del archivo
+
+    Returns:
+        AudioInfo: Formato y duración del audio (duración 0.0 si no se puede determinar)
+    """
+    info = await asyncio.to_thread(probe_path, path)
+    if info is not None:
+        return info
+
+    suffix = Path(path).suffix.lower().lstrip(".")
+    return AudioInfo(suffix, await ffprobe_duration(path))
+
+
+def _write_temp(data: bytes, suffix: str) -> str:
+    fd, path = tempfile.mkstemp(prefix=".probe-", suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+async def probe_data(data: bytes, filename: str) -> AudioInfo:
+    """
+    Versión de `probe_file` para audios en memoria. Los formatos sin parser propio se escriben
+    a un archivo temporal para ffprobe: MP4/M4A pueden tener el índice al final y ffprobe no
+    puede leerlos desde una tubería.
+
+    Args:
+        data (bytes): Contenido del audio
+        filename (str): Nombre del archivo (su extensión ayuda a ffprobe a reconocer el formato)
+
+    Returns:
+        AudioInfo: Formato y duración del audio (duración 0.0 si no se puede determinar)
+    """
+    info = await asyncio.to_thread(probe_audio, data)
+    if info is not None:
+        return info
+
+    suffix = Path(filename).suffix.lower()
+    temp_path = await asyncio.to_thread(_write_temp, data, suffix)
+    try:
+        return AudioInfo(suffix.lstrip("."), await ffprobe_duration(temp_path))
+    finally:
+        await asyncio.to_thread(os.unlink, temp_path)
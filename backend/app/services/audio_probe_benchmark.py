@@ -0,0 +1,95 @@
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Callable, List
+from app.services.metrics import LatencyStats
+from app.services.audio_probe import probe_file, probe_path
+
+
+def ffprobe_subprocess(path: Path) -> float:
+    """
+    Lo que hacía antes `/transcription/upload`: un proceso ffprobe síncrono por archivo.
+    """
+    result = subprocess.run([
+        "ffprobe", "-v", "quiet", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)
+    ], capture_output=True, text=True)
+    return float(result.stdout.strip() or 0.0)
+
+
+def benchmark_sync(probe: Callable[[Path], object], files: List[Path], iterations: int) -> dict:
+    """
+    Mide la latencia de una función de sondeo llamándola en serie sobre cada archivo.
+    """
+    latency = LatencyStats()
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        call_started_at = time.perf_counter()
+        probe(files[i % len(files)])
+        latency.observe(time.perf_counter() - call_started_at)
+    return _result(latency, iterations, time.perf_counter() - started_at)
+
+
+async def benchmark_async(files: List[Path], iterations: int, concurrency: int) -> dict:
+    """
+    Mide `probe_file` con varias peticiones simultáneas, como bajo carga en el endpoint de subida.
+    """
+    latency = LatencyStats()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(i: int):
+        async with semaphore:
+            call_started_at = time.perf_counter()
+            await probe_file(files[i % len(files)])
+            latency.observe(time.perf_counter() - call_started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in range(iterations)))
+    return _result(latency, iterations, time.perf_counter() - started_at)
+
+
+def _result(latency: LatencyStats, iterations: int, elapsed: float) -> dict:
+    snapshot = latency.snapshot()
+    return {
+        "calls": iterations,
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(iterations / elapsed, 1) if elapsed else 0.0,
+        "latency_avg_ms": round(snapshot["avg"] * 1000, 3),
+        "latency_p95_ms": round(snapshot["p95"] * 1000, 3),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara el parser de encabezados de audio con ffprobe")
+    parser.add_argument("files", nargs="+", type=Path, help="Audios de prueba")
+    parser.add_argument("--iterations", type=int, default=200, help="Sondeos por método")
+    parser.add_argument("--concurrency", type=int, default=16, help="Sondeos simultáneos en la prueba asíncrona")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        info = probe_path(path)
+        print(f"{path.name}: {info if info is not None else 'sin parser propio (usa ffprobe)'}")
+
+    results = {"parser": benchmark_sync(probe_path, args.files, args.iterations)}
+    results[f"parser async x{args.concurrency}"] = asyncio.run(
+        benchmark_async(args.files, args.iterations, args.concurrency)
+    )
+    try:
+        results["ffprobe subprocess"] = benchmark_sync(ffprobe_subprocess, args.files, args.iterations)
+    except FileNotFoundError:
+        print("ffprobe no está instalado; se omite la comparación")
+
+    columns = ["method", *next(iter(results.values()))]
+    rows = [{"method": name, **result} for name, result in results.items()]
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print()
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
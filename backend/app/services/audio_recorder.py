@@ -0,0 +1,214 @@
+import wave
+import threading
+import logging
+from pathlib import Path
+from typing import Callable, Optional, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def default_stream_factory(**kwargs):
+    """
+    Crea el stream de entrada del micrófono. sounddevice se importa aquí para que el
+    grabador pueda usarse (y probarse con un stream falso) sin PortAudio instalado.
+    """
+    import sounddevice as sd
+    return sd.InputStream(**kwargs)
+
+
+class AudioRecorder:
+    """
+    Grabador sin cortes basado en callbacks.
+
+    El stream de entrada llama a `_callback` con cada bloque capturado, que solo copia las
+    muestras a un buffer circular preasignado. Un hilo escritor vacía el buffer al WAV a
+    medida que se llena, así la memoria usada no depende de la duración de la grabación.
+    Al pausar se descartan los bloques entrantes sin detener el stream; al detener se espera
+    a que el escritor guarde todo lo capturado.
+
+    El stream se crea con `stream_factory(samplerate=, channels=, dtype=, blocksize=, callback=)`
+    y debe tener `start()`, `stop()` y `close()`, como `sounddevice.InputStream`.
+    """
+
+    def __init__(self, path: Union[str, Path], samplerate: int = 44100, channels: int = 1,
+                 buffer_seconds: float = 10.0, blocksize: int = 0,
+                 stream_factory: Callable = None, on_audio: Callable[[np.ndarray], None] = None):
+        """
+        Args:
+            path (str | Path): Ruta del WAV de salida
+            samplerate (int): Frecuencia de muestreo (Hz)
+            channels (int): Canales a grabar
+            buffer_seconds (float): Capacidad del buffer circular en segundos
+            blocksize (int): Frames por callback (0 = los que elija el dispositivo)
+            stream_factory (Callable): Crea el stream de entrada. Por defecto `sounddevice.InputStream`
+            on_audio (Callable): Se llama desde el hilo escritor con cada bloque guardado
+        """
+        self.path = Path(path)
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.stream_factory = stream_factory or default_stream_factory
+        self.on_audio = on_audio
+
+        self.capacity = max(int(buffer_seconds * samplerate), 1)
+        self._buffer = np.zeros((self.capacity, channels), dtype=np.int16)
+        # Posiciones absolutas (frames desde el inicio); la posición en el buffer es el módulo
+        self._write_pos = 0
+        self._read_pos = 0
+        self._cond = threading.Condition()
+
+        self._paused = threading.Event()
+        self._stopping = False
+        self._stream = None
+        self._writer: Optional[threading.Thread] = None
+        self._wav: Optional[wave.Wave_write] = None
+
+        self.frames_written = 0
+        self.dropped_frames = 0
+        self.input_overflows = 0
+
+    @property
+    def paused(self) -> bool:
+        return self._paused.is_set()
+
+    @property
+    def seconds(self) -> float:
+        """
+        Segundos de audio guardados en el archivo.
+        """
+        return self.frames_written / self.samplerate
+
+    def _callback(self, indata: np.ndarray, frames: int, time_info, status):
+        # Hilo de audio: solo copia al buffer, sin bloquear ni reservar memoria
+        if status:
+            self.input_overflows += 1
+        if self._paused.is_set() or self._stopping:
+            return
+
+        with self._cond:
+            free = self.capacity - (self._write_pos - self._read_pos)
+            if frames > free:
+                # El escritor no alcanzó a vaciar el buffer: se pierde lo que no cabe
+                self.dropped_frames += frames - free
+                frames = free
+            start = self._write_pos % self.capacity
+            first = min(frames, self.capacity - start)
+            self._buffer[start:start + first] = indata[:first]
+            self._buffer[:frames - first] = indata[first:frames]
+            self._write_pos += frames
+            self._cond.notify()
+
+    def _drain(self) -> bool:
+        with self._cond:
+            while self._write_pos == self._read_pos and not self._stopping:
+                self._cond.wait(timeout=0.5)
+            read_pos, write_pos = self._read_pos, self._write_pos
+
+        if write_pos == read_pos:
+            return False
+
+        start = read_pos % self.capacity
+        end = start + (write_pos - read_pos)
+        if end <= self.capacity:
+            block = self._buffer[start:end].copy()
+        else:
+            block = np.concatenate((self._buffer[start:], self._buffer[:end - self.capacity]))
+
+        # Se libera el espacio después de copiar, para que el callback no lo sobrescriba antes
+        with self._cond:
+            self._read_pos = write_pos
+
+        self._wav.writeframes(block.tobytes())
+        self.frames_written += len(block)
+        if self.on_audio is not None:
+            try:
+                self.on_audio(block)
+            except Exception as e:
+                logger.error(f"Error procesando el audio grabado: {str(e)}")
+        return True
+
+    def _write_loop(self):
+        while self._drain() or not self._stopping:
+            pass
+
+    def start(self):
+        """
+        Abre el WAV de salida, arranca el hilo escritor y empieza a capturar.
+
+        Raises:
+            Exception: Si no se puede abrir o iniciar el dispositivo de entrada. El hilo escritor
+                se detiene y el WAV vacío se elimina antes de propagar el error
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._wav = wave.open(str(self.path), "wb")
+        self._wav.setnchannels(self.channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(self.samplerate)
+
+        self._writer = threading.Thread(target=self._write_loop, name="audio-writer", daemon=True)
+        self._writer.start()
+
+        try:
+            self._stream = self.stream_factory(
+                samplerate=self.samplerate,
+                channels=self.channels,
+                dtype="int16",
+                blocksize=self.blocksize,
+                callback=self._callback
+            )
+            self._stream.start()
+        except Exception:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+            self.stop()
+            self.path.unlink(missing_ok=True)
+            raise
+
+    def pause(self):
+        """
+        Deja de guardar audio sin cerrar el stream (reanudar no tiene latencia).
+        """
+        self._paused.set()
+
+    def resume(self):
+        """
+        Vuelve a guardar audio después de `pause`.
+        """
+        self._paused.clear()
+
+    def stop(self) -> int:
+        """
+        Detiene la captura y espera a que se guarde todo lo capturado.
+
+        Returns:
+            int: Frames guardados en el archivo
+        """
+        if self._stream is not None:
+            # stop() espera a que terminen los callbacks pendientes
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+        if self.dropped_frames or self.input_overflows:
+            logger.warning(f"Grabación '{self.path.name}': {self.dropped_frames} frames perdidos, "
+                           f"{self.input_overflows} desbordes de entrada")
+        return self.frames_written
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
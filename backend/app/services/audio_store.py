@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AudioArtifact(NamedTuple):
+    artifact_id: str
+    path: str
+    size: int
+    created_at: float
+
+
+class AudioArtifactStore:
+    """
+    Almacén de los audios generados, con IDs únicos y un índice en memoria.
+
+    Cada audio recibe un ID aleatorio (sin colisiones entre peticiones concurrentes ni entre
+    workers) y se guarda en un subdirectorio según los dos primeros caracteres del ID.
+    El directorio se recorre una sola vez al iniciar; después las consultas usan el índice.
+    Los audios más antiguos que `max_age` o que excedan `max_bytes` se eliminan.
+    Los audios recientes se mantienen también en memoria para servirlos sin leer el disco.
+    """
+
+    def __init__(self, directory: str, max_age: float = 0, max_bytes: int = 0, extension: str = ".mp3",
+                 memory_max_bytes: int = 0):
+        """
+        Args:
+            directory (str): Carpeta raíz de los audios
+            max_age (float): Segundos que se conserva un audio (0 = sin límite)
+            max_bytes (int): Máximo de bytes en total (0 = sin límite)
+            extension (str): Extensión por defecto de los archivos
+            memory_max_bytes (int): Máximo de bytes de audios recientes en memoria (0 = ninguno)
+        """
+        self.directory = Path(directory)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.memory_max_bytes = memory_max_bytes
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self.memory_hits = 0
+        self.disk_reads = 0
+
+        # Ordenado por fecha de creación: los primeros son los más antiguos
+        self._index: "OrderedDict[str, AudioArtifact]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.removed = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        artifacts = []
+        for path in self.directory.rglob("*"):
+            if path.name.startswith(".") or not path.is_file():
+                continue
+            stat = path.stat()
+            artifacts.append(AudioArtifact(path.stem, str(path), stat.st_size, stat.st_mtime))
+
+        for artifact in sorted(artifacts, key=lambda a: a.created_at):
+            self._index[artifact.artifact_id] = artifact
+            self._total_bytes += artifact.size
+
+        logger.info(f"Almacén de audio '{self.directory}': {len(self._index)} archivos, {self._total_bytes} bytes")
+
+    def _remember(self, artifact_id: str, data: bytes):
+        if len(data) > self.memory_max_bytes:
+            return
+        self._memory[artifact_id] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _remove(self, artifact_id: str):
+        artifact = self._index.pop(artifact_id)
+        self._total_bytes -= artifact.size
+        self.removed += 1
+        data = self._memory.pop(artifact_id, None)
+        if data is not None:
+            self._memory_bytes -= len(data)
+        try:
+            os.remove(artifact.path)
+        except FileNotFoundError:
+            pass
+
+    def _collect(self) -> int:
+        removed = 0
+        if self.max_age:
+            limit = time.time() - self.max_age
+            while self._index and next(iter(self._index.values())).created_at < limit:
+                self._remove(next(iter(self._index)))
+                removed += 1
+
+        if self.max_bytes:
+            while self._index and self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._index)))
+                removed += 1
+
+        return removed
+
+    def save(self, data: bytes, extension: str = None) -> AudioArtifact:
+        """
+        Guarda un audio con un ID nuevo.
+
+        Args:
+            data (bytes): Contenido del audio
+            extension (str): Extensión del archivo. Por defecto la del almacén
+
+        Returns:
+            AudioArtifact: ID, ruta, tamaño y fecha de creación del audio
+        """
+        artifact_id = uuid.uuid4().hex
+        path = self.directory / artifact_id[:2] / f"{artifact_id}{extension or self.extension}"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+
+        artifact = AudioArtifact(artifact_id, str(path), len(data), time.time())
+        with self._lock:
+            self._index[artifact_id] = artifact
+            self._total_bytes += artifact.size
+            self._remember(artifact_id, data)
+            removed = self._collect()
+
+        if removed:
+            logger.info(f"Almacén de audio: {removed} archivos antiguos eliminados")
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[AudioArtifact]:
+        """
+        Busca un audio por su ID. Si no está en el índice se busca en su subdirectorio,
+        porque pudo haberlo guardado otro worker.
+        """
+        artifact = self._index.get(artifact_id)
+        if artifact is not None or not artifact_id.isalnum():
+            return artifact
+
+        for path in (self.directory / artifact_id[:2]).glob(f"{artifact_id}.*"):
+            stat = path.stat()
+            artifact = AudioArtifact(artifact_id, str(path), stat.st_size, stat.st_mtime)
+            with self._lock:
+                if artifact_id not in self._index:
+                    self._index[artifact_id] = artifact
+                    self._total_bytes += artifact.size
+            return artifact
+
+        return None
+
+    async def get_async(self, artifact_id: str) -> Optional[AudioArtifact]:
+        """
+        Versión de `get` para el event loop: la búsqueda en el subdirectorio se hace en un hilo.
+        """
+        artifact = self._index.get(artifact_id)
+        if artifact is not None or not artifact_id.isalnum():
+            return artifact
+        return await asyncio.to_thread(self.get, artifact_id)
+
+    def read(self, artifact_id: str) -> Optional[bytes]:
+        """
+        Obtiene el contenido de un audio, desde memoria si es reciente.
+
+        Returns:
+            Optional[bytes]: Contenido del audio, o None si no existe
+        """
+        data = self._memory.get(artifact_id)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+
+        artifact = self.get(artifact_id)
+        if artifact is None:
+            return None
+
+        try:
+            with open(artifact.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        self.disk_reads += 1
+        return data
+
+    async def read_async(self, artifact_id: str) -> Optional[bytes]:
+        """
+        Versión de `read` para el event loop: la lectura del disco se hace en un hilo.
+        """
+        data = self._memory.get(artifact_id)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+        return await asyncio.to_thread(self.read, artifact_id)
+
+    def list(self) -> List[AudioArtifact]:
+        """
+        Lista los audios guardados, del más antiguo al más reciente.
+        """
+        with self._lock:
+            return list(self._index.values())
+
+    def delete(self, artifact_id: str) -> bool:
+        """
+        Elimina un audio. Devuelve False si no existía.
+        """
+        with self._lock:
+            if artifact_id not in self._index:
+                return False
+            self._remove(artifact_id)
+            return True
+
+    def clear(self) -> int:
+        """
+        Elimina todos los audios guardados.
+
+        Returns:
+            int: Número de audios eliminados
+        """
+        with self._lock:
+            artifact_ids = list(self._index)
+            for artifact_id in artifact_ids:
+                self._remove(artifact_id)
+            return len(artifact_ids)
+
+    def collect(self) -> int:
+        """
+        Aplica la política de retención (antigüedad y tamaño total).
+
+        Returns:
+            int: Número de audios eliminados
+        """
+        with self._lock:
+            return self._collect()
+
+    def get_stats(self) -> dict:
+        return {
+            "files": len(self._index),
+            "bytes": self._total_bytes,
+            "max_age": self.max_age,
+            "max_bytes": self.max_bytes,
+            "removed": self.removed,
+            "memory_bytes": self._memory_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_reads": self.disk_reads
+        }
@@ -0,0 +1,166 @@
+import os
+import asyncio
+import tempfile
+import threading
+import subprocess
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Union
+import numpy as np
+from app.config.settings import settings
+from app.services.metrics import ConcurrencyLimiter
+from app.services.audio_preprocess import TARGET_SAMPLE_RATE, PreprocessedAudio, trim_silence_mapped, write_wav
+
+logger = logging.getLogger(__name__)
+
+
+class TranscodeError(Exception):
+    """
+    No se pudo decodificar el audio (formato dañado, no soportado o ffmpeg no disponible).
+    """
+
+
+def transcode_audio(audio: Union[bytes, str], filename: str, trim: bool = True) -> PreprocessedAudio:
+    """
+    Decodifica un audio comprimido (Opus, AAC, FLAC, ...) con ffmpeg a PCM mono de 16 kHz,
+    recorta los silencios y lo codifica como WAV. Se ejecuta en un proceso del pool.
+
+    Args:
+        audio (bytes | str): Contenido del audio o ruta del archivo
+        filename (str): Nombre del archivo (su extensión ayuda a ffmpeg a reconocer el formato)
+        trim (bool): Si se recortan los silencios
+
+    Returns:
+        PreprocessedAudio: WAV resultante con los bytes y segundos originales y finales
+
+    Raises:
+        TranscodeError: Si ffmpeg no está instalado o no puede decodificar el audio
+    """
+    temp_path = None
+    if isinstance(audio, bytes):
+        # ffmpeg necesita un archivo (no una tubería) para leer MP4/M4A con el índice al final
+        fd, temp_path = tempfile.mkstemp(prefix=".transcode-", suffix=Path(filename).suffix)
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+    source = temp_path or str(audio)
+    original_bytes = len(audio) if isinstance(audio, bytes) else os.path.getsize(source)
+
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", source,
+             "-f", "f32le", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "pipe:1"],
+            capture_output=True,
+            timeout=settings.transcode_timeout
+        )
+    except FileNotFoundError as e:
+        raise TranscodeError("ffmpeg no está instalado") from e
+    except subprocess.TimeoutExpired as e:
+        raise TranscodeError(f"ffmpeg excedió el tiempo máximo con '{filename}'") from e
+    finally:
+        if temp_path:
+            os.unlink(temp_path)
+
+    if result.returncode != 0:
+        raise TranscodeError(f"No se pudo decodificar '{filename}': {result.stderr.decode(errors='replace').strip()}")
+
+    samples = np.frombuffer(result.stdout, dtype="<f4")
+    original_seconds = len(samples) / TARGET_SAMPLE_RATE
+    time_map = None
+    if trim and settings.audio_vad_enabled:
+        samples, time_map = trim_silence_mapped(samples, TARGET_SAMPLE_RATE)
+
+    wav = write_wav(samples, TARGET_SAMPLE_RATE)
+    return PreprocessedAudio(wav, f"{Path(filename).stem}.wav", original_bytes, original_seconds,
+                             len(samples) / TARGET_SAMPLE_RATE, time_map)
+
+
+class AudioTranscoder:
+    """
+    Etapa de transcodificación con un pool de procesos acotado.
+
+    La decodificación (ffmpeg) y el recorte de silencios (NumPy) usan CPU; en procesos
+    aparte no compiten con el event loop. Las peticiones que exceden el pool esperan en
+    un semáforo, con métricas de espera y latencia, en lugar de acumularse en la cola
+    del executor.
+    """
+
+    def __init__(self, workers: int = None):
+        """
+        Args:
+            workers (int): Procesos del pool. Por defecto `settings.transcode_workers`
+        """
+        self.workers = workers or settings.transcode_workers
+        self.limiter = ConcurrencyLimiter(self.workers, name="transcode")
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.files = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.errors = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _record(self, result: PreprocessedAudio):
+        self.files += 1
+        self.input_bytes += result.original_bytes
+        self.output_bytes += len(result.audio)
+        logger.info(f"Audio transcodificado '{result.filename}': {result.original_bytes} -> {len(result.audio)} bytes, "
+                    f"{result.original_seconds:.1f}s -> {result.seconds:.1f}s")
+
+    async def transcode(self, audio: Union[bytes, str, Path], filename: str, trim: bool = True) -> PreprocessedAudio:
+        """
+        Transcodifica un audio en el pool de procesos sin bloquear el event loop.
+
+        Raises:
+            TranscodeError: Si no se puede decodificar el audio
+        """
+        source = audio if isinstance(audio, bytes) else str(audio)
+        async with self.limiter.slot():
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), transcode_audio, source, filename, trim
+                )
+            except Exception:
+                self.errors += 1
+                raise
+        self._record(result)
+        return result
+
+    def transcode_sync(self, audio: Union[bytes, str, Path], filename: str, trim: bool = True) -> PreprocessedAudio:
+        """
+        Versión síncrona de `transcode` para scripts de consola; se ejecuta en el proceso actual.
+        """
+        try:
+            result = transcode_audio(audio if isinstance(audio, bytes) else str(audio), filename, trim)
+        except Exception:
+            self.errors += 1
+            raise
+        self._record(result)
+        return result
+
+    def close(self):
+        """
+        Detiene el pool de procesos.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def get_stats(self) -> dict:
+        """
+        Obtiene los archivos transcodificados, bytes de entrada y salida, errores y uso del pool.
+        """
+        return {
+            "workers": self.workers,
+            "files": self.files,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "errors": self.errors,
+            **self.limiter.snapshot()
+        }
@@ -0,0 +1,113 @@
+import asyncio
+import re
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Fin de oración: signo de cierre seguido de espacio o salto de línea
+SENTENCE_END = re.compile(r"(?<=[.!?…:])\s+|\n+")
+
+
+class SentenceSplitter:
+    """
+    Acumula fragmentos de texto y devuelve oraciones completas en cuanto se cierran.
+    Las oraciones demasiado cortas se unen con la siguiente para no sintetizar audios mínimos.
+    """
+
+    def __init__(self, min_length: int = 20):
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Agrega un fragmento y devuelve las oraciones que quedaron completas.
+
+        Args:
+            text (str): Fragmento de texto recibido del modelo
+
+        Returns:
+            List[str]: Oraciones completas (puede estar vacía)
+        """
+        self._buffer += text.replace('*', '')
+        sentences = []
+        start = 0
+
+        for match in SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) >= self.min_length:
+                sentences.append(candidate)
+                start = match.end()
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """
+        Devuelve el texto pendiente al terminar el stream.
+
+        Returns:
+            List[str]: La última oración, si quedó texto
+        """
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+class SpeechChunk(NamedTuple):
+    index: int
+    text: str
+    audio: bytes
+
+
+async def stream_speech(
+    tokens: AsyncIterator[str],
+    synthesize: Callable[[str], Awaitable[bytes]],
+    min_sentence_length: int = 20
+) -> AsyncIterator[SpeechChunk]:
+    """
+    Corta el stream de texto en oraciones y sintetiza cada una en cuanto se completa,
+    mientras el modelo sigue generando. Los fragmentos se entregan en orden.
+
+    Args:
+        tokens: Stream de fragmentos de texto del modelo
+        synthesize: Función asíncrona que convierte una oración en audio
+        min_sentence_length (int): Largo mínimo de una oración antes de sintetizarla
+
+    Yields:
+        SpeechChunk: Índice, texto y audio de cada oración
+    """
+    splitter = SentenceSplitter(min_sentence_length)
+    pending: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        # Lanza la síntesis de cada oración sin esperar a que terminen las anteriores
+        try:
+            index = 0
+            async for token in tokens:
+                for sentence in splitter.feed(token):
+                    await pending.put((index, sentence, asyncio.create_task(synthesize(sentence))))
+                    index += 1
+            for sentence in splitter.flush():
+                await pending.put((index, sentence, asyncio.create_task(synthesize(sentence))))
+        finally:
+            await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            index, sentence, task = item
+            yield SpeechChunk(index, sentence, await task)
+
+        # Propaga errores del modelo ocurridos durante el stream
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+        while not pending.empty():
+            item = pending.get_nowait()
+            if item is not None:
+                item[2].cancel()
@@ -0,0 +1,404 @@
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional, Tuple
+from app.config.settings import settings
+from app.models.schemas import ChatMessage, HistorySummary
+
+logger = logging.getLogger(__name__)
+
+# Roles abreviados para la serialización compacta
+ROLE_CODES = {"user": "u", "assistant": "a"}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+
+def serialize_message(message: ChatMessage) -> str:
+    """
+    Serializa un mensaje en JSON compacto con claves cortas y timestamp epoch.
+    """
+    payload = {
+        "r": ROLE_CODES.get(message.role, message.role),
+        "c": message.content,
+    }
+    if message.timestamp:
+        payload["t"] = round(message.timestamp.timestamp(), 3)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def deserialize_message(raw) -> ChatMessage:
+    """
+    Reconstruye un mensaje serializado con `serialize_message`.
+    """
+    payload = json.loads(raw)
+    return ChatMessage(
+        role=ROLE_NAMES.get(payload["r"], payload["r"]),
+        content=payload["c"],
+        timestamp=datetime.fromtimestamp(payload["t"]) if "t" in payload else None
+    )
+
+
+class ConversationStore(ABC):
+    """
+    Almacenamiento del historial de conversaciones del chat.
+    """
+
+    @abstractmethod
+    async def get(self, conversation_id: str) -> Optional[List[ChatMessage]]:
+        """
+        Obtiene el historial de una conversación, o None si no existe.
+        """
+
+    @abstractmethod
+    async def append(self, conversation_id: str, *messages: ChatMessage):
+        """
+        Agrega mensajes al final de una conversación, creándola si no existe.
+        """
+
+    @abstractmethod
+    async def delete(self, conversation_id: str) -> bool:
+        """
+        Elimina una conversación. Devuelve False si no existía.
+        """
+
+    @abstractmethod
+    async def items(self) -> List[Tuple[str, List[ChatMessage]]]:
+        """
+        Lista todas las conversaciones activas con su historial.
+        """
+
+    @abstractmethod
+    async def get_summary(self, conversation_id: str) -> Optional[HistorySummary]:
+        """
+        Obtiene el resumen acumulado de los mensajes antiguos de una conversación.
+        """
+
+    @abstractmethod
+    async def set_summary(self, conversation_id: str, summary: HistorySummary):
+        """
+        Guarda el resumen acumulado de los mensajes antiguos de una conversación.
+        """
+
+    async def start(self):
+        """
+        Inicia las tareas en segundo plano del almacenamiento.
+        """
+
+    async def close(self):
+        """
+        Libera los recursos del almacenamiento.
+        """
+
+    def get_stats(self) -> dict:
+        """
+        Obtiene información del almacenamiento.
+        """
+        return {"backend": type(self).__name__}
+
+
+class _MemoryEntry:
+    __slots__ = ("messages", "summary", "size", "last_access")
+
+    def __init__(self):
+        self.messages: List[ChatMessage] = []
+        self.summary: Optional[HistorySummary] = None
+        self.size = 0
+        self.last_access = time.monotonic()
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Almacenamiento en memoria del proceso. Solo sirve con un único worker.
+
+    Las conversaciones expiran tras `ttl` segundos sin actividad y, si se supera el máximo
+    de conversaciones o de bytes, se descartan las usadas hace más tiempo (LRU).
+    Un barrido en segundo plano elimina las conversaciones expiradas.
+    """
+
+    # Costo aproximado en bytes de un mensaje además de su contenido
+    MESSAGE_OVERHEAD = 120
+
+    def __init__(self, ttl: int = None, max_conversations: int = None,
+                 max_bytes: int = None, sweep_interval: float = None):
+        """
+        Args:
+            ttl (int): Segundos de inactividad antes de que expire una conversación (0 = no expiran)
+            max_conversations (int): Máximo de conversaciones en memoria (0 = sin límite)
+            max_bytes (int): Máximo aproximado de bytes ocupados por los mensajes (0 = sin límite)
+            sweep_interval (float): Segundos entre barridos de conversaciones expiradas (0 = sin barrido)
+        """
+        self.ttl = settings.conversation_ttl if ttl is None else ttl
+        self.max_conversations = settings.conversation_max_count if max_conversations is None else max_conversations
+        self.max_bytes = settings.conversation_max_bytes if max_bytes is None else max_bytes
+        self.sweep_interval = settings.conversation_sweep_interval if sweep_interval is None else sweep_interval
+
+        self._conversations: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self.evictions = 0
+        self.expirations = 0
+
+    def _message_size(self, message: ChatMessage) -> int:
+        return len(message.content.encode("utf-8")) + self.MESSAGE_OVERHEAD
+
+    def _remove(self, conversation_id: str) -> bool:
+        entry = self._conversations.pop(conversation_id, None)
+        if entry is None:
+            return False
+        self._total_bytes -= entry.size
+        return True
+
+    def _is_expired(self, entry: _MemoryEntry, now: float) -> bool:
+        return bool(self.ttl) and now - entry.last_access > self.ttl
+
+    def _touch(self, conversation_id: str) -> Optional[_MemoryEntry]:
+        entry = self._conversations.get(conversation_id)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if self._is_expired(entry, now):
+            self._remove(conversation_id)
+            self.expirations += 1
+            return None
+
+        entry.last_access = now
+        self._conversations.move_to_end(conversation_id)
+        return entry
+
+    def _over_limit(self) -> bool:
+        return bool(self.max_conversations) and len(self._conversations) > self.max_conversations \
+            or bool(self.max_bytes) and self._total_bytes > self.max_bytes
+
+    def _evict(self, keep: str):
+        # Descarta las conversaciones menos recientes hasta cumplir los límites
+        while self._over_limit() and len(self._conversations) > 1:
+            oldest = next(iter(self._conversations))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+            logger.info(f"Conversación {oldest} descartada por límite de memoria")
+
+    async def get(self, conversation_id: str) -> Optional[List[ChatMessage]]:
+        entry = self._touch(conversation_id)
+        return list(entry.messages) if entry is not None else None
+
+    async def append(self, conversation_id: str, *messages: ChatMessage):
+        entry = self._touch(conversation_id)
+        if entry is None:
+            entry = _MemoryEntry()
+            self._conversations[conversation_id] = entry
+
+        added = sum(self._message_size(m) for m in messages)
+        entry.messages.extend(messages)
+        entry.size += added
+        self._total_bytes += added
+        self._evict(keep=conversation_id)
+
+    async def delete(self, conversation_id: str) -> bool:
+        return self._remove(conversation_id)
+
+    async def get_summary(self, conversation_id: str) -> Optional[HistorySummary]:
+        entry = self._touch(conversation_id)
+        return entry.summary if entry is not None else None
+
+    async def set_summary(self, conversation_id: str, summary: HistorySummary):
+        entry = self._touch(conversation_id)
+        if entry is None:
+            return
+
+        old_size = len(entry.summary.text.encode("utf-8")) if entry.summary else 0
+        new_size = len(summary.text.encode("utf-8"))
+        entry.summary = summary
+        entry.size += new_size - old_size
+        self._total_bytes += new_size - old_size
+
+    async def items(self) -> List[Tuple[str, List[ChatMessage]]]:
+        self.sweep()
+        return [(cid, list(entry.messages)) for cid, entry in self._conversations.items()]
+
+    def sweep(self) -> int:
+        """
+        Elimina las conversaciones expiradas. Como el diccionario está en orden LRU (cada acceso
+        mueve la conversación al final), se recorre desde la más antigua y se detiene en la
+        primera que no expiró: el costo depende de las expiradas, no del total.
+
+        Returns:
+            int: Número de conversaciones eliminadas
+        """
+        now = time.monotonic()
+        expired = 0
+        while self._conversations:
+            oldest, entry = next(iter(self._conversations.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._remove(oldest)
+            expired += 1
+
+        self.expirations += expired
+        if expired:
+            logger.info(f"Barrido de conversaciones: {expired} expiradas")
+        return expired
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error en el barrido de conversaciones: {type(e).__name__}: {str(e)}")
+
+    async def start(self):
+        if self._sweeper is None and self.ttl and self.sweep_interval:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "conversations": len(self._conversations),
+            "bytes": self._total_bytes,
+            "max_conversations": self.max_conversations,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Almacenamiento en Redis compartido entre workers y contenedores.
+
+    Cada conversación es una lista `conv:msg:{id}` con un mensaje serializado por elemento y
+    un TTL que se renueva con cada mensaje; su resumen se guarda en `conv:sum:{id}`. El índice
+    `conv:idx` (sorted set por última actividad) permite listar conversaciones sin usar KEYS/SCAN.
+    Cada tipo de clave tiene su propio prefijo, así ningún id enviado por el cliente (por
+    ejemplo "idx" o "foo:summary") puede apuntar a la clave de otro tipo o de otra conversación.
+    """
+
+    def __init__(self, client=None, ttl: int = None, prefix: str = "conv:"):
+        """
+        Args:
+            client: Cliente `redis.asyncio.Redis`. Si es None, se crea con la configuración de settings
+            ttl (int): Segundos de inactividad antes de que expire una conversación (0 = no expiran)
+            prefix (str): Prefijo de las claves de conversación
+        """
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                password=settings.redis_password or None
+            )
+
+        self.client = client
+        self.ttl = settings.conversation_ttl if ttl is None else ttl
+        self.prefix = prefix
+        self.index_key = f"{prefix}idx"
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.prefix}msg:{conversation_id}"
+
+    def _summary_key(self, conversation_id: str) -> str:
+        return f"{self.prefix}sum:{conversation_id}"
+
+    async def get(self, conversation_id: str) -> Optional[List[ChatMessage]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.exists(self._key(conversation_id))
+            pipe.lrange(self._key(conversation_id), 0, -1)
+            exists, raw_messages = await pipe.execute()
+
+        if not exists:
+            return None
+        return [deserialize_message(raw) for raw in raw_messages]
+
+    async def append(self, conversation_id: str, *messages: ChatMessage):
+        if not messages:
+            return
+
+        key = self._key(conversation_id)
+        # Un solo round-trip: agregar mensajes, renovar TTL y actualizar el índice
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, *[serialize_message(m) for m in messages])
+            if self.ttl:
+                pipe.expire(key, self.ttl)
+                pipe.expire(self._summary_key(conversation_id), self.ttl)
+            pipe.zadd(self.index_key, {conversation_id: time.time()})
+            await pipe.execute()
+
+    async def delete(self, conversation_id: str) -> bool:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(self._key(conversation_id))
+            pipe.delete(self._summary_key(conversation_id))
+            pipe.zrem(self.index_key, conversation_id)
+            deleted, _, _ = await pipe.execute()
+        return bool(deleted)
+
+    async def get_summary(self, conversation_id: str) -> Optional[HistorySummary]:
+        raw = await self.client.get(self._summary_key(conversation_id))
+        return HistorySummary.model_validate_json(raw) if raw else None
+
+    async def set_summary(self, conversation_id: str, summary: HistorySummary):
+        await self.client.set(self._summary_key(conversation_id), summary.model_dump_json(), ex=self.ttl or None)
+
+    async def items(self) -> List[Tuple[str, List[ChatMessage]]]:
+        # Quita del índice las conversaciones que ya expiraron por TTL
+        if self.ttl:
+            await self.client.zremrangebyscore(self.index_key, "-inf", time.time() - self.ttl)
+        conversation_ids = [
+            cid.decode() if isinstance(cid, bytes) else cid
+            for cid in await self.client.zrange(self.index_key, 0, -1)
+        ]
+        if not conversation_ids:
+            return []
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for cid in conversation_ids:
+                pipe.lrange(self._key(cid), 0, -1)
+            results = await pipe.execute()
+
+        return [
+            (cid, [deserialize_message(raw) for raw in raw_messages])
+            for cid, raw_messages in zip(conversation_ids, results)
+            if raw_messages
+        ]
+
+    async def close(self):
+        await self.client.aclose()
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "host": settings.redis_host,
+            "db": settings.redis_db,
+            "ttl": self.ttl
+        }
+
+
+def create_conversation_store() -> ConversationStore:
+    """
+    Crea el almacenamiento de conversaciones indicado en `settings.conversation_store`.
+
+    Returns:
+        ConversationStore: Implementación en memoria o en Redis
+    """
+    backend = settings.conversation_store.lower()
+    logger.info(f"Almacenamiento de conversaciones: {backend}")
+
+    if backend == "redis":
+        return RedisConversationStore()
+    if backend == "memory":
+        return InMemoryConversationStore()
+
+    raise ValueError(f"Almacenamiento de conversaciones no soportado: {settings.conversation_store}")
@@ -0,0 +1,119 @@
+import logging
+from typing import List, Optional, Tuple
+from app.config.settings import settings
+from app.models.schemas import ChatMessage, HistorySummary
+from app.services.conversation_store import ConversationStore
+from app.services.llm_service import LLMService, USER_LABEL, ASSISTANT_LABEL
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+Resume la siguiente entrevista vocacional entre un estudiante y la Tortuga Seleccionadora de ESPOL.
+Conserva los intereses, habilidades, preferencias y sueños que mencionó el estudiante, las preguntas
+que ya se hicieron y cualquier veredicto dado. Responde solo con el resumen, en máximo {max_words} palabras.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima los tokens de un texto (aproximadamente 4 caracteres por token en español).
+    """
+    return len(text) // 4 + 1
+
+
+class HistoryCompactor:
+    """
+    Mantiene el historial enviado a Gemini dentro de un presupuesto de tokens por turno.
+
+    Cuando el resumen más los mensajes recientes superan el presupuesto, los mensajes más
+    antiguos se incorporan a un resumen acumulado que se guarda con la conversación.
+    Se compacta hasta la mitad del presupuesto, así el resumen no se recalcula en cada turno.
+    """
+
+    def __init__(self, store: ConversationStore, llm: LLMService,
+                 token_budget: int = None, keep_messages: int = None):
+        """
+        Args:
+            store (ConversationStore): Almacenamiento donde se guardan los resúmenes
+            llm (LLMService): Cliente de Gemini usado para resumir
+            token_budget (int): Tokens máximos de historial por turno (0 desactiva la compactación)
+            keep_messages (int): Mensajes recientes que nunca se resumen
+        """
+        self.store = store
+        self.llm = llm
+        self.token_budget = settings.chat_history_token_budget if token_budget is None else token_budget
+        self.keep_messages = settings.chat_history_keep_messages if keep_messages is None else keep_messages
+        self.compactions = 0
+
+    def _tokens(self, summary: Optional[HistorySummary], messages: List[ChatMessage], user_message: str) -> int:
+        total = estimate_tokens(user_message) + sum(estimate_tokens(m.content) for m in messages)
+        if summary:
+            total += estimate_tokens(summary.text)
+        return total
+
+    async def _summarize(self, summary: Optional[HistorySummary], messages: List[ChatMessage]) -> str:
+        parts = [SUMMARY_PROMPT.format(max_words=max(self.token_budget // 8, 50))]
+        if summary:
+            parts.append(f"Resumen previo:\n{summary.text}")
+        for message in messages:
+            label = USER_LABEL if message.role == "user" else ASSISTANT_LABEL
+            parts.append(f"{label}: {message.content}")
+
+        return (await self.llm.generate("\n\n".join(parts), record_usage=False)).strip()
+
+    async def compact(self, conversation_id: str, history: List[ChatMessage],
+                      user_message: str) -> Tuple[Optional[HistorySummary], List[ChatMessage]]:
+        """
+        Obtiene el resumen y los mensajes recientes a enviar en este turno.
+
+        Args:
+            conversation_id (str): ID de la conversación
+            history (List[ChatMessage]): Historial completo almacenado
+            user_message (str): Mensaje actual del estudiante
+
+        Returns:
+            Tuple[Optional[HistorySummary], List[ChatMessage]]: Resumen (o None) y mensajes sin resumir
+        """
+        summary = await self.store.get_summary(conversation_id) if history else None
+        covered = summary.covered_messages if summary else 0
+        recent = history[covered:]
+
+        if not self.token_budget or self._tokens(summary, recent, user_message) <= self.token_budget:
+            return summary, recent
+
+        # Incorpora mensajes antiguos al resumen hasta quedar en la mitad del presupuesto. Se resumen
+        # pares usuario/modelo completos: lo que queda empieza con un turno del usuario y la sesión
+        # de Gemini no recibe dos turnos del modelo seguidos después del resumen. Un resumen anterior
+        # que cubrió un número impar de mensajes se completa primero con el mensaje que le faltó
+        fold = 0
+        while True:
+            step = 2 - (covered + fold) % 2
+            if len(recent) - fold - step < self.keep_messages or \
+                    self._tokens(summary, recent[fold:], user_message) <= self.token_budget // 2:
+                break
+            fold += step
+
+        if not fold:
+            return summary, recent
+
+        try:
+            text = await self._summarize(summary, recent[:fold])
+        except Exception as e:
+            # Sin resumen nuevo se envía el historial completo antes que perder contexto
+            logger.error(f"Error resumiendo historial: {type(e).__name__}: {str(e)}")
+            return summary, recent
+
+        summary = HistorySummary(text=text, covered_messages=covered + fold)
+        await self.store.set_summary(conversation_id, summary)
+        self.compactions += 1
+        logger.info(f"Historial compactado: {summary.covered_messages} mensajes resumidos, "
+                    f"{len(recent) - fold} recientes")
+
+        return summary, recent[fold:]
+
+    def get_stats(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "keep_messages": self.keep_messages,
+            "compactions": self.compactions
+        }
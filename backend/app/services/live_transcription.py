@@ -0,0 +1,159 @@
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Union
+import numpy as np
+from app.config.settings import settings
+from app.services.audio_preprocess import FRAME_SECONDS, frame_energy_db, split_points, write_wav
+from app.services.transcription_service import TranscriptionService, get_transcription_service
+
+logger = logging.getLogger(__name__)
+
+
+class LiveTranscriber:
+    """
+    Transcribe una grabación mientras se graba.
+
+    Recibe los bloques del grabador (`AudioRecorder.on_audio`) y corta el audio en ventanas:
+    cuando la ventana supera `live_window_min_seconds` y termina en un silencio de
+    `live_silence_seconds`, o en el punto más silencioso al llegar a `live_window_max_seconds`.
+    Cada ventana se transcribe en segundo plano y los textos se agregan al archivo en orden
+    a medida que llegan, así al detener la grabación solo falta la última ventana.
+    """
+
+    def __init__(self, output_path: Union[str, Path], samplerate: int, language: str = "es",
+                 service: TranscriptionService = None, workers: int = None):
+        """
+        Args:
+            output_path (str | Path): Archivo de texto donde se agrega la transcripción
+            samplerate (int): Frecuencia de muestreo de los bloques recibidos
+            language (str): Código de idioma o "auto"
+            service (TranscriptionService): Servicio de transcripción. Por defecto el compartido
+            workers (int): Ventanas que se transcriben a la vez. Por defecto `settings.live_workers`
+        """
+        self.output_path = Path(output_path)
+        self.samplerate = samplerate
+        self.language = language
+        self.service = service or get_transcription_service()
+        self.min_frames = int(settings.live_window_min_seconds * samplerate)
+        self.max_frames = int(settings.live_window_max_seconds * samplerate)
+        self.silence_frames = max(int(settings.live_silence_seconds / FRAME_SECONDS), 1)
+        # Se busca el corte cada media pausa, así ninguna pausa de `live_silence_seconds` pasa sin revisar
+        self.check_frames = max(int(settings.live_silence_seconds * samplerate / 2), 1)
+
+        self._pending: List[np.ndarray] = []
+        self._pending_frames = 0
+        self._unchecked_frames = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=workers or settings.live_workers,
+                                            thread_name_prefix="live-transcription")
+        self._futures: List[Future] = []
+        self._results: Dict[int, str] = {}
+        self._next_index = 0
+        self._lock = threading.Lock()
+        self.texts: List[str] = []
+        self.windows = 0
+        self.skipped = 0
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_path.write_text("", encoding="utf-8")
+
+    def _threshold(self, energy_db: np.ndarray) -> float:
+        # Piso de ruido más un margen, como en el recorte de silencios, pero con un percentil bajo:
+        # en una ventana corta la pausa final puede ser apenas una fracción de los frames
+        return max(np.percentile(energy_db, 2) + settings.audio_vad_margin_db, settings.audio_vad_threshold_db)
+
+    @staticmethod
+    def _has_voice(energy_db: np.ndarray) -> bool:
+        return bool(len(energy_db)) and bool(np.any(energy_db > settings.audio_vad_threshold_db + settings.audio_vad_margin_db))
+
+    def feed(self, block: np.ndarray):
+        """
+        Agrega un bloque grabado (int16, forma (frames, canales)) y envía a transcribir la
+        ventana actual si ya se puede cortar.
+        """
+        mono = block.mean(axis=1) if block.ndim > 1 else block
+        self._pending.append(mono.astype(np.float32) / 32768)
+        self._pending_frames += len(mono)
+        self._unchecked_frames += len(mono)
+
+        if self._pending_frames < self.min_frames or self._unchecked_frames < self.check_frames:
+            return
+        self._unchecked_frames = 0
+
+        samples = np.concatenate(self._pending)
+        energy_db = frame_energy_db(samples, self.samplerate)
+        threshold = self._threshold(energy_db)
+
+        voiced = energy_db > threshold
+
+        cut = None
+        if not self._has_voice(energy_db):
+            # Solo silencio: se descarta la ventana completa
+            cut = len(samples)
+        elif voiced.any() and not voiced[-self.silence_frames:].any():
+            # Termina en silencio: se corta a la mitad de la pausa
+            cut = len(samples) - self.silence_frames * int(self.samplerate * FRAME_SECONDS) // 2
+        elif len(samples) >= self.max_frames:
+            points = split_points(samples, self.samplerate, self.max_frames / self.samplerate)
+            cut = points[0] if points else len(samples)
+
+        if cut is not None:
+            self._submit(samples[:cut])
+            rest = samples[cut:]
+            self._pending = [rest] if len(rest) else []
+            self._pending_frames = len(rest)
+
+    def _submit(self, samples: np.ndarray):
+        index = self.windows
+        self.windows += 1
+
+        if not self._has_voice(frame_energy_db(samples, self.samplerate)):
+            # Ventana sin voz: no se envía (Whisper tiende a inventar texto con silencio)
+            self.skipped += 1
+            self._complete(index, "")
+            return
+
+        audio = write_wav(samples, self.samplerate)
+        future = self._executor.submit(
+            self.service.transcribe_sync, audio, f"ventana_{index}.wav", self.language, "text"
+        )
+        future.add_done_callback(lambda f: self._on_done(index, f))
+        self._futures.append(future)
+
+    def _on_done(self, index: int, future: Future):
+        try:
+            text = future.result().text.strip()
+        except Exception as e:
+            logger.error(f"Error transcribiendo la ventana {index}: {str(e)}")
+            print(f"❌ Error en la transcripción de la ventana {index + 1}: {e}")
+            text = ""
+        self._complete(index, text)
+
+    def _complete(self, index: int, text: str):
+        # Las ventanas pueden terminar en cualquier orden; se escriben en el orden de grabación
+        with self._lock:
+            self._results[index] = text
+            while self._next_index in self._results:
+                ready = self._results.pop(self._next_index)
+                self._next_index += 1
+                if ready:
+                    with open(self.output_path, "a", encoding="utf-8") as f:
+                        f.write(("\n" if self.texts else "") + ready)
+                    self.texts.append(ready)
+                    print(f"📝 {ready}")
+
+    def finish(self) -> str:
+        """
+        Envía lo que queda grabado y espera a que terminen todas las ventanas.
+
+        Returns:
+            str: Transcripción completa
+        """
+        if self._pending_frames:
+            self._submit(np.concatenate(self._pending))
+            self._pending = []
+            self._pending_frames = 0
+        self._executor.shutdown(wait=True)
+        return "\n".join(self.texts)
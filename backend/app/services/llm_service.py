@@ -0,0 +1,390 @@
+import os
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+import google.generativeai as genai
+from google.generativeai import caching
+from app.config.settings import settings
+from app.models.schemas import ChatMessage, HistorySummary
+from app.services.metrics import ConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+USER_LABEL = "Estudiante"
+ASSISTANT_LABEL = "Sombrero Seleccionador"
+SUMMARY_LABEL = "Resumen de la conversación anterior"
+
+
+def build_prompt(conversation_history: List[ChatMessage], user_message: str,
+                 summary: Optional[HistorySummary] = None) -> str:
+    """
+    Construye el prompt completo con el prompt de sistema y el historial de conversación.
+
+    Args:
+        conversation_history (List[ChatMessage]): Mensajes anteriores al mensaje actual
+        user_message (str): Mensaje actual del estudiante
+        summary (HistorySummary): Resumen de los mensajes anteriores a `conversation_history`
+
+    Returns:
+        str: Prompt completo en texto plano
+    """
+    logger.info(f"Construyendo prompt con {len(conversation_history)} mensajes en historial")
+
+    prompt_parts = [settings.prompt_system]
+    if summary:
+        prompt_parts.append(f"{SUMMARY_LABEL}: {summary.text}")
+
+    for message in conversation_history:
+        if message.role == "user":
+            prompt_parts.append(f"{USER_LABEL}: {message.content}")
+        else:
+            prompt_parts.append(f"{ASSISTANT_LABEL}: {message.content}")
+
+    prompt_parts.append(f"{USER_LABEL}: {user_message}")
+    prompt_parts.append(f"{ASSISTANT_LABEL}:")
+
+    full_prompt = "\n\n".join(prompt_parts)
+    logger.info(f"Prompt construido, longitud: {len(full_prompt)} caracteres")
+    return full_prompt
+
+
+def to_contents(conversation_history: List[ChatMessage], summary: Optional[HistorySummary] = None) -> List[dict]:
+    """
+    Convierte el historial al formato de contenidos de Gemini.
+    El resumen, si existe, se envía como un primer intercambio.
+    """
+    contents = []
+    if summary:
+        contents.append({"role": "user", "parts": [f"{SUMMARY_LABEL}: {summary.text}"]})
+        contents.append({"role": "model", "parts": ["Entendido, continúo la entrevista."]})
+
+    contents.extend(
+        {"role": "user" if message.role == "user" else "model", "parts": [message.content]}
+        for message in conversation_history
+    )
+    return contents
+
+
+class TokenUsage:
+    """
+    Acumula el uso de tokens de prompt por turno y cuántos se leyeron de la caché de contexto
+    de Gemini. Sin caché de contexto los tokens desde caché son siempre 0.
+    """
+
+    def __init__(self):
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.last_turn: dict = {}
+
+    def record(self, usage_metadata, conversation_id: str = None):
+        """
+        Registra el uso reportado por Gemini para un turno.
+
+        Args:
+            usage_metadata: `usage_metadata` de la respuesta de Gemini
+            conversation_id (str): Conversación a la que pertenece el turno
+        """
+        if usage_metadata is None:
+            return
+
+        prompt = getattr(usage_metadata, "prompt_token_count", 0) or 0
+        cached = getattr(usage_metadata, "cached_content_token_count", 0) or 0
+
+        self.turns += 1
+        self.prompt_tokens += prompt
+        self.cached_tokens += cached
+        self.last_turn = {
+            "conversation_id": conversation_id,
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "billed_prompt_tokens": prompt - cached
+        }
+        ratio = f"{cached / prompt:.0%}" if prompt else "0%"
+        logger.info(f"Tokens de prompt: {prompt} (desde caché: {cached}, {ratio})")
+
+    def snapshot(self) -> dict:
+        return {
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.turns, 1) if self.turns else 0.0,
+            "avg_cached_tokens": round(self.cached_tokens / self.turns, 1) if self.turns else 0.0,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "last_turn": self.last_turn
+        }
+
+
+class _PooledSession:
+    __slots__ = ("chat", "lock", "summary_covered")
+
+    def __init__(self):
+        # La sesión de Gemini se crea (o se vuelve a crear) con el lock tomado
+        self.chat = None
+        self.lock = asyncio.Lock()
+        self.summary_covered = 0
+
+
+class LLMService:
+    """
+    Cliente asíncrono de Gemini con un límite de peticiones simultáneas.
+    Usa la API asíncrona nativa de google-generativeai para no bloquear el event loop.
+
+    Tiene dos modos (`settings.gemini_session_mode`):
+    - "prompt": arma en cada turno un prompt de texto con el prompt de sistema y todo el historial.
+    - "session": envía el prompt de sistema como `system_instruction` (o desde la caché de contexto
+      de Gemini si está habilitada) y mantiene un `ChatSession` por conversación, al que solo se
+      agrega el mensaje nuevo en cada turno.
+    """
+
+    def __init__(self, model_name: str = None, api_key: str = None,
+                 max_concurrency: int = None, timeout: float = None, session_mode: str = None):
+        """
+        Inicializa el modelo y el limitador de concurrencia.
+
+        Args:
+            model_name (str): Nombre del modelo de Gemini. Por defecto `settings.gemini_model`
+            api_key (str): API key de Gemini. Por defecto `settings.gemini_api_key` o GEMINI_API_KEY
+            max_concurrency (int): Máximo de llamadas simultáneas a Gemini
+            timeout (float): Tiempo máximo por llamada en segundos
+            session_mode (str): "prompt" o "session". Por defecto `settings.gemini_session_mode`
+        """
+        genai.configure(api_key=api_key or settings.gemini_api_key or os.getenv("GEMINI_API_KEY"))
+
+        self.model_name = model_name or settings.gemini_model
+        self.model = genai.GenerativeModel(self.model_name)
+        self.timeout = timeout or settings.gemini_timeout
+        self.limiter = ConcurrencyLimiter(max_concurrency or settings.gemini_max_concurrency, name="gemini")
+        self.usage = TokenUsage()
+
+        self.session_mode = (session_mode or settings.gemini_session_mode).lower()
+        if self.session_mode not in ("prompt", "session"):
+            raise ValueError(f"Modo de sesión de Gemini no soportado: {self.session_mode}")
+
+        self._sessions: "OrderedDict[str, _PooledSession]" = OrderedDict()
+        self._session_model = None
+        self._model_lock = asyncio.Lock()
+        self._cache_expires_at: Optional[datetime.datetime] = None
+        self.session_rebuilds = 0
+
+    async def generate(self, prompt: str, record_usage: bool = True) -> str:
+        """
+        Genera una respuesta completa para el prompt dado.
+
+        Args:
+            prompt (str): Prompt completo a enviar
+            record_usage (bool): Si se cuenta como un turno en las métricas de tokens
+
+        Returns:
+            str: Texto de la respuesta
+
+        Raises:
+            ValueError: Si Gemini no devuelve texto
+        """
+        async with self.limiter.slot():
+            response = await self.model.generate_content_async(
+                prompt,
+                request_options={"timeout": self.timeout}
+            )
+
+        if not response or not response.text:
+            raise ValueError("Gemini API no devolvió una respuesta válida")
+
+        if record_usage:
+            self.usage.record(getattr(response, "usage_metadata", None))
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Genera una respuesta entregando los fragmentos de texto a medida que llegan.
+        El cupo de concurrencia se mantiene hasta que termina el stream.
+
+        Args:
+            prompt (str): Prompt completo a enviar
+
+        Yields:
+            str: Fragmentos de texto de la respuesta
+        """
+        async with self.limiter.slot():
+            response = await self.model.generate_content_async(
+                prompt,
+                stream=True,
+                request_options={"timeout": self.timeout}
+            )
+            usage = None
+            async for chunk in response:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.parts and chunk.text:
+                    yield chunk.text
+
+        self.usage.record(usage)
+
+    def _session_model_valid(self) -> bool:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return self._session_model is not None and (self._cache_expires_at is None or now < self._cache_expires_at)
+
+    async def _get_session_model(self):
+        # Modelo con el prompt de sistema fijo; si la caché de contexto expiró se vuelve a crear
+        if self._session_model_valid():
+            return self._session_model
+
+        async with self._model_lock:
+            # Otro turno pudo haberlo creado mientras se esperaba el lock
+            if self._session_model_valid():
+                return self._session_model
+
+            if settings.gemini_context_cache:
+                try:
+                    ttl = datetime.timedelta(seconds=settings.gemini_context_cache_ttl)
+                    # Llamada de red bloqueante del SDK: se hace en un hilo
+                    cached = await asyncio.to_thread(
+                        caching.CachedContent.create,
+                        model=self.model_name,
+                        display_name="turtlector-system-prompt",
+                        system_instruction=settings.prompt_system,
+                        ttl=ttl
+                    )
+                    self._session_model = genai.GenerativeModel.from_cached_content(cached)
+                    # Margen para no usar una caché a punto de expirar
+                    self._cache_expires_at = datetime.datetime.now(datetime.timezone.utc) + ttl \
+                        - datetime.timedelta(seconds=60)
+                    # Las sesiones creadas con el modelo anterior se vuelven a crear en su próximo turno
+                    for pooled in self._sessions.values():
+                        pooled.chat = None
+                    self._sessions.clear()
+                    logger.info(f"Caché de contexto de Gemini creada: {cached.name}")
+                    return self._session_model
+                except Exception as e:
+                    logger.warning(f"No se pudo crear la caché de contexto, se usa system_instruction: "
+                                   f"{type(e).__name__}: {str(e)}")
+
+            self._session_model = genai.GenerativeModel(self.model_name, system_instruction=settings.prompt_system)
+            self._cache_expires_at = None
+            return self._session_model
+
+    @asynccontextmanager
+    async def _session(self, conversation_id: str, conversation_history: List[ChatMessage],
+                       summary: Optional[HistorySummary]) -> AsyncIterator[_PooledSession]:
+        # Entrega la sesión de la conversación con su lock tomado, ya sincronizada con el historial
+        model = await self._get_session_model()
+        pooled = self._sessions.get(conversation_id)
+        if pooled is None:
+            pooled = self._sessions[conversation_id] = _PooledSession()
+
+        self._sessions.move_to_end(conversation_id)
+        while len(self._sessions) > settings.gemini_session_pool_size:
+            self._sessions.popitem(last=False)
+
+        async with pooled.lock:
+            contents = to_contents(conversation_history, summary)
+            summary_covered = summary.covered_messages if summary else 0
+
+            # La sesión solo se reutiliza si su historial coincide con el almacenado (otro worker
+            # pudo haber atendido turnos, o el historial se compactó). Se compara con el lock
+            # tomado: un turno concurrente de la misma conversación ya terminó de modificarla
+            if pooled.chat is None or len(pooled.chat.history) != len(contents) \
+                    or pooled.summary_covered != summary_covered:
+                if pooled.chat is not None:
+                    self.session_rebuilds += 1
+                pooled.chat = model.start_chat(history=contents)
+                pooled.summary_covered = summary_covered
+
+            yield pooled
+
+    def drop_session(self, conversation_id: str):
+        """
+        Descarta la sesión de una conversación (por ejemplo, al eliminarla).
+        """
+        pooled = self._sessions.pop(conversation_id, None)
+        if pooled is not None:
+            # Un turno que espera el lock de esta sesión la vuelve a crear
+            pooled.chat = None
+
+    async def reply(self, conversation_id: str, conversation_history: List[ChatMessage], user_message: str,
+                    summary: Optional[HistorySummary] = None) -> str:
+        """
+        Genera la respuesta al mensaje del estudiante según el modo configurado.
+
+        Args:
+            conversation_id (str): ID de la conversación
+            conversation_history (List[ChatMessage]): Mensajes anteriores al mensaje actual
+            user_message (str): Mensaje actual del estudiante
+            summary (HistorySummary): Resumen de los mensajes anteriores a `conversation_history`
+
+        Returns:
+            str: Texto de la respuesta
+
+        Raises:
+            ValueError: Si Gemini no devuelve texto
+        """
+        if self.session_mode == "prompt":
+            return await self.generate(build_prompt(conversation_history, user_message, summary))
+
+        async with self._session(conversation_id, conversation_history, summary) as pooled, self.limiter.slot():
+            try:
+                response = await pooled.chat.send_message_async(
+                    user_message,
+                    request_options={"timeout": self.timeout}
+                )
+            except Exception:
+                self.drop_session(conversation_id)
+                raise
+
+        if not response or not response.text:
+            self.drop_session(conversation_id)
+            raise ValueError("Gemini API no devolvió una respuesta válida")
+
+        self.usage.record(getattr(response, "usage_metadata", None), conversation_id)
+        return response.text
+
+    async def reply_stream(self, conversation_id: str, conversation_history: List[ChatMessage],
+                           user_message: str, summary: Optional[HistorySummary] = None) -> AsyncIterator[str]:
+        """
+        Igual que `reply`, pero entrega los fragmentos de texto a medida que llegan.
+
+        Yields:
+            str: Fragmentos de texto de la respuesta
+        """
+        if self.session_mode == "prompt":
+            async for text in self.stream(build_prompt(conversation_history, user_message, summary)):
+                yield text
+            return
+
+        async with self._session(conversation_id, conversation_history, summary) as pooled, self.limiter.slot():
+            usage = None
+            try:
+                response = await pooled.chat.send_message_async(
+                    user_message,
+                    stream=True,
+                    request_options={"timeout": self.timeout}
+                )
+                async for chunk in response:
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.parts and chunk.text:
+                        yield chunk.text
+            except BaseException:
+                # Un stream incompleto deja la sesión desincronizada
+                self.drop_session(conversation_id)
+                raise
+
+        self.usage.record(usage, conversation_id)
+
+    def get_stats(self) -> dict:
+        """
+        Obtiene las métricas de concurrencia, latencia y uso de tokens de Gemini.
+
+        Returns:
+            dict: Modelo usado, estado del limitador y ahorro de tokens de prompt
+        """
+        return {
+            "model": self.model_name,
+            "session_mode": self.session_mode,
+            "context_cache": self._cache_expires_at is not None,
+            "pooled_sessions": len(self._sessions),
+            "session_rebuilds": self.session_rebuilds,
+            "tokens": self.usage.snapshot(),
+            **self.limiter.snapshot()
+        }
@@ -0,0 +1,122 @@
+import io
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config.settings import settings
+from app.services.metrics import ConcurrencyLimiter
+from app.services.transcription_service import AudioInput, TranscriptionBackend, TranscriptionResult, TranscriptSegment
+
+logger = logging.getLogger(__name__)
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Transcripción local con faster-whisper (CTranslate2), sin llamadas de red.
+
+    El modelo se carga una sola vez por proceso y se comparte entre un pool de hilos:
+    CTranslate2 libera el GIL y, con `num_workers` igual al tamaño del pool, procesa las
+    peticiones concurrentes en paralelo. Las peticiones que exceden el pool esperan en
+    un semáforo en lugar de acumularse en la cola del executor.
+    """
+
+    name = "local"
+
+    def __init__(self, model: str = None, device: str = None, compute_type: str = None,
+                 workers: int = None, cpu_threads: int = None, beam_size: int = None):
+        """
+        Args:
+            model (str): Tamaño o ruta del modelo ("tiny", "base", "small", ...). Por defecto `settings.whisper_model`
+            device (str): "cpu", "cuda" o "auto". Por defecto `settings.whisper_device`
+            compute_type (str): Cuantización ("int8", "int8_float16", "float16", "float32")
+            workers (int): Transcripciones simultáneas sobre el mismo modelo
+            cpu_threads (int): Hilos de CPU por transcripción (0 = los que elija CTranslate2)
+            beam_size (int): Tamaño del beam search (1 = greedy, más rápido)
+        """
+        self.model = model or settings.whisper_model
+        self.device = device or settings.whisper_device
+        self.compute_type = compute_type or settings.whisper_compute_type
+        self.workers = workers or settings.whisper_workers
+        self.cpu_threads = settings.whisper_cpu_threads if cpu_threads is None else cpu_threads
+        self.beam_size = beam_size or settings.whisper_beam_size
+
+        self.limiter = ConcurrencyLimiter(self.workers, name="whisper-local")
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.load_seconds = 0.0
+
+    @property
+    def configured(self) -> bool:
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError as e:
+                    raise RuntimeError(
+                        "TRANSCRIPTION_BACKEND=local requiere faster-whisper: pip install faster-whisper"
+                    ) from e
+
+                started_at = time.perf_counter()
+                self._model = WhisperModel(
+                    self.model,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.workers
+                )
+                self.load_seconds = time.perf_counter() - started_at
+                logger.info(f"Modelo Whisper local '{self.model}' ({self.device}, {self.compute_type}) "
+                            f"cargado en {self.load_seconds:.1f}s")
+            return self._model
+
+    def _run(self, audio: AudioInput, language: str) -> TranscriptionResult:
+        source = io.BytesIO(audio) if isinstance(audio, bytes) else str(audio)
+        segments, info = self._get_model().transcribe(
+            source,
+            language=None if not language or language == "auto" else language,
+            beam_size=self.beam_size
+        )
+        # Los segmentos se generan al iterar; la transcripción ocurre aquí
+        segments = [TranscriptSegment(segment.start, segment.end, segment.text.strip()) for segment in segments]
+        text = " ".join(segment.text for segment in segments if segment.text)
+        return TranscriptionResult(text, info.language, info.duration, segments=tuple(segments))
+
+    async def start(self):
+        """
+        Carga el modelo en el pool de hilos para que la primera petición no pague la carga.
+        """
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._get_model)
+
+    async def transcribe(self, audio: AudioInput, filename: str, language: str,
+                         response_format: str) -> TranscriptionResult:
+        async with self.limiter.slot():
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._run, audio, language)
+
+    def transcribe_sync(self, audio: AudioInput, filename: str, language: str,
+                        response_format: str) -> TranscriptionResult:
+        return self._run(audio, language)
+
+    async def close(self):
+        """
+        Detiene el pool de hilos.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        return {
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "workers": self.workers,
+            "model_loaded": self._model is not None,
+            "load_seconds": round(self.load_seconds, 2),
+            **self.limiter.snapshot()
+        }
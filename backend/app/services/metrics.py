@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Optional, Sequence
+
+
+class LatencyStats:
+    """
+    Acumula latencias (en segundos) en un histograma de buckets fijos.
+    Es seguro usarlo desde varios hilos y desde el event loop.
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets: Optional[Sequence[float]] = None):
+        self.buckets = tuple(buckets or self.DEFAULT_BUCKETS)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """
+        Registra una observación.
+
+        Args:
+            seconds (float): Latencia medida en segundos
+        """
+        with self._lock:
+            self._counts[bisect_left(self.buckets, seconds)] += 1
+            self._count += 1
+            self._total += seconds
+            if seconds > self._max:
+                self._max = seconds
+
+    def _quantile(self, q: float) -> float:
+        # Aproximación por el límite superior del bucket que contiene el cuantil
+        target = q * self._count
+        accumulated = 0
+        for i, count in enumerate(self._counts):
+            accumulated += count
+            if accumulated >= target:
+                return min(self.buckets[i], self._max) if i < len(self.buckets) else self._max
+        return self._max
+
+    def snapshot(self) -> dict:
+        """
+        Obtiene un resumen de las latencias registradas.
+
+        Returns:
+            dict: Conteo, promedio, máximo, cuantiles aproximados y buckets
+        """
+        with self._lock:
+            if not self._count:
+                return {"count": 0, "avg": 0.0, "max": 0.0, "p50": 0.0, "p95": 0.0, "buckets": {}}
+
+            buckets = {f"le_{b}": c for b, c in zip(self.buckets, self._counts)}
+            buckets["le_inf"] = self._counts[-1]
+            return {
+                "count": self._count,
+                "avg": round(self._total / self._count, 4),
+                "max": round(self._max, 4),
+                "p50": self._quantile(0.50),
+                "p95": self._quantile(0.95),
+                "buckets": buckets,
+            }
+
+
+class ConcurrencyLimiter:
+    """
+    Semáforo asíncrono que limita las llamadas simultáneas a un servicio externo
+    y mide cuánto esperan las peticiones en cola antes de obtener un cupo.
+    """
+
+    def __init__(self, limit: int, name: str = ""):
+        if limit < 1:
+            raise ValueError("El límite de concurrencia debe ser al menos 1")
+
+        self.limit = limit
+        self.name = name
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.queue_wait = LatencyStats()
+        self.latency = LatencyStats()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Reserva un cupo durante el bloque `async with`.
+        """
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.queue_wait.observe(started_at - queued_at)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.latency.observe(time.perf_counter() - started_at)
+            self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        """
+        Obtiene el estado actual del limitador.
+
+        Returns:
+            dict: Límite, peticiones en curso, en espera y estadísticas de latencia
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "queue_wait": self.queue_wait.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
@@ -0,0 +1,194 @@
+import re
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import numpy as np
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un mensaje para compararlo: minúsculas, sin tildes ni signos,
+    sin letras repetidas ("holaaa" -> "hola") y con espacios simples.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = re.sub(r"(.)\1{2,}", r"\1", text)
+    return " ".join(text.split())
+
+
+# Saludos (normalizados) que pueden responderse con la respuesta de un saludo parecido.
+# Fuera de esta lista, un parecido por n-gramas no dice nada del sentido del mensaje:
+# "me gusta la física" se parece a "me gusta la química", pero su respuesta no sirve
+GREETINGS = frozenset({
+    "hola", "holi", "buenas", "buenos dias", "buenas tardes", "buenas noches", "saludos",
+    "hola buenas", "hola buenos dias", "hola buenas tardes", "hola buenas noches",
+    "hola tortuga", "hola tortuga seleccionadora", "hey", "hi", "hello",
+})
+
+
+class CachedResponse(NamedTuple):
+    text: str
+    audio: bytes
+    audio_format: str = "mp3"
+    sample_rate: int = 0
+
+
+class ResponseCache:
+    """
+    Caché de respuestas para el primer mensaje de una conversación (saludos).
+
+    Primero busca el texto normalizado exacto y, si no lo encuentra, busca el saludo
+    más parecido con similitud coseno sobre vectores de n-gramas de caracteres ("holaa" ~ "hola",
+    "buenas tardes" ~ "buenas"). La búsqueda por similitud solo considera las entradas cuyo
+    mensaje está en `GREETINGS` y con un número parecido de palabras; cualquier otro primer
+    mensaje solo acierta con el mismo texto normalizado.
+    Guarda el texto y el audio de la respuesta; al llenarse descarta la entrada usada
+    hace más tiempo (LRU).
+    """
+
+    NGRAM_SIZES = (2, 3)
+
+    def __init__(self, capacity: int = None, threshold: float = None,
+                 max_chars: int = None, max_word_difference: int = 1, dimensions: int = 512):
+        """
+        Args:
+            capacity (int): Máximo de respuestas en caché
+            threshold (float): Similitud coseno mínima para considerar un acierto (0 a 1)
+            max_chars (int): Largo máximo del mensaje normalizado que se guarda en caché
+            max_word_difference (int): Diferencia máxima en número de palabras con un mensaje guardado
+            dimensions (int): Dimensiones de los vectores de n-gramas
+        """
+        self.capacity = capacity or settings.response_cache_capacity
+        self.threshold = settings.response_cache_threshold if threshold is None else threshold
+        self.max_chars = max_chars or settings.response_cache_max_chars
+        self.max_word_difference = max_word_difference
+        self.dimensions = dimensions
+
+        self._vectors = np.zeros((self.capacity, dimensions), dtype=np.float32)
+        self._active = np.zeros(self.capacity, dtype=bool)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._keys = [None] * self.capacity
+        self._word_counts = np.zeros(self.capacity, dtype=np.int32)
+        self._greetings = np.zeros(self.capacity, dtype=bool)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _vectorize(self, normalized: str) -> np.ndarray:
+        # Vector de n-gramas de caracteres con hashing, normalizado a norma 1
+        padded = f" {normalized} "
+        indices = [
+            int.from_bytes(hashlib.blake2b(padded[i:i + n].encode(), digest_size=4).digest(), "little")
+            % self.dimensions
+            for n in self.NGRAM_SIZES
+            for i in range(len(padded) - n + 1)
+        ]
+        vector = np.bincount(indices, minlength=self.dimensions).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _cacheable(self, normalized: str) -> bool:
+        return 0 < len(normalized) <= self.max_chars
+
+    def get(self, message: str) -> Optional[CachedResponse]:
+        """
+        Busca una respuesta guardada para el mensaje.
+
+        Args:
+            message (str): Primer mensaje del estudiante
+
+        Returns:
+            Optional[CachedResponse]: Texto, audio y formato del audio de la respuesta, o None si no hay acierto
+        """
+        normalized = normalize_text(message)
+        if not self._cacheable(normalized):
+            return None
+
+        with self._lock:
+            key = normalized
+            if key in self._slots:
+                self.exact_hits += 1
+            else:
+                similarities = self._vectors @ self._vectorize(normalized)
+                similarities[~(self._active & self._greetings)] = -1.0
+                similarities[np.abs(self._word_counts - len(normalized.split())) > self.max_word_difference] = -1.0
+
+                best = int(np.argmax(similarities))
+                if similarities[best] < self.threshold:
+                    self.misses += 1
+                    return None
+
+                key = self._keys[best]
+                self.semantic_hits += 1
+                logger.info(f"Caché de respuestas: '{normalized}' ~ '{key}' ({similarities[best]:.2f})")
+
+            self._slots.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, message: str, text: str, audio: bytes, audio_format: str = "mp3", sample_rate: int = 0):
+        """
+        Guarda la respuesta al primer mensaje de una conversación.
+
+        Args:
+            message (str): Primer mensaje del estudiante
+            text (str): Respuesta generada
+            audio (bytes): Audio de la respuesta
+            audio_format (str): Formato del audio
+            sample_rate (int): Frecuencia de muestreo del audio (0 = la de la voz)
+        """
+        normalized = normalize_text(message)
+        if not self._cacheable(normalized):
+            return
+
+        with self._lock:
+            if normalized in self._slots:
+                slot = self._slots[normalized]
+                self._slots.move_to_end(normalized)
+            elif len(self._slots) < self.capacity:
+                slot = int(np.argmin(self._active))
+            else:
+                oldest, slot = self._slots.popitem(last=False)
+                del self._entries[oldest]
+                self.evictions += 1
+
+            self._vectors[slot] = self._vectorize(normalized)
+            self._active[slot] = True
+            self._keys[slot] = normalized
+            self._word_counts[slot] = len(normalized.split())
+            self._greetings[slot] = normalized in GREETINGS
+            self._slots[normalized] = slot
+            self._entries[normalized] = CachedResponse(text, audio, audio_format, sample_rate)
+
+    def clear(self):
+        """
+        Elimina todas las respuestas guardadas.
+        """
+        with self._lock:
+            self._slots.clear()
+            self._entries.clear()
+            self._active[:] = False
+
+    def get_stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "audio_bytes": sum(len(e.audio) for e in self._entries.values()),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,215 @@
+import os
+import asyncio
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache:
+    """
+    Caché de bytes de dos niveles: LRU en memoria sobre un directorio en disco.
+
+    Cada nivel tiene un límite de bytes y descarta las entradas usadas hace más tiempo.
+    Los archivos en disco se reparten en subdirectorios por los dos primeros caracteres
+    de la clave, y el índice del disco se arma una sola vez al iniciar.
+
+    El lock solo protege los índices en memoria; la lectura y escritura de archivos se hace
+    fuera de él. `get_async` y `put_async` resuelven en el event loop los aciertos en memoria
+    y mandan el acceso al disco a un hilo.
+    """
+
+    def __init__(self, directory: str, memory_max_bytes: int, disk_max_bytes: int, suffix: str = ""):
+        """
+        Args:
+            directory (str): Carpeta del nivel en disco
+            memory_max_bytes (int): Máximo de bytes en memoria
+            disk_max_bytes (int): Máximo de bytes en disco (0 desactiva el nivel en disco)
+            suffix (str): Extensión de los archivos en disco
+        """
+        self.directory = Path(directory)
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.suffix = suffix
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_max_bytes:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def _load_disk_index(self):
+        # Ordena por último acceso para conservar el orden LRU entre reinicios
+        entries = []
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            if path.name.startswith("."):
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.name.removesuffix(self.suffix), stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+        logger.info(f"Caché en disco '{self.directory}': {len(self._disk)} entradas, {self._disk_bytes} bytes")
+
+    def _store_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self) -> List[Path]:
+        # Devuelve los archivos a borrar, para borrarlos fuera del lock
+        evicted = []
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            evicted.append(self._path(key))
+        return evicted
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.memory_hits += 1
+            return data
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_max_bytes:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # También se busca en disco si no está en el índice: otro worker pudo haberla escrito
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                if key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if key not in self._disk:
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+            self._disk.move_to_end(key)
+            self._store_memory(key, data)
+            self.disk_hits += 1
+        return data
+
+    def _put_memory(self, key: str, data: bytes) -> bool:
+        # Devuelve si además hay que escribir la entrada en disco
+        with self._lock:
+            self._store_memory(key, data)
+            return bool(self.disk_max_bytes) and key not in self._disk and len(data) <= self.disk_max_bytes
+
+    def _put_disk(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Escritura atómica para que otro worker (u otro hilo) nunca lea un archivo incompleto
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._disk:
+                return
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            evicted = self._evict_disk()
+        for evicted_path in evicted:
+            evicted_path.unlink(missing_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Busca una entrada primero en memoria y luego en disco.
+
+        Args:
+            key (str): Clave hexadecimal de la entrada
+
+        Returns:
+            Optional[bytes]: Contenido guardado, o None si no existe
+        """
+        data = self._get_memory(key)
+        return data if data is not None else self._get_disk(key)
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """
+        Versión de `get` para el event loop: la búsqueda en disco se hace en un hilo.
+        """
+        data = self._get_memory(key)
+        return data if data is not None else await asyncio.to_thread(self._get_disk, key)
+
+    def put(self, key: str, data: bytes):
+        """
+        Guarda una entrada en ambos niveles.
+
+        Args:
+            key (str): Clave hexadecimal de la entrada
+            data (bytes): Contenido a guardar
+        """
+        if self._put_memory(key, data):
+            self._put_disk(key, data)
+
+    async def put_async(self, key: str, data: bytes):
+        """
+        Versión de `put` para el event loop: la escritura en disco se hace en un hilo.
+        """
+        if self._put_memory(key, data):
+            await asyncio.to_thread(self._put_disk, key, data)
+
+    def clear(self):
+        """
+        Elimina todas las entradas de ambos niveles.
+        """
+        with self._lock:
+            for key in list(self._disk):
+                self._path(key).unlink(missing_ok=True)
+            self._disk.clear()
+            self._disk_bytes = 0
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def get_stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
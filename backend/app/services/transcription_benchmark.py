@@ -0,0 +1,112 @@
+import sys
+import time
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import List
+from app.services.metrics import LatencyStats
+from app.services.transcription_service import TranscriptionBackend, create_transcription_backend
+
+logger = logging.getLogger(__name__)
+
+
+async def benchmark_backend(backend: TranscriptionBackend, files: List[Path], requests: int,
+                            concurrency: int, language: str = "es") -> dict:
+    """
+    Mide latencia y rendimiento de un motor de transcripción, sin caché.
+
+    Args:
+        backend (TranscriptionBackend): Motor a medir
+        files (List[Path]): Audios de prueba (se reparten en orden entre las peticiones)
+        requests (int): Total de transcripciones
+        concurrency (int): Transcripciones simultáneas
+        language (str): Código de idioma o "auto"
+
+    Returns:
+        dict: Tiempo de preparación, latencias, peticiones por segundo y factor de tiempo real
+    """
+    started_at = time.perf_counter()
+    await backend.start()
+    warmup = time.perf_counter() - started_at
+
+    audios = [(path.name, path.read_bytes()) for path in files]
+    latency = LatencyStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    audio_seconds = 0.0
+    errors = 0
+
+    async def run(i: int):
+        nonlocal audio_seconds, errors
+        filename, audio = audios[i % len(audios)]
+        async with semaphore:
+            call_started_at = time.perf_counter()
+            try:
+                result = await backend.transcribe(audio, filename, language, "verbose_json")
+                audio_seconds += result.duration or 0.0
+            except Exception as e:
+                errors += 1
+                logger.error(f"{backend.name}: {type(e).__name__}: {str(e)}")
+            latency.observe(time.perf_counter() - call_started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started_at
+
+    snapshot = latency.snapshot()
+    return {
+        "backend": backend.name,
+        "model": backend.model,
+        "warmup_seconds": round(warmup, 2),
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(requests / elapsed, 2) if elapsed else 0.0,
+        "realtime_factor": round(audio_seconds / elapsed, 2) if elapsed else 0.0,
+        "latency_avg": snapshot["avg"],
+        "latency_p50": snapshot["p50"],
+        "latency_p95": snapshot["p95"],
+        "latency_max": snapshot["max"],
+    }
+
+
+async def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara la latencia y el rendimiento de los motores de transcripción")
+    parser.add_argument("files", nargs="+", type=Path, help="Audios de prueba")
+    parser.add_argument("--backend", dest="backends", action="append", choices=["openai", "local"],
+                        help="Motor a medir (se puede repetir). Por defecto ambos")
+    parser.add_argument("--requests", type=int, default=8, help="Transcripciones por motor")
+    parser.add_argument("--concurrency", type=int, default=4, help="Transcripciones simultáneas")
+    parser.add_argument("--language", default="es", help="Código de idioma o 'auto'")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.backends or ["openai", "local"]:
+        backend = create_transcription_backend(name)
+        if not backend.configured:
+            print(f"{name}: no está configurado, se omite")
+            continue
+
+        print(f"Midiendo {name} ({backend.model}): {args.requests} peticiones, {args.concurrency} simultáneas...")
+        try:
+            results.append(await benchmark_backend(backend, args.files, args.requests, args.concurrency, args.language))
+        finally:
+            await backend.close()
+
+    if not results:
+        return 1
+
+    columns = list(results[0])
+    widths = [max(len(column), *(len(str(r[column])) for r in results)) for column in columns]
+    print()
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[c]).ljust(w) for c, w in zip(columns, widths)))
+
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,562 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from app.config.settings import settings
+from app.services.metrics import ConcurrencyLimiter, LatencyStats
+from app.services.tiered_cache import TieredCache
+from app.services.audio_preprocess import AudioChunk, PreprocessedAudio, preprocess_audio, split_audio
+from app.services.audio_transcode import AudioTranscoder
+from app.services.audio_probe import probe_audio, probe_path
+
+logger = logging.getLogger(__name__)
+
+AudioInput = Union[bytes, str, Path]
+
+# Formatos que acepta la API de OpenAI Whisper sin conversión
+WHISPER_FORMATS = frozenset({".flac", ".m4a", ".mp3", ".mp4", ".mpeg", ".mpga", ".ogg", ".wav", ".webm"})
+
+
+class TranscriptSegment(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+
+class TranscriptionResult(NamedTuple):
+    text: str
+    language: Optional[str] = None
+    duration: Optional[float] = None
+    cached: bool = False
+    segments: Tuple[TranscriptSegment, ...] = ()
+    bytes_saved: int = 0
+    seconds_saved: float = 0.0
+
+
+def file_sha256(path: Union[str, Path], chunk_size: int = 1048576) -> str:
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por fragmentos.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def audio_sha256(audio: Union[bytes, str, Path]) -> str:
+    """
+    Calcula el SHA-256 del audio, en memoria o en un archivo.
+    """
+    return hashlib.sha256(audio).hexdigest() if isinstance(audio, bytes) else file_sha256(audio)
+
+
+class TranscriptionBackend(ABC):
+    """
+    Motor que convierte audio en texto. `TranscriptionService` le agrega caché y métricas.
+    """
+
+    name = ""
+    model = ""
+    formats: Optional[frozenset] = None  # Extensiones que acepta el motor (None = cualquiera que lea ffmpeg)
+
+    @property
+    def configured(self) -> bool:
+        """
+        Indica si el motor tiene lo necesario para transcribir (credenciales o dependencias).
+        """
+        return True
+
+    async def start(self):
+        """
+        Prepara el motor (conexiones, carga del modelo). Por defecto no hace nada.
+        """
+
+    @abstractmethod
+    async def transcribe(self, audio: AudioInput, filename: str, language: str,
+                         response_format: str) -> TranscriptionResult:
+        """
+        Transcribe un audio sin bloquear el event loop.
+        """
+
+    @abstractmethod
+    def transcribe_sync(self, audio: AudioInput, filename: str, language: str,
+                        response_format: str) -> TranscriptionResult:
+        """
+        Transcribe un audio desde código síncrono (scripts de consola).
+        """
+
+    async def close(self):
+        """
+        Libera los recursos del motor. Por defecto no hace nada.
+        """
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """
+        Obtiene las métricas del motor.
+        """
+
+
+class OpenAITranscriptionBackend(TranscriptionBackend):
+    """
+    Transcripción remota con la API de OpenAI Whisper.
+
+    Usa un cliente asíncrono con un pool de conexiones keep-alive, limita las llamadas
+    simultáneas, aplica un tiempo máximo por llamada y mide la latencia de cada una.
+    Para scripts de consola ofrece `transcribe_sync`, con su propio pool síncrono.
+    """
+
+    name = "openai"
+    formats = WHISPER_FORMATS
+
+    def __init__(self, api_key: str = None, model: str = None, max_concurrency: int = None,
+                 timeout: float = None, max_connections: int = None):
+        """
+        Args:
+            api_key (str): API key de OpenAI. Por defecto `settings.openai_api_key` u OPENAI_API_KEY
+            model (str): Modelo de transcripción. Por defecto `settings.openai_transcription_model`
+            max_concurrency (int): Máximo de transcripciones simultáneas
+            timeout (float): Tiempo máximo por llamada en segundos
+            max_connections (int): Máximo de conexiones HTTP abiertas con OpenAI
+        """
+        self.api_key = api_key or settings.openai_api_key or os.getenv("OPENAI_API_KEY")
+        self.model = model or settings.openai_transcription_model
+        self.timeout = timeout or settings.openai_timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.openai_max_connections,
+            max_keepalive_connections=max_connections or settings.openai_max_connections
+        )
+        self.limiter = ConcurrencyLimiter(max_concurrency or settings.openai_max_concurrency, name="whisper")
+        self.sync_latency = LatencyStats()
+
+        self.client = AsyncOpenAI(
+            api_key=self.api_key,
+            timeout=self.timeout,
+            max_retries=settings.openai_max_retries,
+            http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        )
+        self._sync_client: Optional[OpenAI] = None
+        self._sync_lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _request(self, audio: AudioInput, filename: str, language: str, response_format: str) -> dict:
+        file = (filename or "audio.wav", audio) if isinstance(audio, bytes) else Path(audio)
+        request = {"model": self.model, "file": file, "response_format": response_format}
+        if language and language != "auto":
+            request["language"] = language
+        return request
+
+    @staticmethod
+    def _result(transcription) -> TranscriptionResult:
+        if isinstance(transcription, str):
+            return TranscriptionResult(transcription.strip())
+        return TranscriptionResult(
+            text=getattr(transcription, "text", str(transcription)),
+            language=getattr(transcription, "language", None),
+            duration=getattr(transcription, "duration", None),
+            segments=tuple(
+                TranscriptSegment(segment.start, segment.end, segment.text.strip())
+                for segment in getattr(transcription, "segments", None) or []
+            )
+        )
+
+    async def transcribe(self, audio: AudioInput, filename: str, language: str,
+                         response_format: str) -> TranscriptionResult:
+        request = self._request(audio, filename, language, response_format)
+        async with self.limiter.slot():
+            transcription = await self.client.audio.transcriptions.create(**request)
+        return self._result(transcription)
+
+    def transcribe_sync(self, audio: AudioInput, filename: str, language: str,
+                        response_format: str) -> TranscriptionResult:
+        with self._sync_lock:
+            if self._sync_client is None:
+                self._sync_client = OpenAI(
+                    api_key=self.api_key,
+                    timeout=self.timeout,
+                    max_retries=settings.openai_max_retries,
+                    http_client=httpx.Client(limits=self.limits, timeout=self.timeout)
+                )
+
+        request = self._request(audio, filename, language, response_format)
+        started_at = time.perf_counter()
+        try:
+            transcription = self._sync_client.audio.transcriptions.create(**request)
+        finally:
+            self.sync_latency.observe(time.perf_counter() - started_at)
+        return self._result(transcription)
+
+    async def close(self):
+        """
+        Cierra los pools de conexiones.
+        """
+        await self.client.close()
+        if self._sync_client is not None:
+            self._sync_client.close()
+
+    def get_stats(self) -> dict:
+        return {
+            "timeout": self.timeout,
+            "max_connections": self.limits.max_connections,
+            **self.limiter.snapshot(),
+            "sync_latency": self.sync_latency.snapshot()
+        }
+
+
+def create_transcription_backend(name: str = None) -> TranscriptionBackend:
+    """
+    Crea el motor de transcripción configurado en `settings.transcription_backend`.
+
+    Args:
+        name (str): "openai" (API remota) o "local" (faster-whisper en este proceso)
+
+    Returns:
+        TranscriptionBackend: Motor de transcripción
+
+    Raises:
+        ValueError: Si el motor no está soportado
+    """
+    name = (name or settings.transcription_backend).lower()
+    if name == "openai":
+        return OpenAITranscriptionBackend()
+    if name == "local":
+        from app.services.local_whisper import LocalWhisperBackend
+        return LocalWhisperBackend()
+    raise ValueError(f"Motor de transcripción no soportado: {name}")
+
+
+class TranscriptionService:
+    """
+    Servicio de transcripción compartido por toda la aplicación.
+
+    Delega en el motor configurado (API de OpenAI o Whisper local) y guarda los resultados
+    en una caché por contenido del audio, idioma y modelo, así los reintentos y envíos
+    repetidos del mismo audio no vuelven a transcribirse. Antes de transcribir, los WAV se
+    pasan a mono 16 kHz y se les recortan los silencios (`audio_preprocess`).
+
+    Los audios largos se dividen en silencios en tramos de hasta `transcription_chunk_seconds`
+    que se transcriben en paralelo; el texto se une en orden y las marcas de tiempo de cada
+    tramo se desplazan a su posición en el audio completo. Si se recortaron silencios, las
+    marcas de tiempo y la duración se llevan de vuelta al audio original.
+
+    Los formatos comprimidos que el motor acepta (WebM/Opus, M4A, OGG, ...) se envían tal cual,
+    porque ocupan mucho menos que un WAV. Solo se transcodifican, en un pool de procesos, los
+    que el motor no acepta y los que son tan largos que hay que dividirlos.
+    """
+
+    def __init__(self, backend: TranscriptionBackend = None, cache: TieredCache = None,
+                 transcoder: AudioTranscoder = None):
+        """
+        Args:
+            backend (TranscriptionBackend): Motor de transcripción. Si es None, se crea según settings
+            cache (TieredCache): Caché de transcripciones. Si es None, se crea según settings
+            transcoder (AudioTranscoder): Etapa de transcodificación. Si es None, se crea según settings
+        """
+        self.backend = backend or create_transcription_backend()
+        self.transcoder = transcoder or AudioTranscoder()
+        self.audio_bytes = 0
+        self.errors = 0
+        self.preprocessed = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        self.chunked = 0
+        self.chunks = 0
+
+        if cache is None and settings.transcription_cache_enabled:
+            cache = TieredCache(
+                settings.transcription_cache_dir,
+                memory_max_bytes=settings.transcription_cache_memory_bytes,
+                disk_max_bytes=settings.transcription_cache_disk_bytes
+            )
+        self.cache = cache
+
+    @property
+    def model(self) -> str:
+        return self.backend.model
+
+    def _count(self, audio: AudioInput):
+        self.audio_bytes += len(audio) if isinstance(audio, bytes) else Path(audio).stat().st_size
+
+    @staticmethod
+    def _name(audio: AudioInput, filename: Optional[str]) -> str:
+        return filename or (Path(audio).name if not isinstance(audio, bytes) else "audio.wav")
+
+    def _needs_transcoding(self, audio: AudioInput, name: str) -> bool:
+        suffix = Path(name).suffix.lower()
+        if suffix == ".wav":
+            return False
+        if self.backend.formats is not None and suffix not in self.backend.formats:
+            return True
+        if not settings.transcription_chunk_seconds:
+            return False
+        # Un audio comprimido largo se decodifica para poder dividirlo en silencios
+        info = probe_audio(audio) if isinstance(audio, bytes) else probe_path(audio)
+        return info is not None and info.duration > settings.transcription_chunk_seconds
+
+    def _prepare(self, audio: AudioInput, filename: Optional[str], transcoded: PreprocessedAudio = None):
+        # Solo se preprocesan y dividen WAV (o audios ya transcodificados a WAV);
+        # el resto de formatos se envía sin cambios
+        name = self._name(audio, filename)
+        if transcoded is None and not name.lower().endswith(".wav"):
+            return audio, filename, None, None
+
+        result = transcoded
+        if result is None and settings.audio_preprocess_enabled:
+            data = audio if isinstance(audio, bytes) else Path(audio).read_bytes()
+            result = preprocess_audio(data, name)
+        if result is not None:
+            audio, filename = result.audio, result.filename
+            self.preprocessed += 1
+            self.bytes_saved += result.bytes_saved
+            self.seconds_saved += result.seconds_saved
+
+        chunks = None
+        if settings.transcription_chunk_seconds:
+            data = audio if isinstance(audio, bytes) else Path(audio).read_bytes()
+            chunks = split_audio(data, settings.transcription_chunk_seconds)
+            if len(chunks) > 1:
+                self.chunked += 1
+                self.chunks += len(chunks)
+                logger.info(f"Audio '{name}' dividido en {len(chunks)} tramos "
+                            f"(el más largo de {max(c.seconds for c in chunks):.1f}s)")
+            else:
+                chunks = None
+        return audio, filename, result, chunks
+
+    @staticmethod
+    def _merge(chunks: List[AudioChunk], results: List[TranscriptionResult]) -> TranscriptionResult:
+        segments = [
+            TranscriptSegment(round(segment.start + chunk.offset, 3), round(segment.end + chunk.offset, 3), segment.text)
+            for chunk, result in zip(chunks, results)
+            for segment in result.segments
+        ]
+        durations = [result.duration for result in results]
+        return TranscriptionResult(
+            text=" ".join(result.text.strip() for result in results if result.text.strip()),
+            language=next((result.language for result in results if result.language), None),
+            duration=None if None in durations else chunks[-1].offset + durations[-1],
+            segments=tuple(segments)
+        )
+
+    @staticmethod
+    def _finish(result: TranscriptionResult, prepared: Optional[PreprocessedAudio]) -> TranscriptionResult:
+        # El motor recibió el audio sin silencios: las marcas de tiempo se llevan al audio original
+        if prepared is None or prepared.time_map is None:
+            return result
+        to_original = prepared.time_map.to_original
+        return result._replace(
+            duration=None if result.duration is None else round(prepared.original_seconds, 3),
+            segments=tuple(
+                TranscriptSegment(round(to_original(segment.start), 3), round(to_original(segment.end), 3), segment.text)
+                for segment in result.segments
+            )
+        )
+
+    async def _transcribe_chunks(self, chunks: List[AudioChunk], filename: str, language: str,
+                                 response_format: str) -> TranscriptionResult:
+        semaphore = asyncio.Semaphore(settings.transcription_chunk_workers)
+
+        async def run(chunk: AudioChunk) -> TranscriptionResult:
+            async with semaphore:
+                return await self.backend.transcribe(chunk.audio, filename, language, response_format)
+
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return self._merge(chunks, results)
+
+    def _transcribe_chunks_sync(self, chunks: List[AudioChunk], filename: str, language: str,
+                                response_format: str) -> TranscriptionResult:
+        with ThreadPoolExecutor(max_workers=settings.transcription_chunk_workers) as executor:
+            results = list(executor.map(
+                lambda chunk: self.backend.transcribe_sync(chunk.audio, filename, language, response_format),
+                chunks
+            ))
+        return self._merge(chunks, results)
+
+    def _cache_key(self, sha256: str, language: str, response_format: str) -> str:
+        key = "\0".join([sha256, language or "auto", self.backend.name, self.model, response_format])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _decode(data: Optional[bytes]) -> Optional[TranscriptionResult]:
+        if data is None:
+            return None
+        logger.info("Transcripción obtenida de la caché")
+        data = json.loads(data)
+        segments = tuple(TranscriptSegment(*segment) for segment in data.pop("segments", []))
+        return TranscriptionResult(**data, segments=segments, cached=True)
+
+    @staticmethod
+    def _encode(result: TranscriptionResult) -> bytes:
+        data = {"text": result.text, "language": result.language, "duration": result.duration,
+                "segments": [list(segment) for segment in result.segments]}
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def _lookup(self, cache_key: str) -> Optional[TranscriptionResult]:
+        return self._decode(self.cache.get(cache_key))
+
+    async def _lookup_async(self, cache_key: str) -> Optional[TranscriptionResult]:
+        # Solo los aciertos en memoria se resuelven en el event loop; el disco se lee en un hilo
+        return self._decode(await self.cache.get_async(cache_key))
+
+    def _store(self, cache_key: str, result: TranscriptionResult):
+        self.cache.put(cache_key, self._encode(result))
+
+    async def _store_async(self, cache_key: str, result: TranscriptionResult):
+        await self.cache.put_async(cache_key, self._encode(result))
+
+    async def start(self):
+        """
+        Prepara el motor de transcripción (por ejemplo, carga el modelo local).
+        """
+        await self.backend.start()
+
+    async def transcribe(self, audio: AudioInput, filename: str = None, language: str = "es",
+                         response_format: str = "verbose_json", sha256: str = None) -> TranscriptionResult:
+        """
+        Transcribe un audio en memoria o un archivo.
+
+        Args:
+            audio (bytes | str | Path): Contenido del audio o ruta del archivo
+            filename (str): Nombre con la extensión del formato, si se pasa el contenido en memoria
+            language (str): Código de idioma o "auto"
+            response_format (str): Formato de respuesta de la API ("verbose_json" o "text")
+            sha256 (str): SHA-256 del audio, si ya se calculó (por ejemplo al recibir la subida)
+
+        Returns:
+            TranscriptionResult: Texto, idioma detectado, duración del audio, segmentos con marcas de
+                tiempo (con "verbose_json") y si vino de la caché
+
+        Raises:
+            Exception: Si el motor falla o se excede el tiempo máximo
+        """
+        cache_key = None
+        if self.cache is not None:
+            if sha256 is None:
+                # Hasta settings.max_file_size bytes: fuera del event loop también cuando está en memoria
+                sha256 = await asyncio.to_thread(audio_sha256, audio)
+            cache_key = self._cache_key(sha256, language, response_format)
+            cached = await self._lookup_async(cache_key)
+            if cached is not None:
+                return cached
+
+        self._count(audio)
+        try:
+            name = self._name(audio, filename)
+            transcoded = None
+            if await asyncio.to_thread(self._needs_transcoding, audio, name):
+                transcoded = await self.transcoder.transcode(audio, name, trim=settings.audio_preprocess_enabled)
+            audio, filename, prepared, chunks = await asyncio.to_thread(self._prepare, audio, filename, transcoded)
+            if chunks:
+                result = await self._transcribe_chunks(chunks, filename, language, response_format)
+            else:
+                result = await self.backend.transcribe(audio, filename, language, response_format)
+        except Exception:
+            self.errors += 1
+            raise
+
+        result = self._finish(result, prepared)
+        if cache_key is not None:
+            await self._store_async(cache_key, result)
+        if prepared is None:
+            return result
+        return result._replace(bytes_saved=prepared.bytes_saved, seconds_saved=prepared.seconds_saved)
+
+    def transcribe_sync(self, audio: AudioInput, filename: str = None, language: str = "es",
+                        response_format: str = "verbose_json", sha256: str = None) -> TranscriptionResult:
+        """
+        Versión síncrona de `transcribe`, para scripts de consola fuera del event loop.
+        """
+        cache_key = None
+        if self.cache is not None:
+            if sha256 is None:
+                sha256 = audio_sha256(audio)
+            cache_key = self._cache_key(sha256, language, response_format)
+            cached = self._lookup(cache_key)
+            if cached is not None:
+                return cached
+
+        self._count(audio)
+        try:
+            name = self._name(audio, filename)
+            transcoded = None
+            if self._needs_transcoding(audio, name):
+                transcoded = self.transcoder.transcode_sync(audio, name, trim=settings.audio_preprocess_enabled)
+            audio, filename, prepared, chunks = self._prepare(audio, filename, transcoded)
+            if chunks:
+                result = self._transcribe_chunks_sync(chunks, filename, language, response_format)
+            else:
+                result = self.backend.transcribe_sync(audio, filename, language, response_format)
+        except Exception:
+            self.errors += 1
+            raise
+
+        result = self._finish(result, prepared)
+        if cache_key is not None:
+            self._store(cache_key, result)
+        if prepared is None:
+            return result
+        return result._replace(bytes_saved=prepared.bytes_saved, seconds_saved=prepared.seconds_saved)
+
+    async def close(self):
+        """
+        Libera los recursos del motor de transcripción.
+        """
+        await self.backend.close()
+        self.transcoder.close()
+
+    def get_stats(self) -> dict:
+        """
+        Obtiene métricas de concurrencia y latencia de las transcripciones.
+
+        Returns:
+            dict: Motor, modelo, llamadas en curso y en espera, latencias, bytes, errores, ahorro del
+                preprocesamiento, transcodificación, audios divididos en tramos y caché
+        """
+        return {
+            "backend": self.backend.name,
+            "model": self.model,
+            "audio_bytes": self.audio_bytes,
+            "errors": self.errors,
+            "preprocess": {
+                "files": self.preprocessed,
+                "bytes_saved": self.bytes_saved,
+                "seconds_saved": round(self.seconds_saved, 2)
+            },
+            "chunking": {
+                "files": self.chunked,
+                "chunks": self.chunks,
+                "max_seconds": settings.transcription_chunk_seconds,
+                "workers": settings.transcription_chunk_workers
+            },
+            "transcode": self.transcoder.get_stats(),
+            **self.backend.get_stats(),
+            "cache": self.cache.get_stats() if self.cache is not None else None
+        }
+
+
+_service: Optional[TranscriptionService] = None
+_service_lock = threading.Lock()
+
+
+def get_transcription_service() -> TranscriptionService:
+    """
+    Obtiene la instancia compartida del servicio de transcripción (se crea al primer uso).
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TranscriptionService()
+        return _service
@@ -0,0 +1,140 @@
+import sys
+import asyncio
+import argparse
+import logging
+from typing import List, Tuple
+from app.config.settings import settings
+from app.services.tts_service import TTSService, AUDIO_FORMATS
+
+logger = logging.getLogger(__name__)
+
+# Frases fijas de la Tortuga Seleccionadora que se repiten en casi todas las conversaciones.
+# /chat/send-stream y /chat/voice sintetizan oración por oración, así que cada una de estas
+# frases que aparezca en una respuesta sale de la caché de TTS; /chat/send sintetiza la
+# respuesta completa y solo acierta cuando toda la respuesta es una de estas frases
+INTRO_PHRASES = [
+    "¡Hola! Soy la Tortuga Seleccionadora de ESPOL.",
+    "¡Hola! Soy la Tortuga Seleccionadora de la ESPOL y te ayudaré a descubrir la carrera ideal para ti.",
+    "Te haré algunas preguntas para conocerte mejor.",
+]
+
+FAREWELL_PHRASES = [
+    "¡Mucho éxito en tu camino universitario!",
+    "¡Te deseo mucho éxito en ESPOL!",
+    "¡Gracias por conversar conmigo y mucho éxito!",
+]
+
+VERDICT_TEMPLATE = "Tú perteneces a la Facultad {faculty} y a la carrera {career}."
+
+
+def parse_careers(prompt_system: str = None) -> List[Tuple[str, str]]:
+    """
+    Obtiene las facultades y carreras listadas en el prompt del sistema.
+    Las facultades aparecen como "--SIGLA" y debajo, una carrera por línea.
+
+    Args:
+        prompt_system (str): Prompt con la oferta académica. Por defecto `settings.prompt_system`
+
+    Returns:
+        List[Tuple[str, str]]: Pares (facultad, carrera)
+    """
+    text = prompt_system or settings.prompt_system
+    _, _, catalog = text.partition("Facultades y Carreras de ESPOL:")
+
+    careers = []
+    faculty = None
+    for line in catalog.splitlines():
+        line = line.strip()
+        if line.startswith("--"):
+            faculty = line[2:].strip()
+        elif line and faculty:
+            careers.append((faculty, line))
+    return careers
+
+
+def default_phrases(prompt_system: str = None) -> List[str]:
+    """
+    Frases a pre-generar: presentación, despedidas y el veredicto de cada carrera.
+
+    Args:
+        prompt_system (str): Prompt con la oferta académica. Por defecto `settings.prompt_system`
+    """
+    verdicts = [VERDICT_TEMPLATE.format(faculty=f, career=c) for f, c in parse_careers(prompt_system)]
+    return INTRO_PHRASES + FAREWELL_PHRASES + verdicts
+
+
+async def prerender(tts: TTSService, phrases: List[str] = None, audio_formats: List[str] = None,
+                    show_progress: bool = False) -> List[dict]:
+    """
+    Sintetiza las frases fijas en la caché de TTS, una pasada por formato.
+
+    Args:
+        tts (TTSService): Servicio cuya caché se llena
+        phrases (List[str]): Frases a sintetizar. Por defecto `default_phrases()`
+        audio_formats (List[str]): Formatos a generar. Por defecto el de settings
+        show_progress (bool): Imprime el avance en la terminal
+
+    Returns:
+        List[dict]: Resultado de `synthesize_batch` por formato
+    """
+    phrases = phrases or default_phrases()
+    results = []
+
+    for audio_format in audio_formats or [settings.tts_audio_format]:
+        def progress(done: int, total: int):
+            print(f"\r[{audio_format}] {done}/{total} frases", end="", flush=True)
+            if done == total:
+                print()
+
+        result = await tts.synthesize_batch(phrases, audio_format, on_progress=progress if show_progress else None)
+        logger.info(
+            f"Pre-generación TTS ({audio_format}): {result['synthesized']} sintetizadas, "
+            f"{result['cached']} ya en caché, {result['failed']} fallidas en {result['seconds']}s "
+            f"({result['texts_per_second']} frases/s)"
+        )
+        results.append({"audio_format": audio_format, **result})
+
+    return results
+
+
+async def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-genera en la caché de TTS las frases fijas de la Tortuga Seleccionadora")
+    parser.add_argument("--format", dest="audio_formats", action="append", choices=list(AUDIO_FORMATS),
+                        help="Formato de audio (se puede repetir). Por defecto TTS_AUDIO_FORMAT")
+    parser.add_argument("--phrases", help="Archivo de texto con una frase por línea, en lugar de las frases por defecto")
+    parser.add_argument("--concurrency", type=int, help="Máximo de llamadas simultáneas a Google TTS")
+    parser.add_argument("--list", action="store_true", help="Solo muestra las frases, sin sintetizarlas")
+    args = parser.parse_args(argv)
+
+    if args.phrases:
+        with open(args.phrases, encoding="utf-8") as f:
+            phrases = [line.strip() for line in f if line.strip()]
+    else:
+        phrases = default_phrases()
+
+    if args.list:
+        print("\n".join(phrases))
+        return 0
+
+    if not settings.tts_cache_enabled:
+        print("La caché de TTS está desactivada (TTS_CACHE_ENABLED=false); no hay dónde pre-generar.")
+        return 1
+
+    tts = TTSService(max_concurrency=args.concurrency)
+    await tts.start()
+    try:
+        results = await prerender(tts, phrases, args.audio_formats, show_progress=True)
+    finally:
+        await tts.close()
+
+    for result in results:
+        print(f"{result['audio_format']}: {result['synthesized']} sintetizadas, {result['cached']} ya en caché, "
+              f"{result['failed']} fallidas, {result['bytes']} bytes en {result['seconds']}s "
+              f"({result['texts_per_second']} frases/s)")
+
+    return 1 if any(r["failed"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(asyncio.run(main()))
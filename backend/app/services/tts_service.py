@@ -1,11 +1,91 @@
+import asyncio
 import os
+import hashlib
+import time
+import threading
+from typing import Callable, List, NamedTuple, Optional
 from google.cloud import texttospeech
 from pathlib import Path
 from app.config.settings import settings
+from app.services.tiered_cache import TieredCache
+from app.services.audio_store import AudioArtifactStore
+from app.services.metrics import ConcurrencyLimiter
+from app.services.audio_probe import probe_audio
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class AudioFormat(NamedTuple):
+    encoding: "texttospeech.AudioEncoding"
+    extension: str
+    media_type: str
+
+
+# Formatos de salida soportados. OGG_OPUS ocupa una fracción de MP3 para voz.
+AUDIO_FORMATS = {
+    "mp3": AudioFormat(texttospeech.AudioEncoding.MP3, ".mp3", "audio/mpeg"),
+    "ogg_opus": AudioFormat(texttospeech.AudioEncoding.OGG_OPUS, ".ogg", "audio/ogg"),
+    "wav": AudioFormat(texttospeech.AudioEncoding.LINEAR16, ".wav", "audio/wav"),
+}
+
+# Tipos MIME del encabezado Accept que corresponden a cada formato
+ACCEPT_MEDIA_TYPES = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/ogg": "ogg_opus",
+    "audio/opus": "ogg_opus",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+}
+
+class SynthesisRequest(NamedTuple):
+    synthesis_input: "texttospeech.SynthesisInput"
+    voice: "texttospeech.VoiceSelectionParams"
+    audio_config: "texttospeech.AudioConfig"
+    audio_format: str
+    cache_key: str
+
+
+def negotiate_audio_format(requested: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """
+    Elige el formato de audio: primero el pedido explícitamente, luego el tipo de audio
+    con mayor preferencia en el encabezado Accept y por último el de settings.
+
+    Args:
+        requested (str): Formato pedido en la petición ("mp3", "ogg_opus" o "wav")
+        accept (str): Encabezado Accept de la petición
+
+    Returns:
+        str: Nombre del formato elegido
+
+    Raises:
+        ValueError: Si el formato pedido no está soportado
+    """
+    if requested:
+        if requested not in AUDIO_FORMATS:
+            raise ValueError(f"Formato de audio no soportado: {requested}. Formatos: {', '.join(AUDIO_FORMATS)}")
+        return requested
+
+    if accept:
+        candidates = []
+        for position, item in enumerate(accept.split(",")):
+            media_type, *params = [part.strip() for part in item.split(";")]
+            quality = 1.0
+            for param in params:
+                if param.startswith("q="):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            if media_type.lower() in ACCEPT_MEDIA_TYPES and quality > 0:
+                candidates.append((-quality, position, ACCEPT_MEDIA_TYPES[media_type.lower()]))
+        if candidates:
+            return min(candidates)[2]
+
+    return settings.tts_audio_format
+
+
 class TTSService:
     """
     Un servicio para convertir texto a voz y guardarlo localmente.
@@ -26,7 +106,8 @@ class TTSService:
         "español_chirp_masculina": "es-ES-Chirp-HD-D"
     }
 
-    def __init__(self, output_folder="uploads/respuestas", voice_name=None):
+    def __init__(self, output_folder="uploads/respuestas", voice_name=None, cache=None,
+                 max_concurrency=None, timeout=None):
         """
         Inicializa el servicio y se asegura de que la carpeta de salida exista.
 
@@ -35,12 +116,18 @@ class TTSService:
             voice_name (str): Nombre de la voz a usar. Si es None, usa voz por defecto.
                              Puede ser un nombre completo (ej: "es-ES-Neural2-A") o
                              un alias de las voces recomendadas.
+            cache (TieredCache): Caché de audios sintetizados. Si es None, se crea según settings
+            max_concurrency (int): Máximo de llamadas simultáneas a Google TTS (cliente asíncrono)
+            timeout (float): Tiempo máximo por llamada en segundos
         """
         # Configurar la variable de entorno si está definida en settings
         if settings.google_application_credentials:
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = settings.google_application_credentials
 
         self.client = texttospeech.TextToSpeechClient()
+        self._async_client = None
+        self.timeout = timeout or settings.tts_timeout
+        self.limiter = ConcurrencyLimiter(max_concurrency or settings.tts_max_concurrency, name="tts")
         self.output_folder = output_folder
         self.voice_name = voice_name or "es-US-Neural2-B"  # Voz por defecto: español masculino Estados Unidos
 
@@ -48,112 +135,299 @@ class TTSService:
         if self.voice_name in self.RECOMMENDED_VOICES:
             self.voice_name = self.RECOMMENDED_VOICES[self.voice_name]
 
-        # Crea el directorio de salida si no existe
-        os.makedirs(self.output_folder, exist_ok=True)
+        if cache is None and settings.tts_cache_enabled:
+            cache = TieredCache(
+                settings.tts_cache_dir,
+                memory_max_bytes=settings.tts_cache_memory_bytes,
+                disk_max_bytes=settings.tts_cache_disk_bytes
+            )
+        self.cache = cache
+
+        self._audio_stats = {}
+        self._stats_lock = threading.Lock()
+
+        # Crea el directorio de salida si no existe e indexa los audios existentes
+        self.store = AudioArtifactStore(
+            self.output_folder,
+            max_age=settings.tts_output_max_age,
+            max_bytes=settings.tts_output_max_bytes,
+            memory_max_bytes=settings.tts_output_memory_bytes
+        )
         print(f"Carpeta de salida: '{self.output_folder}' está lista.")
         print(f"Voz seleccionada: {self.voice_name}")
 
-    def _get_next_filename(self) -> str:
+    @staticmethod
+    def _cache_key(text: str, voice, audio_config) -> str:
+        # El mismo texto con la misma voz y configuración de audio siempre produce el mismo audio
+        digest = hashlib.sha256()
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(texttospeech.VoiceSelectionParams.serialize(voice))
+        digest.update(b"\0")
+        digest.update(texttospeech.AudioConfig.serialize(audio_config))
+        return digest.hexdigest()
+
+    def _record_audio(self, audio_format: str, audio: bytes):
+        info = probe_audio(audio)
+        seconds = info.duration if info is not None else 0.0
+        with self._stats_lock:
+            stats = self._audio_stats.setdefault(audio_format, {"files": 0, "bytes": 0, "seconds": 0.0})
+            stats["files"] += 1
+            stats["bytes"] += len(audio)
+            stats["seconds"] += seconds
+
+    def synthesize(self, text: str, audio_format: str = None, sample_rate: int = None) -> bytes:
         """
-        Calcula el siguiente nombre de archivo secuencial (respuesta_1.mp3, respuesta_2.mp3, etc.).
+        Recibe un texto y genera el audio en memoria, sin escribirlo a disco.
+        Si el mismo texto ya se sintetizó con la misma voz y formato, se devuelve desde la caché.
+
+        Args:
+            text (str): El texto a convertir a voz
+            audio_format (str): "mp3", "ogg_opus" o "wav". Por defecto el de settings
+            sample_rate (int): Frecuencia de muestreo en Hz. Por defecto la de settings (0 = la de la voz)
 
         Returns:
-            str: Ruta completa del siguiente archivo a crear
-        """
-        if not os.path.exists(self.output_folder):
-            return os.path.join(self.output_folder, "respuesta_1.mp3")
+            bytes: Contenido del audio
 
-        files = [f for f in os.listdir(self.output_folder) if f.startswith("respuesta_") and f.endswith(".mp3")]
-        if not files:
-            return os.path.join(self.output_folder, "respuesta_1.mp3")
+        Raises:
+            ValueError: Si el texto está vacío o el formato no está soportado
+            Exception: Si hay un error al generar el audio
+        """
+        request = self._prepare(text, audio_format, sample_rate)
+        cached = self._lookup(request)
+        if cached is not None:
+            return cached
 
-        # Extrae los números de los nombres de archivo y encuentra el máximo
-        max_num = 0
-        for f in files:
-            try:
-                num_str = f.replace("respuesta_", "").replace(".mp3", "")
-                num = int(num_str)
-                if num > max_num:
-                    max_num = num
-            except ValueError:
-                continue # Ignora archivos que no sigan el patrón numérico
+        try:
+            logger.info("Llamando a Google TTS API...")
+            response = self.client.synthesize_speech(
+                input=request.synthesis_input,
+                voice=request.voice,
+                audio_config=request.audio_config,
+                timeout=self.timeout
+            )
+        except Exception as e:
+            error_msg = f"Error al generar audio: {type(e).__name__}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
 
-        next_num = max_num + 1
-        return os.path.join(self.output_folder, f"respuesta_{next_num}.mp3")
+        return self._finish(request, response.audio_content)
 
-    def synthesize_and_save(self, text: str) -> str:
+    async def synthesize_async(self, text: str, audio_format: str = None, sample_rate: int = None) -> bytes:
         """
-        Recibe un texto, genera el audio MP3 y lo guarda en un archivo.
+        Versión asíncrona de `synthesize`: no bloquea el event loop, reutiliza el canal gRPC
+        compartido y respeta el límite de llamadas simultáneas a Google TTS.
 
         Args:
             text (str): El texto a convertir a voz
+            audio_format (str): "mp3", "ogg_opus" o "wav". Por defecto el de settings
+            sample_rate (int): Frecuencia de muestreo en Hz. Por defecto la de settings (0 = la de la voz)
 
         Returns:
-            str: La ruta completa del archivo guardado
+            bytes: Contenido del audio
 
         Raises:
-            ValueError: Si el texto está vacío
-            Exception: Si hay un error al generar o guardar el audio
+            ValueError: Si el texto está vacío o el formato no está soportado
+            Exception: Si hay un error o se excede el tiempo al generar el audio
         """
+        request = self._prepare(text, audio_format, sample_rate)
+        cached = await self._lookup_async(request)
+        if cached is not None:
+            return cached
+        return await self._synthesize_request_async(request)
+
+    async def _synthesize_request_async(self, request: SynthesisRequest) -> bytes:
+        # Llamada a Google TTS para una petición que no estaba en la caché
+        client = self._get_async_client()
+        try:
+            async with self.limiter.slot():
+                logger.info("Llamando a Google TTS API (async)...")
+                response = await client.synthesize_speech(
+                    input=request.synthesis_input,
+                    voice=request.voice,
+                    audio_config=request.audio_config,
+                    timeout=self.timeout
+                )
+        except Exception as e:
+            error_msg = f"Error al generar audio: {type(e).__name__}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg) from e
+
+        return await self._finish_async(request, response.audio_content)
+
+    def _prepare(self, text: str, audio_format: Optional[str], sample_rate: Optional[int]) -> SynthesisRequest:
         if not text or not text.strip():
             error_msg = "El texto no puede estar vacío"
             logger.error(error_msg)
             raise ValueError(error_msg)
 
+        audio_format = negotiate_audio_format(audio_format)
+        sample_rate = settings.tts_sample_rate if sample_rate is None else sample_rate
+        logger.info(f"Generando audio para texto de {len(text)} caracteres")
+
+        # Configuración de entrada
+        synthesis_input = texttospeech.SynthesisInput(text=text.strip())
+
+        # Configuración de voz
+        # Extraer el código de idioma del nombre de la voz
+        language_code = self.voice_name.split('-')[0] + '-' + self.voice_name.split('-')[1]
+
+        voice = texttospeech.VoiceSelectionParams(
+            language_code=language_code,
+            name=self.voice_name
+        )
+
+        # Configuración de audio
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=AUDIO_FORMATS[audio_format].encoding,
+            sample_rate_hertz=sample_rate or None
+        )
+
+        cache_key = self._cache_key(text.strip(), voice, audio_config)
+        return SynthesisRequest(synthesis_input, voice, audio_config, audio_format, cache_key)
+
+    def _lookup(self, request: SynthesisRequest) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(request.cache_key)
+        if cached is not None:
+            logger.info("Audio obtenido de la caché de TTS")
+        return cached
+
+    async def _lookup_async(self, request: SynthesisRequest) -> Optional[bytes]:
+        # Solo los aciertos en memoria se resuelven en el event loop; el disco se lee en un hilo
+        if self.cache is None:
+            return None
+        cached = await self.cache.get_async(request.cache_key)
+        if cached is not None:
+            logger.info("Audio obtenido de la caché de TTS")
+        return cached
+
+    def _finish(self, request: SynthesisRequest, audio: bytes) -> bytes:
+        if self.cache is not None:
+            self.cache.put(request.cache_key, audio)
+        self._record_audio(request.audio_format, audio)
+        return audio
+
+    async def _finish_async(self, request: SynthesisRequest, audio: bytes) -> bytes:
+        # La escritura en disco y el cálculo de la duración (probe_audio) se hacen en un hilo
+        if self.cache is not None:
+            await self.cache.put_async(request.cache_key, audio)
+        await asyncio.to_thread(self._record_audio, request.audio_format, audio)
+        return audio
+
+    def _get_async_client(self):
+        # El cliente asíncrono se crea dentro del event loop y su canal gRPC se comparte entre peticiones
+        if self._async_client is None:
+            self._async_client = texttospeech.TextToSpeechAsyncClient()
+        return self._async_client
+
+    async def start(self):
+        """
+        Crea el cliente asíncrono y, si `tts_warmup` está activo, abre el canal gRPC con una
+        llamada liviana para que la primera síntesis no pague la conexión TLS.
+        """
+        client = self._get_async_client()
+        if not settings.tts_warmup:
+            return
+
+        language_code = "-".join(self.voice_name.split("-")[:2])
+        started_at = time.perf_counter()
         try:
-            logger.info(f"Generando audio para texto de {len(text)} caracteres")
+            await client.list_voices(language_code=language_code, timeout=self.timeout)
+            logger.info(f"Canal de Google TTS listo en {time.perf_counter() - started_at:.2f}s")
+        except Exception as e:
+            logger.warning(f"No se pudo precalentar Google TTS: {type(e).__name__}: {str(e)}")
 
-            # Configuración de entrada
-            synthesis_input = texttospeech.SynthesisInput(text=text.strip())
+    async def close(self):
+        """
+        Cierra el canal gRPC del cliente asíncrono.
+        """
+        if self._async_client is not None:
+            await self._async_client.transport.close()
+            self._async_client = None
 
-            # Configuración de voz
-            # Extraer el código de idioma del nombre de la voz
-            language_code = self.voice_name.split('-')[0] + '-' + self.voice_name.split('-')[1]
+    async def synthesize_batch(self, texts: List[str], audio_format: str = None, sample_rate: int = None,
+                               on_progress: Callable[[int, int], None] = None) -> dict:
+        """
+        Sintetiza varios textos en paralelo (respetando el límite de concurrencia) y los deja
+        en la caché de TTS. Los textos que ya estaban en caché no se vuelven a sintetizar.
 
-            voice = texttospeech.VoiceSelectionParams(
-                language_code=language_code,
-                name=self.voice_name
-            )
+        Args:
+            texts (List[str]): Textos a sintetizar
+            audio_format (str): "mp3", "ogg_opus" o "wav". Por defecto el de settings
+            sample_rate (int): Frecuencia de muestreo en Hz. Por defecto la de settings
+            on_progress (Callable[[int, int], None]): Se llama con (terminados, total) tras cada texto
 
-            # Configuración de audio
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            )
+        Returns:
+            dict: Textos sintetizados, ya en caché y fallidos, bytes, segundos y textos por segundo
+        """
+        texts = list(dict.fromkeys(t.strip() for t in texts if t and t.strip()))
+        result = {"total": len(texts), "synthesized": 0, "cached": 0, "failed": 0, "bytes": 0}
+        done = 0
+        started_at = time.perf_counter()
 
-            logger.info("Llamando a Google TTS API...")
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
+        async def render(text: str):
+            nonlocal done
+            try:
+                # Una sola búsqueda en caché por texto, así cada fallo se cuenta una vez en las estadísticas
+                request = self._prepare(text, audio_format, sample_rate)
+                if await self._lookup_async(request) is not None:
+                    result["cached"] += 1
+                else:
+                    audio = await self._synthesize_request_async(request)
+                    result["bytes"] += len(audio)
+                    result["synthesized"] += 1
+            except Exception as e:
+                logger.error(f"No se pudo pre-generar '{text[:40]}': {str(e)}")
+                result["failed"] += 1
+            done += 1
+            if on_progress:
+                on_progress(done, len(texts))
+
+        await asyncio.gather(*(render(text) for text in texts))
+
+        elapsed = time.perf_counter() - started_at
+        result["seconds"] = round(elapsed, 2)
+        result["texts_per_second"] = round(len(texts) / elapsed, 2) if elapsed else 0.0
+        return result
+
+    def synthesize_and_save(self, text: str, audio_format: str = None) -> str:
+        """
+        Recibe un texto, genera el audio y lo guarda en un archivo.
 
-            # Obtiene el nombre del archivo y lo guarda
-            output_path = self._get_next_filename()
-            logger.info(f"Guardando audio en: {output_path}")
+        Args:
+            text (str): El texto a convertir a voz
+            audio_format (str): "mp3", "ogg_opus" o "wav". Por defecto el de settings
 
-            with open(output_path, "wb") as out:
-                out.write(response.audio_content)
+        Returns:
+            str: La ruta completa del archivo guardado
 
-            logger.info(f"Audio guardado exitosamente: {output_path}")
-            return output_path
+        Raises:
+            ValueError: Si el texto está vacío
+            Exception: Si hay un error al generar o guardar el audio
+        """
+        audio_format = negotiate_audio_format(audio_format)
+        audio_content = self.synthesize(text, audio_format)
+
+        try:
+            artifact = self.store.save(audio_content, AUDIO_FORMATS[audio_format].extension)
+            logger.info(f"Audio guardado exitosamente: {artifact.path}")
+            return artifact.path
 
         except Exception as e:
-            error_msg = f"Error al generar audio: {type(e).__name__}: {str(e)}"
+            error_msg = f"Error al guardar audio: {type(e).__name__}: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg) from e
 
     def list_generated_files(self) -> list:
         """
-        Lista todos los archivos de audio generados.
+        Lista todos los archivos de audio generados, del más antiguo al más reciente.
 
         Returns:
-            list: Lista de archivos MP3 en la carpeta de respuestas
+            list: Rutas de los archivos de audio relativas a la carpeta de respuestas
         """
-        if not os.path.exists(self.output_folder):
-            return []
-
-        files = [f for f in os.listdir(self.output_folder) if f.endswith(".mp3")]
-        return sorted(files)
+        return [os.path.relpath(artifact.path, self.output_folder) for artifact in self.store.list()]
 
     def clear_responses(self) -> bool:
         """
@@ -162,21 +436,50 @@ class TTSService:
         Returns:
             bool: True si se eliminaron archivos, False si no había archivos
         """
-        if not os.path.exists(self.output_folder):
-            return False
-
-        files = [f for f in os.listdir(self.output_folder) if f.endswith(".mp3")]
-        if not files:
+        removed = self.store.clear()
+        if not removed:
             print("No hay archivos de audio para eliminar.")
             return False
 
-        for file in files:
-            file_path = os.path.join(self.output_folder, file)
-            os.remove(file_path)
-
-        print(f"Se eliminaron {len(files)} archivos de audio.")
+        print(f"Se eliminaron {removed} archivos de audio.")
         return True
 
+    def get_cache_stats(self) -> dict:
+        """
+        Obtiene los aciertos y fallos de la caché de audio.
+
+        Returns:
+            dict: Estadísticas de la caché, o vacío si está desactivada
+        """
+        return self.cache.get_stats() if self.cache is not None else {}
+
+    def get_stats(self) -> dict:
+        """
+        Obtiene métricas de concurrencia y latencia de las llamadas asíncronas a Google TTS.
+
+        Returns:
+            dict: Límite, llamadas en curso y en espera, y histogramas de espera y latencia
+        """
+        return {"timeout": self.timeout, **self.limiter.snapshot()}
+
+    def get_audio_stats(self) -> dict:
+        """
+        Obtiene, por formato, los audios sintetizados y los bytes por segundo de voz.
+
+        Returns:
+            dict: Archivos, bytes, segundos y bytes por segundo de cada formato
+        """
+        with self._stats_lock:
+            return {
+                audio_format: {
+                    "files": stats["files"],
+                    "bytes": stats["bytes"],
+                    "seconds": round(stats["seconds"], 2),
+                    "bytes_per_second": round(stats["bytes"] / stats["seconds"]) if stats["seconds"] else 0
+                }
+                for audio_format, stats in self._audio_stats.items()
+            }
+
     @classmethod
     def get_recommended_voices(cls) -> dict:
         """
@@ -239,7 +542,7 @@ if __name__ == "__main__":
     if resultado:
         print(f"Archivo creado exitosamente: {resultado}")
 
-    # Segunda prueba para verificar la secuencia de nombres
+    # Segunda prueba para verificar que cada audio recibe un archivo distinto
     otro_texto = "Muy interesante. Ahora cuéntame, ¿prefieres trabajar en equipo o disfrutas más resolviendo problemas por tu cuenta?"
     resultado2 = tts_service.synthesize_and_save(otro_texto)
 
@@ -0,0 +1,312 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+from app.config.settings import settings
+from app.services.transcription_service import file_sha256
+from app.services.audio_probe import probe_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL UNIQUE,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    size INTEGER NOT NULL,
+    duration REAL,
+    format TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_format ON uploads(format, id);
+CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads(sha256);
+"""
+
+
+def _modified_at(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+class UploadEntry(NamedTuple):
+    upload_id: int
+    filename: str
+    sha256: str
+    size: int
+    duration: Optional[float]
+    format: str
+    created_at: float
+    path: str
+
+
+class UploadCatalog:
+    """
+    Catálogo de los audios subidos en SQLite, con una sola copia en disco por contenido.
+
+    Cada subida es una entrada con nombre único (si el nombre ya existe con otro contenido se
+    le agrega parte del hash) que apunta a un archivo identificado por su SHA-256. Subir un
+    contenido ya guardado, con el mismo o con otro nombre, no vuelve a escribirlo a disco.
+    Los listados se responden desde el índice, paginados por cursor, sin recorrer la carpeta.
+    """
+
+    def __init__(self, directory: str, database: str):
+        """
+        Args:
+            directory (str): Carpeta de las subidas. Los archivos se guardan en `directory/blobs`
+            database (str): Ruta de la base de datos SQLite
+        """
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        Path(database).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.deduplicated = 0
+
+        if not self.count():
+            self._import_legacy()
+        logger.info(f"Catálogo de subidas '{database}': {self.count()} archivos")
+
+    def _import_legacy(self):
+        # Subidas anteriores al catálogo: archivos sueltos en la raíz de la carpeta. Si varios
+        # workers arrancan a la vez, otro puede mover o borrar un archivo mientras se importa
+        legacy = [
+            path for path in self.directory.iterdir()
+            if path.is_file() and not path.name.startswith(".") and path.suffix.lower() in settings.allowed_extensions
+        ]
+        imported = 0
+        for path in sorted(legacy, key=_modified_at):
+            try:
+                stat = path.stat()
+                info = probe_path(path)
+                self.add(path, path.name, file_sha256(path), stat.st_size,
+                         info.duration if info is not None else None, created_at=stat.st_mtime)
+            except FileNotFoundError:
+                continue
+            # Si el contenido ya estaba guardado, el archivo suelto es una copia de más
+            path.unlink(missing_ok=True)
+            imported += 1
+        if imported:
+            logger.info(f"Se importaron {imported} subidas anteriores al catálogo")
+
+    def _unique_name(self, filename: str, sha256: str) -> Tuple[str, bool]:
+        # Devuelve el nombre a usar y si ya existe una entrada con ese nombre y el mismo contenido
+        row = self._db.execute("SELECT sha256 FROM uploads WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            return filename, False
+        if row[0] == sha256:
+            return filename, True
+
+        path = Path(filename)
+        for length in range(8, 65, 8):
+            candidate = f"{path.stem}-{sha256[:length]}{path.suffix}"
+            row = self._db.execute("SELECT sha256 FROM uploads WHERE filename = ?", (candidate,)).fetchone()
+            if row is None or row[0] == sha256:
+                return candidate, row is not None
+        raise ValueError(f"No se pudo asignar un nombre único a '{filename}'")
+
+    def add(self, source: Union[Path, bytes], filename: str, sha256: str, size: int,
+            duration: Optional[float], created_at: float = None) -> Tuple[UploadEntry, bool]:
+        """
+        Registra una subida. Si el contenido ya está guardado, el archivo recibido se descarta.
+
+        Args:
+            source (Path | bytes): Archivo temporal (se mueve al almacén) o contenido en memoria
+            filename (str): Nombre original del archivo
+            sha256 (str): SHA-256 del contenido
+            size (int): Tamaño en bytes
+            duration (float): Duración en segundos, si se conoce
+            created_at (float): Fecha de la subida (timestamp). Por defecto, ahora
+
+        Returns:
+            Tuple[UploadEntry, bool]: La entrada y si el contenido ya estaba guardado
+        """
+        extension = Path(filename).suffix.lower()
+        blob_path = self.blob_dir / sha256[:2] / f"{sha256}{extension}"
+        # El contenido se escribe (o se mueve) junto a su destino antes de tomar los locks:
+        # dentro de la transacción solo queda renombrarlo, sin copiar datos mientras otros esperan
+        staged = self._stage(source, blob_path)
+        try:
+            with self._lock:
+                # BEGIN IMMEDIATE toma el lock de escritura antes de consultar: otro worker no puede
+                # registrar el mismo contenido o el mismo nombre entre la consulta y los INSERT
+                self._db.execute("BEGIN IMMEDIATE")
+                placed = False
+                try:
+                    name, existing = self._unique_name(filename, sha256)
+                    if existing:
+                        self._db.execute("ROLLBACK")
+                        return self._get(name), True
+
+                    blob = self._db.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+                    if blob is None:
+                        os.replace(staged, blob_path)
+                        placed = True
+                        self._db.execute("INSERT INTO blobs (sha256, path, size) VALUES (?, ?, ?)",
+                                         (sha256, str(blob_path), size))
+                    self._db.execute("UPDATE blobs SET refs = refs + 1 WHERE sha256 = ?", (sha256,))
+                    self._db.execute(
+                        "INSERT INTO uploads (filename, sha256, size, duration, format, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, sha256, size, duration, extension.lstrip("."), created_at or time.time())
+                    )
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    if placed:
+                        blob_path.unlink(missing_ok=True)
+                    raise
+
+                if blob is not None:
+                    self.deduplicated += 1
+                return self._get(name), blob is not None
+        finally:
+            # Sin usar si el contenido ya estaba guardado
+            staged.unlink(missing_ok=True)
+
+    @staticmethod
+    def _stage(source: Union[Path, bytes], blob_path: Path) -> Path:
+        # Archivo temporal en la carpeta del blob, con un nombre propio de este proceso e hilo
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        staged = blob_path.with_name(f".{blob_path.name}.{os.getpid()}.{threading.get_ident()}")
+        if isinstance(source, bytes):
+            staged.write_bytes(source)
+        else:
+            os.replace(source, staged)
+        return staged
+
+    def _get(self, filename: str) -> Optional[UploadEntry]:
+        row = self._db.execute(
+            "SELECT u.id, u.filename, u.sha256, u.size, u.duration, u.format, u.created_at, b.path "
+            "FROM uploads u JOIN blobs b ON b.sha256 = u.sha256 WHERE u.filename = ?",
+            (filename,)
+        ).fetchone()
+        return UploadEntry(*row) if row else None
+
+    def get(self, filename: str) -> Optional[UploadEntry]:
+        """
+        Obtiene una subida por su nombre en el catálogo.
+        """
+        with self._lock:
+            return self._get(filename)
+
+    def remove(self, filename: str) -> bool:
+        """
+        Elimina una subida. El archivo se borra cuando ninguna otra subida lo referencia.
+
+        Returns:
+            bool: True si la subida existía
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                entry = self._get(filename)
+                if entry is None:
+                    self._db.execute("ROLLBACK")
+                    return False
+
+                self._db.execute("DELETE FROM uploads WHERE id = ?", (entry.upload_id,))
+                self._db.execute("UPDATE blobs SET refs = refs - 1 WHERE sha256 = ?", (entry.sha256,))
+                orphan = self._db.execute("DELETE FROM blobs WHERE sha256 = ? AND refs <= 0",
+                                          (entry.sha256,)).rowcount
+                # El archivo se borra antes de liberar el lock de escritura: después, otro worker
+                # podría volver a subir el mismo contenido y dejarlo en la misma ruta
+                if orphan:
+                    Path(entry.path).unlink(missing_ok=True)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return True
+
+    def list_uploads(self, limit: int = 50, cursor: Optional[int] = None, audio_format: str = None,
+                     search: str = None, min_duration: float = None,
+                     max_duration: float = None) -> Tuple[List[UploadEntry], Optional[int]]:
+        """
+        Lista las subidas de la más reciente a la más antigua, una página a la vez.
+
+        Args:
+            limit (int): Entradas por página
+            cursor (int): `next_cursor` de la página anterior (None = primera página)
+            audio_format (str): Solo este formato ("mp3", "wav", ...)
+            search (str): Solo nombres que contengan este texto
+            min_duration (float): Duración mínima en segundos
+            max_duration (float): Duración máxima en segundos
+
+        Returns:
+            Tuple[List[UploadEntry], Optional[int]]: Entradas de la página y el cursor de la siguiente
+                (None si no hay más)
+        """
+        conditions, params = [], []
+        if cursor is not None:
+            conditions.append("u.id < ?")
+            params.append(cursor)
+        if audio_format:
+            conditions.append("u.format = ?")
+            params.append(audio_format.lower().lstrip("."))
+        if search:
+            conditions.append("u.filename LIKE ? ESCAPE '\\'")
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if min_duration is not None:
+            conditions.append("u.duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            conditions.append("u.duration <= ?")
+            params.append(max_duration)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT u.id, u.filename, u.sha256, u.size, u.duration, u.format, u.created_at, b.path "
+                f"FROM uploads u JOIN blobs b ON b.sha256 = u.sha256 {where} ORDER BY u.id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        entries = [UploadEntry(*row) for row in rows[:limit]]
+        next_cursor = entries[-1].upload_id if len(rows) > limit else None
+        return entries, next_cursor
+
+    def count(self) -> int:
+        """
+        Obtiene el número de subidas en el catálogo.
+        """
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+
+    def get_stats(self) -> dict:
+        """
+        Obtiene el número de subidas, archivos guardados y bytes ahorrados por deduplicación.
+        """
+        with self._lock:
+            uploads, upload_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM uploads").fetchone()
+            blobs, blob_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {
+            "uploads": uploads,
+            "stored_files": blobs,
+            "stored_bytes": blob_bytes,
+            "bytes_deduplicated": upload_bytes - blob_bytes,
+            "deduplicated_uploads": self.deduplicated
+        }
+
+    def close(self):
+        """
+        Cierra la base de datos.
+        """
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,268 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import logging
+from io import BytesIO
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Optional, Union
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Margen para los delimitadores y encabezados multipart sobre el tamaño del archivo
+MULTIPART_OVERHEAD = 16384
+MAX_FIELD_SIZE = 65536
+
+
+class UploadError(Exception):
+    """
+    La petición no es un formulario multipart válido con un archivo.
+    """
+
+
+class UploadTooLarge(UploadError):
+    """
+    El archivo supera el tamaño máximo permitido.
+    """
+
+
+class UnsupportedFormat(UploadError):
+    """
+    El nombre del archivo no tiene un formato aceptado.
+    """
+
+
+class StreamedUpload:
+    """
+    Archivo recibido de un formulario multipart. Los archivos pequeños quedan en memoria;
+    los que superan el límite de memoria se escriben a un archivo temporal mientras llegan.
+    El SHA-256 del contenido se calcula a medida que se recibe.
+    """
+
+    def __init__(self, filename: str, content_type: str, fields: Dict[str, str],
+                 data: Optional[bytes], path: Optional[Path], size: int, sha256: str = None):
+        self.filename = filename
+        self.content_type = content_type
+        self.fields = fields
+        self.data = data
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def source(self) -> Union[bytes, Path]:
+        """
+        Contenido en memoria o ruta del archivo temporal, lo que se pueda pasar al transcriptor.
+        """
+        return self.data if self.data is not None else self.path
+
+    def read(self) -> bytes:
+        """
+        Obtiene el contenido completo del archivo.
+        """
+        return self.data if self.data is not None else self.path.read_bytes()
+
+    def save(self, destination: Path):
+        """
+        Guarda el archivo en su destino. Si está en disco se mueve, sin copiarlo de nuevo.
+        """
+        if self.path is not None:
+            os.replace(self.path, destination)
+            self.path = destination
+        else:
+            destination.write_bytes(self.data)
+
+    def cleanup(self):
+        """
+        Elimina el archivo temporal, si lo hay.
+        """
+        if self.path is not None and self.path.name.startswith(".upload-"):
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _FilePart:
+    def __init__(self, filename: str, content_type: str, max_size: int, memory_limit: int, spool_dir: Path):
+        self.filename = filename
+        self.content_type = content_type
+        self.max_size = max_size
+        self.memory_limit = memory_limit
+        self.spool_dir = spool_dir
+        self.buffer = BytesIO()
+        self.file = None
+        self.path: Optional[Path] = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    @property
+    def spooled(self) -> bool:
+        return self.size > self.memory_limit
+
+    def write(self, data: bytes):
+        # Se llama desde el parser, en el event loop: solo acumula en memoria.
+        # Si el archivo superó el límite de memoria, `flush` pasa lo acumulado a disco
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(f"El archivo supera el máximo de {self.max_size} bytes")
+
+        self.buffer.write(data)
+        self.digest.update(data)
+
+    def _spill(self):
+        if self.file is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            fd, name = tempfile.mkstemp(prefix=".upload-", suffix=Path(self.filename).suffix, dir=self.spool_dir)
+            self.file = os.fdopen(fd, "wb")
+            self.path = Path(name)
+        self.file.write(self.buffer.getbuffer())
+        self.buffer = BytesIO()
+
+    async def flush(self):
+        """
+        Escribe en el archivo temporal, en un hilo, lo recibido desde la última vez.
+        """
+        if self.spooled and self.buffer.tell():
+            await asyncio.to_thread(self._spill)
+
+    async def finish(self) -> StreamedUpload:
+        if self.spooled:
+            await self.flush()
+            await asyncio.to_thread(self.file.close)
+            return StreamedUpload(self.filename, self.content_type, {}, None, self.path, self.size,
+                                  self.digest.hexdigest())
+        return StreamedUpload(self.filename, self.content_type, {}, self.buffer.getvalue(), None, self.size,
+                              self.digest.hexdigest())
+
+    def _discard(self):
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+    async def discard(self):
+        self.buffer = BytesIO()
+        if self.file is not None:
+            await asyncio.to_thread(self._discard)
+
+
+async def receive_upload(chunks: AsyncIterator[bytes], content_type: str, content_length: Optional[str],
+                         max_size: int, memory_limit: int, spool_dir: Union[str, Path],
+                         field_name: str = "file",
+                         accept_filename: Callable[[str], bool] = None) -> StreamedUpload:
+    """
+    Lee un formulario multipart a medida que llega, sin esperar a tener el cuerpo completo.
+    El tamaño se controla por cada fragmento recibido, así un archivo demasiado grande se
+    rechaza apenas supera el límite (o antes de leer nada, si lo indica Content-Length).
+
+    Args:
+        chunks (AsyncIterator[bytes]): Cuerpo de la petición, por ejemplo `request.stream()`
+        content_type (str): Encabezado Content-Type (debe ser multipart/form-data)
+        content_length (str): Encabezado Content-Length, si existe
+        max_size (int): Tamaño máximo del archivo en bytes
+        memory_limit (int): Archivos hasta este tamaño se mantienen en memoria
+        spool_dir (str | Path): Carpeta de los archivos temporales que superan el límite de memoria
+        field_name (str): Nombre del campo del formulario con el archivo
+        accept_filename (Callable[[str], bool]): Valida el nombre del archivo apenas llegan los
+            encabezados de su parte, antes de leer su contenido
+
+    Returns:
+        StreamedUpload: Archivo recibido y los demás campos de texto del formulario
+
+    Raises:
+        UploadTooLarge: Si el archivo supera `max_size`
+        UnsupportedFormat: Si `accept_filename` rechaza el nombre del archivo
+        UploadError: Si la petición no trae un archivo en un formulario multipart
+    """
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLarge(f"El archivo supera el máximo de {max_size} bytes")
+
+    mime_type, options = parse_options_header(content_type or "")
+    boundary = options.get(b"boundary")
+    if mime_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Se esperaba un formulario multipart/form-data")
+
+    fields: Dict[str, str] = {}
+    upload: Dict[str, _FilePart] = {}
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "part": None, "name": None, "field": None}
+
+    def on_part_begin():
+        state["headers"] = {}
+        state["part"] = state["name"] = state["field"] = None
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = state["header_value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        state["name"] = name
+
+        if filename is not None and name == field_name and field_name not in upload:
+            filename = Path(filename.decode("utf-8", "replace")).name
+            if filename and accept_filename and not accept_filename(filename):
+                raise UnsupportedFormat(f"Formato de archivo no soportado: {filename}")
+            part_type = state["headers"].get(b"content-type", b"application/octet-stream").decode("latin-1")
+            state["part"] = _FilePart(filename, part_type, max_size, memory_limit, Path(spool_dir))
+            upload[field_name] = state["part"]
+        elif filename is None:
+            state["field"] = bytearray()
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if state["part"] is not None:
+            state["part"].write(data[start:end])
+        elif state["field"] is not None:
+            state["field"] += data[start:end]
+            if len(state["field"]) > MAX_FIELD_SIZE:
+                raise UploadError(f"El campo '{state['name']}' es demasiado grande")
+
+    def on_part_end():
+        if state["field"] is not None:
+            fields[state["name"]] = state["field"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    async def discard_parts():
+        # Cierra y borra los archivos temporales de las partes ya recibidas
+        for part in upload.values():
+            await part.discard()
+
+    try:
+        async for chunk in chunks:
+            if chunk:
+                parser.write(chunk)
+                # El parser es síncrono: lo que recibió el archivo se escribe a disco después, en un hilo
+                if field_name in upload:
+                    await upload[field_name].flush()
+        parser.finalize()
+    except Exception as e:
+        await discard_parts()
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError(f"Formulario multipart inválido: {str(e)}") from e
+
+    if field_name not in upload or not upload[field_name].filename:
+        await discard_parts()
+        raise UploadError(f"El formulario no incluye el archivo '{field_name}'")
+
+    result = await upload[field_name].finish()
+    result.fields = fields
+    logger.info(f"Archivo recibido: {result.filename}, {result.size} bytes "
+                f"({'memoria' if result.data is not None else 'disco'})")
+    return result
@@ -1,11 +1,9 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-import sounddevice as sd
-from scipy.io.wavfile import write
 import time
-import threading
-import queue
+from app.config.settings import settings
+from app.services.transcription_service import get_transcription_service
+from app.services.audio_recorder import AudioRecorder
+from app.services.live_transcription import LiveTranscriber
 
 def mostrar_instrucciones():
     """Muestra las instrucciones de control para el usuario."""
@@ -21,90 +19,53 @@ def configurar_directorios():
     os.makedirs("transcripciones", exist_ok=True)
 
 
-def grabar_audio_indefinido(nombre_archivo, fs=44100):
+def grabar_audio_indefinido(nombre_archivo, fs=44100, stream_factory=None, on_audio=None):
     """
     Graba audio indefinidamente hasta que el usuario lo detenga.
+    El audio se captura por callbacks en un buffer circular y se escribe al WAV mientras se graba,
+    sin cortes entre bloques y con memoria acotada aunque la grabación dure horas.
     :param nombre_archivo: Ruta donde guardar el archivo de audio
     :param fs: Frecuencia de muestreo (Hz)
+    :param stream_factory: Crea el stream de entrada (por defecto sounddevice.InputStream)
+    :param on_audio: Se llama con cada bloque de audio guardado (por ejemplo, para transcribir en vivo)
     :return: True si la grabación fue exitosa, False en caso contrario
     """
     try:
         print(f"🔴 INICIANDO grabación...")
         mostrar_instrucciones()
-        
-        # Cola para comunicación entre hilos
-        comando_queue = queue.Queue()
-        grabacion_activa = threading.Event()
-        detener_grabacion = threading.Event()
-        
-        grabacion_activa.set()  # Iniciar grabando
-        
-        # Hilo para capturar comandos del usuario
-        def capturar_comandos():
-            while not detener_grabacion.is_set():
+
+        with AudioRecorder(nombre_archivo, samplerate=fs, stream_factory=stream_factory,
+                           on_audio=on_audio) as grabadora:
+            # La captura ocurre en el callback del stream; aquí solo se esperan comandos
+            while True:
                 try:
                     comando = input().strip().lower()
-                    comando_queue.put(comando)
-                except:
-                    break
-        
-        # Iniciar hilo de comandos
-        hilo_comandos = threading.Thread(target=capturar_comandos, daemon=True)
-        hilo_comandos.start()
-        
-        # Lista para almacenar chunks de audio
-        chunks_audio = []
-        chunk_duration = 1.0  # Grabar en chunks de 1 segundo
-        chunk_frames = int(fs * chunk_duration)
-        
-        pausado = False
-        
-        while not detener_grabacion.is_set():
-            # Verificar comandos del usuario
-            try:
-                comando = comando_queue.get_nowait()
+                except EOFError:
+                    comando = 'q'
+
                 if comando == 'p':
-                    pausado = not pausado
-                    if pausado:
-                        print("⏸️  PAUSADO - Presiona 'p' + Enter para reanudar")
-                        grabacion_activa.clear()
-                    else:
+                    if grabadora.paused:
                         print("▶️  REANUDANDO grabación...")
-                        grabacion_activa.set()
+                        grabadora.resume()
+                    else:
+                        print("⏸️  PAUSADO - Presiona 'p' + Enter para reanudar")
+                        grabadora.pause()
                 elif comando == 'q':
                     print("🛑 DETENIENDO grabación...")
-                    detener_grabacion.set()
                     break
-            except queue.Empty:
-                pass
-            
-            # Si no está pausado, grabar chunk
-            if not pausado and not detener_grabacion.is_set():
-                try:
-                    # Grabar chunk de audio
-                    chunk = sd.rec(chunk_frames, samplerate=fs, channels=1, dtype='int16')
-                    sd.wait()  # Esperar a que termine el chunk
-                    chunks_audio.append(chunk)
-                except:
-                    break
-            else:
-                time.sleep(0.1)  # Pequeña pausa si está pausado
-        
-        # Guardar todo el audio grabado
-        if chunks_audio:
-            import numpy as np
-            audio_completo = np.concatenate(chunks_audio, axis=0)
-            write(nombre_archivo, fs, audio_completo)
-            print(f"✅ Audio guardado en '{nombre_archivo}'")
+
+        if grabadora.frames_written:
+            print(f"✅ Audio guardado en '{nombre_archivo}' ({grabadora.seconds:.1f}s)")
             return True
         else:
+            os.remove(nombre_archivo)
             print("❌ No se grabó audio")
             return False
-            
+
     except Exception as e:
         print(f"❌ Error al grabar audio: {e}")
         return False
-    
+
 def transcribir_audio(archivo_audio, archivo_transcripcion):
     """
     Transcribe un archivo de audio usando la API de Whisper.
@@ -112,21 +73,15 @@ def transcribir_audio(archivo_audio, archivo_transcripcion):
     :param archivo_transcripcion: Ruta donde guardar la transcripción
     :return: True si la transcripción fue exitosa, False en caso contrario
     """
-    load_dotenv()
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
     try:
-        with open(archivo_audio, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="text"
-            )
-            with open(archivo_transcripcion, "w", encoding='utf-8') as trans_file:
-                trans_file.write(transcription)
-            print(f"✅ Transcripción guardada en '{archivo_transcripcion}'")
-            return True
+        transcription = get_transcription_service().transcribe_sync(archivo_audio, response_format="text")
+        if transcription.bytes_saved:
+            print(f"✂️  Audio optimizado: {transcription.bytes_saved / 1024:.0f} KB y "
+                  f"{transcription.seconds_saved:.1f} s de silencio menos")
+        with open(archivo_transcripcion, "w", encoding='utf-8') as trans_file:
+            trans_file.write(transcription.text)
+        print(f"✅ Transcripción guardada en '{archivo_transcripcion}'")
+        return True
     except Exception as e:
         print(f"❌ Error en la transcripción: {e}")
         return False
@@ -141,11 +96,34 @@ def generar_nombres_archivos(contador):
     nombre_transcripcion = f"transcripciones/transcripcion_{contador}.txt"
     return nombre_audio, nombre_transcripcion
 
-def grabar_y_transcribir_audio(fs=44100):
+def grabar_y_transcribir_en_vivo(nombre_audio, nombre_transcripcion, fs=44100):
+    """
+    Graba y transcribe a la vez: el audio se corta en ventanas en los silencios, cada ventana
+    se transcribe en segundo plano y el texto se agrega al archivo a medida que llega.
+    :param nombre_audio: Ruta donde guardar el archivo de audio
+    :param nombre_transcripcion: Ruta donde guardar la transcripción
+    :param fs: Frecuencia de muestreo (Hz)
+    :return: True si la grabación fue exitosa, False en caso contrario
+    """
+    transcriptor = LiveTranscriber(nombre_transcripcion, fs)
+    grabado = grabar_audio_indefinido(nombre_audio, fs, on_audio=transcriptor.feed)
+
+    inicio = time.perf_counter()
+    texto = transcriptor.finish()
+    if grabado:
+        print(f"✅ Transcripción guardada en '{nombre_transcripcion}' "
+              f"({transcriptor.windows} ventanas, lista {time.perf_counter() - inicio:.1f}s después de detener)")
+    elif not texto:
+        os.remove(nombre_transcripcion)
+    return grabado
+
+def grabar_y_transcribir_audio(fs=44100, en_vivo=None):
     """
     Función principal que maneja la grabación indefinida y transcripción.
     :param fs: Frecuencia de muestreo (Hz)
+    :param en_vivo: Transcribir mientras se graba. Por defecto `settings.live_transcription_enabled`
     """
+    en_vivo = settings.live_transcription_enabled if en_vivo is None else en_vivo
     contador = 1
     configurar_directorios()
     
@@ -155,10 +133,15 @@ def grabar_y_transcribir_audio(fs=44100):
             print(f"\n🎙️  === SESIÓN DE GRABACIÓN {contador} ===")
             
             # Grabar audio indefinidamente
-            if grabar_audio_indefinido(nombre_audio, fs):
-                print(f"\n📝 Iniciando transcripción...")
-                transcribir_audio(nombre_audio, nombre_transcripcion)
-                
+            if en_vivo:
+                grabado = grabar_y_transcribir_en_vivo(nombre_audio, nombre_transcripcion, fs)
+            else:
+                grabado = grabar_audio_indefinido(nombre_audio, fs)
+                if grabado:
+                    print(f"\n📝 Iniciando transcripción...")
+                    transcribir_audio(nombre_audio, nombre_transcripcion)
+
+            if grabado:
                 # Preguntar si quiere hacer otra grabación
                 print(f"\n¿Deseas hacer otra grabación? (s/n): ", end="")
                 respuesta = input().strip().lower()
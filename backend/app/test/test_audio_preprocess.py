@@ -0,0 +1,44 @@
+import numpy as np
+from app.services.audio_preprocess import (
+    TARGET_SAMPLE_RATE, preprocess_audio, read_wav, resample, trim_silence, voiced_frames, write_wav
+)
+
+
+def test_empty_wav_is_returned_unchanged():
+    samples = np.zeros(0, dtype=np.float32)
+
+    assert len(voiced_frames(samples, TARGET_SAMPLE_RATE)) == 0
+    assert len(trim_silence(samples, TARGET_SAMPLE_RATE)) == 0
+
+    result = preprocess_audio(write_wav(samples, TARGET_SAMPLE_RATE), "vacio.wav")
+    assert result.seconds == 0.0
+    assert len(read_wav(result.audio)[0]) == 0
+
+
+def test_wav_shorter_than_one_frame_is_returned_unchanged():
+    # 10 ms: menos que un frame de análisis de 30 ms
+    samples = (0.5 * np.sin(np.arange(160) / 5)).astype(np.float32)
+
+    trimmed = trim_silence(samples, TARGET_SAMPLE_RATE)
+    assert np.array_equal(trimmed, samples)
+
+    result = preprocess_audio(write_wav(samples, TARGET_SAMPLE_RATE), "corto.wav")
+    assert len(read_wav(result.audio)[0]) == len(samples)
+
+
+def test_long_audio_is_resampled_in_bounded_blocks(monkeypatch):
+    sample_rate = 44100
+    seconds = 25
+    samples = (0.4 * np.sin(2 * np.pi * 440 * np.arange(seconds * sample_rate) / sample_rate)).astype(np.float32)
+
+    sizes = []
+    rfft = np.fft.rfft
+    monkeypatch.setattr(np.fft, "rfft", lambda a, *args, **kwargs: sizes.append(len(a)) or rfft(a, *args, **kwargs))
+    resampled = resample(samples, sample_rate)
+
+    assert len(sizes) > 1 and max(sizes) <= 12 * sample_rate
+    expected = 0.4 * np.sin(2 * np.pi * 440 * np.arange(seconds * TARGET_SAMPLE_RATE) / TARGET_SAMPLE_RATE)
+    assert len(resampled) == len(expected)
+    # Lejos de los extremos del audio, las uniones entre bloques no se notan
+    middle = slice(TARGET_SAMPLE_RATE, -TARGET_SAMPLE_RATE)
+    assert np.max(np.abs(resampled[middle] - expected[middle])) < 1e-3
@@ -0,0 +1,35 @@
+import asyncio
+import os
+import stat
+import tempfile
+import numpy as np
+from app.services import audio_probe
+from app.services.audio_preprocess import write_wav
+
+
+def fake_ffprobe(directory, duration: str):
+    # ffprobe falso: responde una duración fija si el archivo existe
+    script = directory / "ffprobe"
+    script.write_text(f'#!/bin/sh\nfor last; do :; done\n[ -f "$last" ] && echo {duration}\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+
+def test_probe_data_reads_wav_headers_in_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    audio = write_wav(np.zeros(16000, dtype=np.float32), 16000)
+
+    info = asyncio.run(audio_probe.probe_data(audio, "voz.wav"))
+    assert info.format == "wav"
+    assert info.duration == 1.0
+
+
+def test_probe_data_falls_back_to_ffprobe_for_other_formats(tmp_path, monkeypatch):
+    fake_ffprobe(tmp_path, "12.5")
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(audio_probe, "_ffprobe_semaphore", None)
+    before = set(os.listdir(tempfile.gettempdir()))
+
+    info = asyncio.run(audio_probe.probe_data(b"\x1aE\xdf\xa3webm", "grabacion.webm"))
+    assert info.format == "webm"
+    assert info.duration == 12.5
+    assert set(os.listdir(tempfile.gettempdir())) == before
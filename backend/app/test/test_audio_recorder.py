@@ -0,0 +1,115 @@
+import threading
+import numpy as np
+import pytest
+from app.services.audio_preprocess import read_wav
+from app.services.audio_recorder import AudioRecorder
+
+
+class FakeStream:
+    """
+    Stream de entrada falso: el test llama al callback con bloques sintéticos.
+    """
+
+    def __init__(self, samplerate, channels, dtype, blocksize, callback, fail_on_start=False):
+        self.callback = callback
+        self.fail_on_start = fail_on_start
+        self.started = self.closed = False
+
+    def start(self):
+        if self.fail_on_start:
+            raise RuntimeError("Dispositivo no disponible")
+        self.started = True
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.closed = True
+
+    def feed(self, block: np.ndarray, status=None):
+        self.callback(block, len(block), None, status)
+
+
+def recorder_with_stream(path, **kwargs):
+    streams = []
+
+    def factory(**options):
+        streams.append(FakeStream(**options))
+        return streams[0]
+
+    recorder = AudioRecorder(path, samplerate=8000, stream_factory=factory, **kwargs)
+    recorder.start()
+    return recorder, streams[0]
+
+
+def block(start: int, frames: int) -> np.ndarray:
+    return (np.arange(start, start + frames) % 30000).astype(np.int16).reshape(-1, 1)
+
+
+def test_blocks_are_written_in_order(tmp_path):
+    received = []
+    recorder, stream = recorder_with_stream(tmp_path / "grabacion.wav", on_audio=received.append)
+    for i in range(10):
+        stream.feed(block(i * 800, 800))
+    frames = recorder.stop()
+
+    samples, rate = read_wav((tmp_path / "grabacion.wav").read_bytes())
+    assert (frames, rate) == (8000, 8000)
+    assert np.array_equal(np.round(samples[:, 0] * 32768).astype(np.int16), block(0, 8000)[:, 0])
+    assert sum(len(b) for b in received) == 8000
+    assert stream.closed and recorder.dropped_frames == 0
+
+
+def test_paused_blocks_are_skipped(tmp_path):
+    recorder, stream = recorder_with_stream(tmp_path / "grabacion.wav")
+    stream.feed(block(0, 800))
+    recorder.pause()
+    stream.feed(block(800, 800))
+    recorder.resume()
+    stream.feed(block(1600, 800))
+    recorder.stop()
+
+    samples, _ = read_wav((tmp_path / "grabacion.wav").read_bytes())
+    expected = np.concatenate([block(0, 800), block(1600, 800)])[:, 0]
+    assert np.array_equal(np.round(samples[:, 0] * 32768).astype(np.int16), expected)
+
+
+def test_full_buffer_drops_frames_and_counts_overflows(tmp_path):
+    # El escritor queda bloqueado en on_audio mientras el callback sigue llenando el buffer
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_consumer(_):
+        writing.set()
+        release.wait(timeout=5)
+
+    recorder, stream = recorder_with_stream(tmp_path / "grabacion.wav", buffer_seconds=0.1,
+                                            on_audio=slow_consumer)
+    stream.feed(block(0, 400))
+    assert writing.wait(timeout=5)
+    stream.feed(block(400, 1000), status="input overflow")
+    release.set()
+    frames = recorder.stop()
+
+    assert recorder.dropped_frames == 200
+    assert recorder.input_overflows == 1
+    assert frames == 1200
+    samples, _ = read_wav((tmp_path / "grabacion.wav").read_bytes())
+    assert len(samples) == 1200
+
+
+def test_failed_stream_start_releases_writer_and_file(tmp_path):
+    path = tmp_path / "grabacion.wav"
+    streams = []
+
+    def factory(**options):
+        streams.append(FakeStream(**options, fail_on_start=True))
+        return streams[0]
+
+    recorder = AudioRecorder(path, samplerate=8000, stream_factory=factory)
+    with pytest.raises(RuntimeError):
+        recorder.start()
+
+    assert streams[0].closed
+    assert recorder._writer is None and recorder._wav is None
+    assert not path.exists()
+    assert not any(thread.name == "audio-writer" for thread in threading.enumerate())
@@ -0,0 +1,30 @@
+import asyncio
+from app.services.audio_store import AudioArtifactStore
+
+
+def test_async_lookups_read_the_disk_in_a_thread(tmp_path, monkeypatch):
+    threaded = []
+    to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(function, *args):
+        threaded.append(function.__name__)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", tracking_to_thread)
+
+    store = AudioArtifactStore(str(tmp_path), memory_max_bytes=1024)
+    # Otro worker, iniciado antes de que se guarde el audio
+    other = AudioArtifactStore(str(tmp_path), memory_max_bytes=1024)
+    artifact = store.save(b"audio")
+
+    # En el índice y en memoria: no pasa por un hilo
+    assert asyncio.run(store.get_async(artifact.artifact_id)) == artifact
+    assert asyncio.run(store.read_async(artifact.artifact_id)) == b"audio"
+    assert threaded == []
+
+    # En el otro worker solo está en disco
+    assert asyncio.run(other.get_async(artifact.artifact_id)).path == artifact.path
+    assert asyncio.run(other.read_async(artifact.artifact_id)) == b"audio"
+    assert asyncio.run(other.read_async("0" * 32)) is None
+    assert threaded == ["get", "read", "read"]
+    assert other.disk_reads == 1
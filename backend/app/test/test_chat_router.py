@@ -0,0 +1,61 @@
+import importlib
+import google.auth
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def chat():
+    # El router crea los clientes de Google TTS y OpenAI al importarse; no se llama a ninguno
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(google.auth, "default", lambda *args, **kwargs: (AnonymousCredentials(), "test"))
+        patch.setenv("OPENAI_API_KEY", "test")
+        yield importlib.import_module("app.routers.chat")
+
+
+@pytest.fixture
+def client(chat):
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_unsupported_audio_format_is_a_client_error(client):
+    response = client.post("/chat/send", json={"message": "hola", "audio_format": "flac"})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("path", ["/chat/send", "/chat/send-stream"])
+def test_audio_format_errors_return_400(client, chat, monkeypatch, path):
+    def unsupported(requested=None, accept=None):
+        raise ValueError(f"Formato de audio no soportado: {accept}")
+
+    monkeypatch.setattr(chat, "negotiate_audio_format", unsupported)
+    response = client.post(path, json={"message": "hola"}, headers={"accept": "audio/flac"})
+    assert response.status_code == 400
+    assert "no soportado" in response.json()["detail"]
+
+
+def test_voice_session_rejects_out_of_range_sample_rate(client):
+    with client.websocket_connect("/chat/voice?sample_rate=100") as websocket:
+        message = websocket.receive_json()
+        assert message["event"] == "error"
+        assert "100" in message["data"]["error"]
+        assert websocket.receive()["code"] == 1008
+
+
+def test_voice_session_rejects_unsupported_audio_format(client, chat, monkeypatch):
+    async def transcribe(*args, **kwargs):
+        raise AssertionError("no se debe transcribir")
+
+    monkeypatch.setattr(chat.transcriber, "transcribe", transcribe)
+    with client.websocket_connect("/chat/voice") as websocket:
+        assert websocket.receive_json()["event"] == "session"
+        websocket.send_bytes(b"audio")
+        websocket.send_json({"type": "end", "format": "../../audio"})
+
+        message = websocket.receive_json()
+        assert message["event"] == "error"
+        assert message["data"]["error"] == "Formato de archivo no soportado"
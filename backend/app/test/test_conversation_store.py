@@ -0,0 +1,157 @@
+import asyncio
+import pytest
+from app.models.schemas import ChatMessage, HistorySummary
+from app.services.conversation_store import InMemoryConversationStore, RedisConversationStore
+
+
+class WrongTypeError(Exception):
+    pass
+
+
+class FakeRedis:
+    """
+    Redis mínimo en memoria: guarda el tipo de cada clave y falla con WRONGTYPE como Redis.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def _typed(self, key, kind, default):
+        if key in self.data and not isinstance(self.data[key], kind):
+            raise WrongTypeError(f"WRONGTYPE {key}")
+        return self.data.setdefault(key, default)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def lrange(self, key, start, end):
+        if key not in self.data:
+            return []
+        return list(self._typed(key, list, []))
+
+    async def rpush(self, key, *values):
+        self._typed(key, list, []).extend(values)
+
+    async def expire(self, key, ttl):
+        return key in self.data
+
+    async def zadd(self, key, mapping):
+        self._typed(key, dict, {}).update(mapping)
+
+    async def zrem(self, key, member):
+        return self._typed(key, dict, {}).pop(member, None) is not None
+
+    async def zrange(self, key, start, end):
+        return sorted(self._typed(key, dict, {}), key=self.data[key].get)
+
+    async def zremrangebyscore(self, key, low, high):
+        scores = self._typed(key, dict, {})
+        for member in [m for m, score in scores.items() if score <= high]:
+            del scores[member]
+
+    async def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    async def get(self, key):
+        if key not in self.data:
+            return None
+        return self._typed(key, str, "")
+
+    async def set(self, key, value, ex=None):
+        self._typed(key, str, "")
+        self.data[key] = value
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(getattr(self.client, name)(*args, **kwargs))
+
+    async def execute(self):
+        return [await call for call in self.calls]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def store():
+    return RedisConversationStore(client=FakeRedis(), ttl=60)
+
+
+def test_conversation_named_like_the_index(store):
+    run(store.append("other", ChatMessage(role="user", content="hola")))
+    run(store.append("idx", ChatMessage(role="user", content="índice")))
+    run(store.append("index", ChatMessage(role="user", content="índice")))
+
+    assert [m.content for m in run(store.get("idx"))] == ["índice"]
+    assert [m.content for m in run(store.get("index"))] == ["índice"]
+    assert sorted(cid for cid, _ in run(store.items())) == ["idx", "index", "other"]
+
+
+def test_conversation_named_like_a_summary_key(store):
+    summary = HistorySummary(text="resumen de foo", covered_messages=4)
+    run(store.append("foo", ChatMessage(role="user", content="hola")))
+    run(store.set_summary("foo", summary))
+
+    run(store.append("foo:summary", ChatMessage(role="user", content="intruso")))
+    run(store.set_summary("foo:summary", HistorySummary(text="otro", covered_messages=1)))
+
+    assert run(store.get_summary("foo")) == summary
+    assert [m.content for m in run(store.get("foo"))] == ["hola"]
+    assert [m.content for m in run(store.get("foo:summary"))] == ["intruso"]
+
+
+def test_sweep_stops_at_the_first_live_conversation(monkeypatch):
+    store = InMemoryConversationStore(ttl=60, max_conversations=10000, max_bytes=1 << 30)
+    for i in range(1000):
+        run(store.append(f"c{i}", ChatMessage(role="user", content="hola")))
+    # Las tres más antiguas quedaron sin actividad hace más del TTL
+    for i in range(3):
+        store._conversations[f"c{i}"].last_access -= 120
+
+    checked = []
+    is_expired = store._is_expired
+    monkeypatch.setattr(store, "_is_expired", lambda entry, now: checked.append(entry) or is_expired(entry, now))
+
+    assert store.sweep() == 3
+    assert len(checked) == 4
+    assert run(store.get("c0")) is None and run(store.get("c3")) is not None
+    assert store.expirations == 3
+
+
+def test_zero_disables_the_ttl_and_the_limits():
+    store = InMemoryConversationStore(ttl=0, max_conversations=0, max_bytes=0)
+    assert (store.ttl, store.max_conversations, store.max_bytes) == (0, 0, 0)
+
+    for i in range(50):
+        run(store.append(f"c{i}", ChatMessage(role="user", content="hola" * 100)))
+    store._conversations["c0"].last_access -= 10 ** 6
+
+    assert store.sweep() == 0
+    assert run(store.get("c0")) is not None
+    assert len(run(store.items())) == 50 and store.evictions == 0
+
+
+def test_redis_store_without_ttl_keeps_the_keys():
+    client = FakeRedis()
+    expired = []
+    client.expire = lambda key, ttl: expired.append(key)
+    store = RedisConversationStore(client=client, ttl=0)
+
+    run(store.append("foo", ChatMessage(role="user", content="hola")))
+    assert expired == []
+    assert [cid for cid, _ in run(store.items())] == ["foo"]
@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from app.models.schemas import ChatMessage, HistorySummary
+from app.services.conversation_store import InMemoryConversationStore
+from app.services.history_compactor import HistoryCompactor
+from app.services.llm_service import to_contents
+
+
+class FakeLLM:
+    async def generate(self, prompt, record_usage=True):
+        return "resumen"
+
+
+def conversation(turns: int):
+    messages = []
+    for turn in range(turns):
+        messages.append(ChatMessage(role="user", content=f"respuesta del estudiante {turn} " * 10))
+        messages.append(ChatMessage(role="assistant", content=f"pregunta de la tortuga {turn} " * 10))
+    return messages
+
+
+def compact(history, keep_messages, summary=None):
+    store = InMemoryConversationStore(ttl=0, max_conversations=0, max_bytes=0, sweep_interval=0)
+
+    async def run():
+        await store.append("c", *history)
+        if summary:
+            await store.set_summary("c", summary)
+        return await HistoryCompactor(store, FakeLLM(), token_budget=100, keep_messages=keep_messages) \
+            .compact("c", history, "hola")
+
+    return asyncio.run(run())
+
+
+def assert_alternating(summary, recent):
+    roles = [content["role"] for content in to_contents(recent, summary)]
+    assert all(first != second for first, second in zip(roles, roles[1:]))
+
+
+@pytest.mark.parametrize("keep_messages", [3, 4, 5])
+def test_fold_keeps_whole_user_model_pairs(keep_messages):
+    summary, recent = compact(conversation(4), keep_messages)
+
+    assert summary.covered_messages % 2 == 0
+    assert recent[0].role == "user" and len(recent) >= keep_messages
+    assert_alternating(summary, recent)
+
+
+def test_fold_completes_a_summary_that_covered_an_odd_number_of_messages():
+    summary, recent = compact(conversation(4), 2, HistorySummary(text="previo", covered_messages=3))
+
+    assert summary.covered_messages % 2 == 0
+    assert_alternating(summary, recent)
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import pytest
+from app.config.settings import settings
+from app.models.schemas import ChatMessage
+from app.services import llm_service
+from app.services.llm_service import LLMService
+
+
+class FakeResponse:
+    text = "respuesta"
+    usage_metadata = None
+
+
+class FakeChat:
+    def __init__(self, history):
+        self.history = list(history)
+
+    async def send_message_async(self, message, request_options=None):
+        await asyncio.sleep(0.01)
+        self.history += [{"role": "user", "parts": [message]}, {"role": "model", "parts": [FakeResponse.text]}]
+        return FakeResponse()
+
+
+class FakeModel:
+    def start_chat(self, history):
+        return FakeChat(history)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "gemini_context_cache", False)
+    llm = LLMService(api_key="test", session_mode="session")
+    monkeypatch.setattr(llm_service.genai, "GenerativeModel", lambda *args, **kwargs: FakeModel())
+    return llm
+
+
+def test_concurrent_turns_check_the_session_under_its_lock(service):
+    history = [ChatMessage(role="user", content="hola"), ChatMessage(role="assistant", content="bienvenido")]
+
+    async def two_turns():
+        # Ambos turnos leyeron el mismo historial antes de que terminara el otro
+        return await asyncio.gather(
+            service.reply("c1", history, "primero"),
+            service.reply("c1", history, "segundo")
+        )
+
+    asyncio.run(two_turns())
+
+    # El segundo turno ve la sesión ya modificada por el primero y la vuelve a crear
+    # desde su historial, en lugar de agregar su mensaje a un historial distinto
+    assert service.session_rebuilds == 1
+    assert [content["parts"][0] for content in service._sessions["c1"].chat.history] == [
+        "hola", "bienvenido", "segundo", "respuesta"
+    ]
+
+
+def test_context_cache_is_created_in_a_thread(service, monkeypatch):
+    monkeypatch.setattr(settings, "gemini_context_cache", True)
+    loop_thread = threading.get_ident()
+    calls = []
+
+    class FakeCachedContent:
+        name = "cachedContents/test"
+
+        @classmethod
+        def create(cls, **kwargs):
+            calls.append(threading.get_ident())
+            return cls()
+
+    monkeypatch.setattr(llm_service.caching, "CachedContent", FakeCachedContent)
+    monkeypatch.setattr(llm_service.genai.GenerativeModel, "from_cached_content",
+                        lambda cached: FakeModel(), raising=False)
+
+    async def two_first_turns():
+        return await asyncio.gather(service.reply("c1", [], "hola"), service.reply("c2", [], "hola"))
+
+    asyncio.run(two_first_turns())
+
+    assert len(calls) == 1 and calls[0] != loop_thread
+    assert service.get_stats()["context_cache"]
@@ -0,0 +1,60 @@
+import pytest
+from app.services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(capacity=8, threshold=0.72, max_chars=60)
+
+
+def test_negated_message_misses_the_cache(cache):
+    cache.put("Me gusta la biología", "¡Genial! La biología...", b"audio")
+
+    assert cache.get("No me gusta la biología") is None
+    assert cache.get("me gusta la biologia!!") is not None
+    assert (cache.exact_hits, cache.semantic_hits, cache.misses) == (1, 0, 1)
+
+
+def test_near_miss_greeting_misses_the_cache(cache):
+    cache.put("Buenas tardes", "¡Buenas tardes! Soy...", b"audio")
+
+    assert cache.get("Buenas noches") is None
+
+
+def test_same_words_in_another_order_hit_the_cache(cache):
+    cache.put("hola buenas", "¡Hola!", b"audio")
+
+    assert cache.get("buenas hola").text == "¡Hola!"
+    assert cache.semantic_hits == 1
+
+
+def test_near_duplicate_greeting_hits_and_unrelated_message_misses(cache):
+    cache.put("hola", "¡Hola! Soy la Tortuga Seleccionadora...", b"audio")
+    cache.put("buenas", "¡Buenas! Soy la Tortuga Seleccionadora...", b"audio")
+
+    assert cache.get("holaa").text.startswith("¡Hola!")
+    assert cache.get("Buenas tardes").text.startswith("¡Buenas!")
+    assert cache.get("chao") is None
+    assert (cache.semantic_hits, cache.misses) == (2, 1)
+
+
+@pytest.mark.parametrize("cached, message", [
+    ("Me gusta la química", "Me gusta la física"),
+    ("Me gusta la química", "Me gusta la música"),
+    ("Me gusta el arte", "Me gusta el deporte"),
+    ("Hola, soy María", "Hola, soy Mario"),
+    ("Me gusta la biología", "Me gusta la biología marina"),
+])
+def test_similar_message_that_is_not_a_greeting_misses_the_cache(cache, cached, message):
+    cache.put(cached, "¡Genial!...", b"audio")
+
+    assert cache.get(message) is None
+    assert cache.get(cached) is not None
+    assert (cache.exact_hits, cache.semantic_hits, cache.misses) == (1, 0, 1)
+
+
+def test_message_similar_to_a_greeting_misses_the_cache(cache):
+    cache.put("hola", "¡Hola!", b"audio")
+
+    assert cache.get("hola soy mario") is None
+    assert cache.get("hola como") is None
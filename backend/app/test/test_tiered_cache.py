@@ -0,0 +1,40 @@
+import asyncio
+from app.services.tiered_cache import TieredCache
+
+
+def test_async_put_and_get_go_through_both_tiers(tmp_path, monkeypatch):
+    threaded = []
+    to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(function, *args):
+        threaded.append(function.__name__)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", tracking_to_thread)
+
+    cache = TieredCache(str(tmp_path), memory_max_bytes=1024, disk_max_bytes=4096)
+    asyncio.run(cache.put_async("ab01", b"audio"))
+    assert threaded == ["_put_disk"]
+    assert (tmp_path / "ab" / "ab01").read_bytes() == b"audio"
+
+    # Acierto en memoria: no pasa por un hilo
+    assert asyncio.run(cache.get_async("ab01")) == b"audio"
+    assert threaded == ["_put_disk"]
+
+    # Otra instancia (otro worker) solo la tiene en disco
+    other = TieredCache(str(tmp_path), memory_max_bytes=1024, disk_max_bytes=4096)
+    assert asyncio.run(other.get_async("ab01")) == b"audio"
+    assert asyncio.run(other.get_async("cd02")) is None
+    assert threaded == ["_put_disk", "_get_disk", "_get_disk"]
+    assert (other.memory_hits, other.disk_hits, other.misses) == (0, 1, 1)
+
+
+def test_disk_eviction_removes_the_oldest_files(tmp_path):
+    cache = TieredCache(str(tmp_path), memory_max_bytes=0, disk_max_bytes=10)
+    for key in ("aa01", "aa02", "aa03"):
+        asyncio.run(cache.put_async(key, b"12345"))
+
+    assert not (tmp_path / "aa" / "aa01").exists()
+    assert cache.get("aa03") == b"12345"
+    assert cache.get("aa01") is None
+    assert cache.evictions == 1
@@ -0,0 +1,98 @@
+import asyncio
+import numpy as np
+import pytest
+from app.config.settings import settings
+from app.services.audio_preprocess import TARGET_SAMPLE_RATE, read_wav, write_wav
+from app.services.transcription_service import (
+    TranscriptionBackend, TranscriptionResult, TranscriptionService, TranscriptSegment
+)
+
+
+class VoiceSegmentsBackend(TranscriptionBackend):
+    """
+    Motor falso: devuelve un segmento por cada tramo con señal del audio que recibe.
+    """
+
+    name = "fake"
+    model = "fake"
+
+    def transcribe_sync(self, audio, filename, language, response_format):
+        samples, sample_rate = read_wav(audio)
+        loud = np.abs(samples[:, 0]) > 0.05
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], loud.astype(int), [0]))))
+        segments = tuple(
+            TranscriptSegment(start / sample_rate, end / sample_rate, "voz")
+            for start, end in zip(edges[::2], edges[1::2])
+        )
+        return TranscriptionResult(" ".join(s.text for s in segments), "es", len(samples) / sample_rate, segments=segments)
+
+    async def transcribe(self, audio, filename, language, response_format):
+        return self.transcribe_sync(audio, filename, language, response_format)
+
+    def get_stats(self):
+        return {}
+
+
+def speech_with_pauses() -> bytes:
+    # 1 s de silencio, 1 s de voz, 4 s de silencio, 1 s de voz y 1 s de silencio
+    rate = TARGET_SAMPLE_RATE
+    tone = 0.5 * np.where(np.arange(rate) % 2, 1.0, -1.0)
+    silence = np.zeros(rate)
+    return write_wav(np.concatenate([silence, tone, np.zeros(4 * rate), tone, silence]).astype(np.float32), rate)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "transcription_cache_enabled", False)
+    monkeypatch.setattr(settings, "audio_preprocess_enabled", True)
+    monkeypatch.setattr(settings, "audio_vad_enabled", True)
+    return TranscriptionService(backend=VoiceSegmentsBackend())
+
+
+def assert_original_times(result: TranscriptionResult):
+    assert result.seconds_saved > 4
+    assert result.duration == pytest.approx(8.0)
+    assert [segment.start for segment in result.segments] == pytest.approx([1.0, 6.0], abs=0.01)
+    assert [segment.end for segment in result.segments] == pytest.approx([2.0, 7.0], abs=0.01)
+
+
+def test_timestamps_refer_to_the_untrimmed_audio(service, monkeypatch):
+    monkeypatch.setattr(settings, "transcription_chunk_seconds", 0)
+
+    assert_original_times(service.transcribe_sync(speech_with_pauses(), "pausas.wav"))
+    assert_original_times(asyncio.run(service.transcribe(speech_with_pauses(), "pausas.wav")))
+
+
+def test_chunk_offsets_refer_to_the_untrimmed_audio(service, monkeypatch):
+    monkeypatch.setattr(settings, "transcription_chunk_seconds", 1.5)
+
+    result = service.transcribe_sync(speech_with_pauses(), "pausas.wav")
+    assert service.chunks >= 2
+    assert_original_times(result)
+
+
+def test_async_cache_reads_the_disk_tier_in_a_thread(tmp_path, monkeypatch):
+    from app.services.tiered_cache import TieredCache
+
+    monkeypatch.setattr(settings, "transcription_chunk_seconds", 0)
+    threaded = []
+    to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(function, *args):
+        threaded.append(function.__name__)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", tracking_to_thread)
+    audio = speech_with_pauses()
+
+    cache = TieredCache(str(tmp_path), memory_max_bytes=1024 * 1024, disk_max_bytes=1024 * 1024)
+    first = asyncio.run(TranscriptionService(backend=VoiceSegmentsBackend(), cache=cache).transcribe(audio, "a.wav"))
+    # El hash del audio en memoria también se calcula fuera del event loop
+    assert threaded[0] == "audio_sha256" and "_put_disk" in threaded
+
+    # Otro worker: la transcripción solo está en disco
+    threaded.clear()
+    cache = TieredCache(str(tmp_path), memory_max_bytes=1024 * 1024, disk_max_bytes=1024 * 1024)
+    cached = asyncio.run(TranscriptionService(backend=VoiceSegmentsBackend(), cache=cache).transcribe(audio, "a.wav"))
+    assert threaded == ["audio_sha256", "_get_disk"]
+    assert cached.cached and cached.segments == first.segments
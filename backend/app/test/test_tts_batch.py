@@ -0,0 +1,38 @@
+import asyncio
+import google.auth
+import pytest
+from types import SimpleNamespace
+from google.auth.credentials import AnonymousCredentials
+from app.services.tiered_cache import TieredCache
+from app.services.tts_service import TTSService
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def synthesize_speech(self, input, voice, audio_config, timeout):
+        self.calls += 1
+        return SimpleNamespace(audio_content=f"audio {input.text}".encode())
+
+
+@pytest.fixture
+def tts(tmp_path, monkeypatch):
+    monkeypatch.setattr(google.auth, "default", lambda *args, **kwargs: (AnonymousCredentials(), "test"))
+    cache = TieredCache(str(tmp_path / "cache"), memory_max_bytes=1 << 20, disk_max_bytes=1 << 20)
+    service = TTSService(output_folder=str(tmp_path / "respuestas"), cache=cache)
+    service._async_client = FakeAsyncClient()
+    return service
+
+
+def test_batch_looks_up_each_text_once(tts):
+    asyncio.run(tts.synthesize_async("Hola"))
+    stats = tts.get_cache_stats()
+    assert (stats["misses"], stats["memory_hits"]) == (1, 0)
+
+    result = asyncio.run(tts.synthesize_batch(["Hola", "Bienvenido", "Adiós"]))
+
+    assert (result["cached"], result["synthesized"], result["failed"]) == (1, 2, 0)
+    assert tts._async_client.calls == 3
+    stats = tts.get_cache_stats()
+    assert (stats["misses"], stats["memory_hits"]) == (3, 1)
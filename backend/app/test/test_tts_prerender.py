@@ -0,0 +1,29 @@
+from app.services.chat_stream import SentenceSplitter
+from app.services.tts_prerender import default_phrases, parse_careers
+
+
+def test_verdicts_come_from_the_prompt_career_list():
+    phrases = default_phrases()
+
+    assert ("FCNM", "Estadística") in parse_careers()
+    assert "Tú perteneces a la Facultad FCNM y a la carrera Estadística." in phrases
+    assert "¡Mucho éxito en tu camino universitario!" in phrases
+
+
+def test_streamed_reply_splits_into_the_prerendered_phrases():
+    reply = ("¡Hola! Soy la Tortuga Seleccionadora de ESPOL. ¿Qué materias disfrutas más en el colegio?\n\n"
+             "Tu gusto por los datos encaja muy bien. Tú perteneces a la Facultad FCNM y a la carrera Estadística. "
+             "¡Mucho éxito en tu camino universitario!")
+
+    splitter = SentenceSplitter()
+    sentences = []
+    for start in range(0, len(reply), 7):
+        sentences += splitter.feed(reply[start:start + 7])
+    sentences += splitter.flush()
+
+    phrases = set(default_phrases())
+    assert [sentence for sentence in sentences if sentence in phrases] == [
+        "¡Hola! Soy la Tortuga Seleccionadora de ESPOL.",
+        "Tú perteneces a la Facultad FCNM y a la carrera Estadística.",
+        "¡Mucho éxito en tu camino universitario!"
+    ]
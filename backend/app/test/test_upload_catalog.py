@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from pathlib import Path
+from app.services.upload_catalog import UploadCatalog
+
+
+def add(catalog: UploadCatalog, filename: str, content: bytes):
+    return catalog.add(content, filename, hashlib.sha256(content).hexdigest(), len(content), 1.0)
+
+
+def test_duplicate_content_is_stored_once(tmp_path):
+    catalog = UploadCatalog(str(tmp_path / "uploads"), str(tmp_path / "uploads.db"))
+    first, duplicate = add(catalog, "a.wav", b"audio")
+    second, duplicate_again = add(catalog, "b.wav", b"audio")
+
+    assert (duplicate, duplicate_again) == (False, True)
+    assert first.path == second.path
+    assert catalog.get_stats()["stored_files"] == 1
+
+    assert catalog.remove("a.wav")
+    assert catalog.remove("b.wav")
+    assert not catalog.remove("b.wav")
+    assert catalog.get_stats()["stored_files"] == 0
+
+
+def test_workers_uploading_the_same_new_content(tmp_path):
+    # Dos catálogos sobre la misma base simulan dos workers con su propio lock
+    workers = [UploadCatalog(str(tmp_path / "uploads"), str(tmp_path / "uploads.db")) for _ in range(2)]
+    errors = []
+
+    for round_number in range(20):
+        content = f"audio {round_number}".encode()
+        barrier = threading.Barrier(len(workers))
+
+        def upload(index: int, catalog: UploadCatalog):
+            barrier.wait()
+            try:
+                add(catalog, f"worker{index}-{round_number}.wav", content)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=upload, args=(i, c)) for i, c in enumerate(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    stats = workers[0].get_stats()
+    assert (stats["uploads"], stats["stored_files"]) == (40, 20)
+    refs = workers[0]._db.execute("SELECT MIN(refs), MAX(refs) FROM blobs").fetchone()
+    assert refs == (2, 2)
+
+
+def test_blob_is_written_before_taking_the_lock(tmp_path, monkeypatch):
+    catalog = UploadCatalog(str(tmp_path / "uploads"), str(tmp_path / "uploads.db"))
+    locked = []
+    write_bytes = Path.write_bytes
+
+    def tracking_write_bytes(path, data):
+        locked.append(catalog._lock.locked())
+        return write_bytes(path, data)
+
+    monkeypatch.setattr(Path, "write_bytes", tracking_write_bytes)
+    entry, _ = add(catalog, "a.wav", b"audio")
+    add(catalog, "b.wav", b"audio")
+
+    assert locked == [False, False]
+    assert Path(entry.path).read_bytes() == b"audio"
+    # La copia preparada para el duplicado no queda en la carpeta
+    assert [p.name for p in Path(entry.path).parent.iterdir()] == [Path(entry.path).name]
+
+
+def test_legacy_file_taken_by_another_worker(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "a.wav").write_bytes(b"audio a")
+    (uploads / "b.wav").write_bytes(b"audio b")
+
+    def probe_taken(path):
+        # Otro worker importó este archivo mientras este lo analizaba
+        if path.name == "a.wav":
+            path.unlink()
+        return None
+
+    monkeypatch.setattr("app.services.upload_catalog.probe_path", probe_taken)
+    catalog = UploadCatalog(str(uploads), str(tmp_path / "uploads.db"))
+
+    assert catalog.get("a.wav") is None
+    assert Path(catalog.get("b.wav").path).read_bytes() == b"audio b"
+    assert not (uploads / "b.wav").exists()
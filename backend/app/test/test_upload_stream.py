@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from app.services.upload_stream import UnsupportedFormat, UploadError, receive_upload
+
+BOUNDARY = "limite"
+
+
+def form(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="language"\r\n\r\nes\r\n'
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: audio/wav\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def stream(body: bytes, size: int = 1024):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def receive(body: bytes, spool_dir):
+    return asyncio.run(receive_upload(
+        stream(body), f"multipart/form-data; boundary={BOUNDARY}", str(len(body)),
+        max_size=1 << 20, memory_limit=1024, spool_dir=spool_dir
+    ))
+
+
+def test_spooled_file_is_received(tmp_path):
+    upload = receive(form("voz.wav", b"x" * 8192), tmp_path)
+    assert upload.path is not None and upload.read() == b"x" * 8192
+    assert upload.fields == {"language": "es"}
+    upload.cleanup()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_empty_filename_discards_the_spooled_file(tmp_path):
+    with pytest.raises(UploadError):
+        receive(form("", b"x" * 8192), tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spool_writes_run_in_a_thread(tmp_path, monkeypatch):
+    threaded = []
+    to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(function, *args):
+        threaded.append(function.__name__)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", tracking_to_thread)
+    upload = receive(form("voz.wav", b"x" * 8192), tmp_path)
+
+    # Los primeros 1024 bytes quedan en memoria; después, una escritura por fragmento recibido
+    assert threaded.count("_spill") >= 7 and threaded[-1] == "close"
+    assert upload.read() == b"x" * 8192
+    upload.cleanup()
+
+
+def test_unsupported_format_is_rejected_before_reading_the_file(tmp_path):
+    body = form("notas.txt", b"x" * 8192)
+    read = []
+
+    async def tracking_stream():
+        async for chunk in stream(body):
+            read.append(chunk)
+            yield chunk
+
+    with pytest.raises(UnsupportedFormat):
+        asyncio.run(receive_upload(
+            tracking_stream(), f"multipart/form-data; boundary={BOUNDARY}", str(len(body)),
+            max_size=1 << 20, memory_limit=1024, spool_dir=tmp_path,
+            accept_filename=lambda filename: filename.endswith(".wav")
+        ))
+    # Los encabezados de la parte llegan en el primer fragmento
+    assert len(read) == 1
+    assert not tmp_path.exists() or list(tmp_path.iterdir()) == []